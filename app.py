@@ -1,22 +1,47 @@
 from flask import Flask, render_template, request, redirect, url_for, flash, Response, session, jsonify
 import sqlite3
 from datetime import datetime
-import csv
-from io import StringIO
-from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
+import db
+import reservations
+import availability
+import export
+import stats as clinic_stats
+import users
+import search
+import pagination
+import events
+import passwords
+import metrics
+import assets
+import pagecache
+import archive
+import importer
+import schedules
  
 app = Flask(__name__)
 app.secret_key = "dev_secret_for_flash"  # use a strong key for production
 DB = 'clinic.db'
+app.config.setdefault('DATABASE', DB)
+db.init_app(app)
+availability.init_app(app)
+users.init_app(app)
+events.init_app(app)
+passwords.init_app(app)
+metrics.init_app(app)
+assets.init_app(app)
+pagecache.init_app(app)
+archive.init_app(app)
+importer.init_app(app)
+schedules.init_app(app)
+app.config.setdefault('APPOINTMENTS_PAGE_SIZE', pagination.DEFAULT_PAGE_SIZE)
  
 # -------------------------
 # Database connection helper
 # -------------------------
 def get_db_connection():
-    conn = sqlite3.connect(DB)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # Pooled, request-scoped connection; released automatically at teardown.
+    return db.get_db()
  
 # -------------------------
 # Authentication helpers
@@ -43,17 +68,26 @@ def role_required(*allowed_roles):
     return decorator
  
 def get_current_user():
-    uid = session.get('user_id')
-    if not uid:
-        return None
-    conn = get_db_connection()
-    user = conn.execute('SELECT id, username, full_name, role FROM users WHERE id=?', (uid,)).fetchone()
-    conn.close()
-    return user
+    # Resolved once per request (g.user), usually from the process-wide cache.
+    return users.current_user()
  
 # -------------------------
 # Authentication routes
 # -------------------------
+def upgrade_password_hash(conn, user, password):
+    # Re-hash under the current PASSWORD_HASH_METHOD while the plain password
+    # is at hand; a busy pool just defers the upgrade to a later login.
+    hasher = passwords.get_hasher()
+    if not hasher.needs_rehash(user['password']):
+        return
+    try:
+        hashed = hasher.hash(password)
+    except passwords.HashingBusy:
+        return
+    conn.execute('UPDATE users SET password=? WHERE id=?', (hashed, user['id']))
+    conn.commit()
+    hasher.rehashed()
+
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
@@ -75,20 +109,24 @@ def register():
             flash("Username and password required.", "error")
             return redirect(url_for('register'))
  
-        hashed = generate_password_hash(password)
+        try:
+            hashed = passwords.get_hasher().hash(password)
+        except passwords.HashingBusy as err:
+            flash(str(err), "error")
+            return redirect(url_for('register'))
         conn = get_db_connection()
         try:
-            conn.execute(
+            cur = conn.execute(
                 'INSERT INTO users (username, full_name, email, password, role) VALUES (?,?,?,?,?)',
                 (username, full_name, email, hashed, role)
             )
             conn.commit()
+            users.forget(cur.lastrowid)
+            pagecache.bump()
             flash(f"Registration for user '{username}' successful. Please log in.", "success")
             return redirect(url_for('login'))
         except sqlite3.IntegrityError:
             flash("Username or email already exists.", "error")
-        finally:
-            conn.close()
             
     if session.get('role') not in ('admin', 'reception'):
         return redirect(url_for('home')) 
@@ -105,13 +143,20 @@ def login():
  
             conn = get_db_connection()
             user = conn.execute('SELECT * FROM users WHERE username=?', (username,)).fetchone()
-            conn.close()
+            hasher = passwords.get_hasher()
+            try:
+                valid = user is not None and hasher.verify(user['password'], password)
+            except passwords.HashingBusy as err:
+                flash(str(err), "error")
+                return redirect(url_for('login'))
  
-            if user and check_password_hash(user['password'], password):
+            if valid:
+                upgrade_password_hash(conn, user, password)
                 session['user_id'] = user['id']
                 session['username'] = user['username']
                 session['role'] = user['role']
                 session['full_name'] = user['full_name']
+                users.remember(user)
                 flash("Logged in successfully.", "success")
  
                 if user['role'] == 'admin':
@@ -135,20 +180,24 @@ def login():
                 flash("All fields are required for sign up.", "error")
                 return redirect(url_for('login'))
  
-            hashed = generate_password_hash(password)
+            try:
+                hashed = passwords.get_hasher().hash(password)
+            except passwords.HashingBusy as err:
+                flash(str(err), "error")
+                return redirect(url_for('login'))
             conn = get_db_connection()
             try:
-                conn.execute(
+                cur = conn.execute(
                     'INSERT INTO users (username, full_name, email, password, role) VALUES (?,?,?,?,?)',
                     (username, full_name, email, hashed, role)
                 )
                 conn.commit()
+                users.forget(cur.lastrowid)
+                pagecache.bump()
                 flash("Account created successfully! Please log in.", "success")
                 return redirect(url_for('login'))
             except sqlite3.IntegrityError:
                 flash("Username or email already exists.", "error")
-            finally:
-                conn.close()
 
         else:
             flash("Invalid action.", "error")
@@ -166,6 +215,7 @@ def logout():
 # Home route
 # -------------------------
 @app.route('/')
+@pagecache.cached_page(data=False)
 def home():
     user = get_current_user()
     return render_template('index.html', user=user)
@@ -174,6 +224,7 @@ def home():
 # Contact Routes
 # -------------------------
 @app.route('/contact')
+@pagecache.cached_page(data=False)
 def contact():
     user = get_current_user()
     return render_template('contact.html', user=user)
@@ -184,7 +235,7 @@ def send_message():
     email = request.form.get('email')
     message = request.form.get('message')
 
-    print(f"📩 Message from {name} ({email}): {message}")
+    app.logger.info("Contact message from %s (%s): %s", name, email, message)
     flash("Your message has been sent successfully!", "success")
     return redirect(url_for('contact'))
 
@@ -205,37 +256,36 @@ def booking():
         date = request.form.get('date', '').strip()
         time = request.form.get('time', '').strip()
         
-        booked = conn.execute(
-            "SELECT id FROM appointments WHERE doctor_name=? AND date=? AND time=? AND status IN ('pending', 'checked_in')",
-            (doctor, date, time)
-        ).fetchone()
-        
-        if booked:
-            flash("This specific time slot has just been booked. Please choose another time.", "error")
-            conn.close()
-            return redirect(url_for('booking'))
- 
         if not (patient and doctor and date and time):
             flash("All fields are required.", "error")
-            conn.close()
             return redirect(url_for('booking'))
  
-        conn.execute(
-            "INSERT INTO appointments (patient_name, doctor_name, date, time, status) VALUES (?,?,?,?,?)",
-            (patient, doctor, date, time, 'pending')
-        )
-        conn.commit()
-        conn.close()
+        doctor_id = users.doctor_id(conn, doctor)
+        if doctor_id is None:
+            flash("Please choose a doctor from the list.", "error")
+            return redirect(url_for('booking'))
+ 
+        try:
+            appointment_id = reservations.reserve_slot(conn, patient, doctor, date, time,
+                                                       patient_id=session['user_id'], doctor_id=doctor_id)
+        except reservations.SlotTaken:
+            availability.get_cache().invalidate(doctor, date)
+            flash("This specific time slot has just been booked. Please choose another time.", "error")
+            return redirect(url_for('booking'))
+        except reservations.SlotUnavailable:
+            flash(f"{doctor} is not available at that time. Please choose another time.", "error")
+            return redirect(url_for('booking'))
+        availability.get_cache().mark_booked(doctor, date, time)
+        pagecache.bump()
+        events.publish('booked', {
+            'id': appointment_id, 'patient_name': patient, 'doctor_name': doctor,
+            'date': date, 'time': time, 'status': 'pending', 'queue_number': None,
+        })
  
         flash("Appointment booked successfully!", "success")
         return redirect(url_for('patient_dashboard'))
  
-    conn.close()
-    all_times = [
-        '09:00', '09:30', '10:00', '10:30', '11:00', '11:30', 
-        '14:00', '14:30', '15:00', '15:30', '16:00', '16:30'
-    ]
-    return render_template('booking.html', doctors=doctors, all_times=all_times)
+    return render_template('booking.html', doctors=doctors, all_times=schedules.clinic_times(conn))
 
 # -------------------------
 # Doctor Availability API
@@ -249,21 +299,123 @@ def doctor_availability():
     if not (doctor_name and date):
         return jsonify({'error': 'Doctor and date parameters are required.'}), 400
     
+    try:
+        return jsonify({'available_times': availability.available_times(doctor_name, date)})
+    except ValueError:
+        return jsonify({'error': 'date must be YYYY-MM-DD.'}), 400
+ 
+@app.route('/api/availability_range', methods=['GET'])
+@login_required
+def availability_range():
+    start = request.args.get('start', '').strip()
+    end = request.args.get('end', '').strip() or start
+    if not start:
+        return jsonify({'error': 'start parameter is required.'}), 400
+
     conn = get_db_connection()
-    booked_slots = conn.execute(
-        "SELECT time FROM appointments WHERE doctor_name=? AND date=? AND status IN ('pending', 'checked_in') ORDER BY time", 
-        (doctor_name, date)
-    ).fetchall()
-    conn.close()
-    
-    occupied_times = [slot['time'] for slot in booked_slots]
-    standard_times = [
-        '09:00', '09:30', '10:00', '10:30', '11:00', '11:30', 
-        '14:00', '14:30', '15:00', '15:30', '16:00', '16:30'
-    ]
-    available_times = [time for time in standard_times if time not in occupied_times]
-    
-    return jsonify({'available_times': available_times})
+    doctors = request.args.getlist('doctor')
+    if not doctors:
+        doctors = [r['full_name'] for r in conn.execute(
+            "SELECT full_name, specialization FROM users WHERE role='doctor' ORDER BY full_name"
+        )]
+    try:
+        matrix = availability.availability_matrix(conn, start, end, doctors)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+
+    # Content-hash ETag: unchanged ranges revalidate with a bodiless 304.
+    response = jsonify(matrix)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(request)
+
+# -------------------------
+# Search API (typeahead)
+# -------------------------
+@app.route('/api/search', methods=['GET'])
+@login_required
+def search_api():
+    # ?q=<prefix terms>&type=people|appointments&page=&per_page=, best match first.
+    q = request.args.get('q', '').strip()
+    kind = request.args.get('type', 'people').strip()
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+    if not q:
+        return jsonify({'error': 'q parameter is required.'}), 400
+    if page < 1 or not 1 <= per_page <= search.MAX_PAGE_SIZE:
+        return jsonify({'error': f'page must be >= 1 and per_page between 1 and {search.MAX_PAGE_SIZE}.'}), 400
+
+    # Patients may look up doctors only; staff can also find patients and bookings.
+    staff = session.get('role') in ('reception', 'admin')
+    if kind == 'appointments' and not staff:
+        return jsonify({'error': 'You do not have permission to search appointments.'}), 403
+    conn = get_db_connection()
+    offset = (page - 1) * per_page
+    # One extra row tells us whether another page exists without a COUNT.
+    if kind == 'appointments':
+        results = search.search_appointments(conn, q, per_page + 1, offset)
+    elif kind == 'people':
+        roles = ('doctor', 'patient') if staff else ('doctor',)
+        results = search.search_people(conn, q, roles, per_page + 1, offset)
+    else:
+        return jsonify({'error': "type must be 'people' or 'appointments'."}), 400
+    return jsonify({
+        'q': q, 'type': kind, 'page': page, 'per_page': per_page,
+        'has_more': len(results) > per_page, 'results': results[:per_page],
+    })
+
+# -------------------------
+# Appointment lists (keyset pages)
+# -------------------------
+def page_args():
+    # ?after=<cursor> / ?before=<cursor> and ?per_page=; raises ValueError.
+    per_page = request.args.get('per_page', '').strip()
+    if not per_page:
+        limit = app.config['APPOINTMENTS_PAGE_SIZE']
+    elif per_page.isdigit() and 1 <= int(per_page) <= pagination.MAX_PAGE_SIZE:
+        limit = int(per_page)
+    else:
+        raise ValueError(f"per_page must be between 1 and {pagination.MAX_PAGE_SIZE}.")
+    return {
+        'after': request.args.get('after', '').strip() or None,
+        'before': request.args.get('before', '').strip() or None,
+        'limit': limit,
+    }
+
+def list_page(conn, filters):
+    # HTML views: a bad cursor falls back to the first page.
+    try:
+        return pagination.fetch_page(conn, filters, **page_args())
+    except ValueError as err:
+        flash(str(err), "error")
+        return pagination.fetch_page(conn, filters, limit=app.config['APPOINTMENTS_PAGE_SIZE'])
+
+def staff_filters(conn, date, doctor):
+    # The free-text doctor filter is matched against the doctor list first;
+    # each matching doctor_id is then seeked along its own index.
+    if not doctor:
+        return [("date=?", (date or datetime.now().date().isoformat(),))]
+    doctor_ids = users.doctor_ids_matching(conn, doctor)
+    if date:
+        return [("doctor_id=? AND date=?", (doctor_id, date)) for doctor_id in doctor_ids]
+    return [("doctor_id=?", (doctor_id,)) for doctor_id in doctor_ids]
+
+@app.route('/api/appointments', methods=['GET'])
+@login_required
+def appointments_api():
+    # Patients page through their own bookings; staff filter by ?date=&doctor=.
+    conn = get_db_connection()
+    if session.get('role') in ('reception', 'admin'):
+        filters = staff_filters(conn, request.args.get('date', '').strip(), request.args.get('doctor', '').strip())
+    else:
+        filters = [("patient_id=?", (session['user_id'],))]
+    try:
+        args = page_args()
+        page = pagination.fetch_page(conn, filters, **args)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+    return jsonify(page.as_dict(args['limit']))
 
 # -------------------------
 # Patient Dashboard
@@ -272,13 +424,9 @@ def doctor_availability():
 @login_required
 def patient_dashboard():
     conn = get_db_connection()
-    appts = conn.execute(
-        'SELECT * FROM appointments WHERE patient_name=? ORDER BY date, time',
-        (session['full_name'],)
-    ).fetchall()
-    conn.close()
+    page = list_page(conn, [("patient_id=?", (session['user_id'],))])
     user = get_current_user()
-    return render_template('patient_dashboard.html', appointments=appts, user=user)
+    return render_template('patient_dashboard.html', appointments=page.rows, page=page, user=user)
 
 # -------------------------
 # Edit Appointment
@@ -290,20 +438,14 @@ def edit_appointment(appointment_id):
     appt = conn.execute('SELECT * FROM appointments WHERE id=?', (appointment_id,)).fetchone()
  
     if appt is None:
-        conn.close()
         flash("Appointment not found.", "error")
         return redirect(url_for('patient_dashboard'))
  
-    if appt['patient_name'] != session.get('full_name') and session.get('role') == 'patient':
-        conn.close()
+    if appt['patient_id'] != session.get('user_id') and session.get('role') == 'patient':
         flash("You can only edit your own appointments.", "error")
         return redirect(url_for('patient_dashboard'))
 
     doctors = conn.execute("SELECT full_name, specialization FROM users WHERE role='doctor' ORDER BY full_name").fetchall()
-    all_times = [
-        '09:00', '09:30', '10:00', '10:30', '11:00', '11:30', 
-        '14:00', '14:30', '15:00', '15:30', '16:00', '16:30'
-    ]
     
     if request.method == 'POST':
         doctor = request.form.get('doctor_name', '').strip()
@@ -312,30 +454,33 @@ def edit_appointment(appointment_id):
  
         if not (doctor and date and time):
             flash("All fields are required.", "error")
-            conn.close()
             return redirect(url_for('edit_appointment', appointment_id=appointment_id))
 
-        conflict = conn.execute(
-            "SELECT id FROM appointments WHERE doctor_name=? AND date=? AND time=? AND status IN ('pending', 'checked_in') AND id!=?",
-            (doctor, date, time, appointment_id)
-        ).fetchone()
+        doctor_id = users.doctor_id(conn, doctor)
+        if doctor_id is None:
+            flash("Please choose a doctor from the list.", "error")
+            return redirect(url_for('edit_appointment', appointment_id=appointment_id))
 
-        if conflict:
-            conn.close()
+        try:
+            reservations.move_slot(conn, appointment_id, doctor, date, time, doctor_id=doctor_id)
+        except reservations.SlotTaken:
+            availability.get_cache().invalidate(doctor, date)
             flash("The selected time slot is already booked. Please choose another time.", "error")
             return redirect(url_for('edit_appointment', appointment_id=appointment_id))
- 
-        conn.execute(
-            "UPDATE appointments SET doctor_name=?, date=?, time=? WHERE id=?",
-            (doctor, date, time, appointment_id)
-        )
-        conn.commit()
-        conn.close()
+        except reservations.SlotUnavailable:
+            flash(f"{doctor} is not available at that time. Please choose another time.", "error")
+            return redirect(url_for('edit_appointment', appointment_id=appointment_id))
+        if appt['status'] in ('pending', 'checked_in'):
+            cache = availability.get_cache()
+            cache.mark_free(appt['doctor_name'], appt['date'], appt['time'])
+            cache.mark_booked(doctor, date, time)
+        pagecache.bump()
+        moved = dict(appt, doctor_name=doctor, date=date, time=time)
+        events.publish('moved', moved, previous={k: appt[k] for k in ('doctor_name', 'date', 'time')})
         flash("Appointment updated successfully.", "success")
         return redirect(url_for('patient_dashboard'))
  
-    conn.close()
-    return render_template('edit_appointment.html', appt=appt, doctors=doctors, all_times=all_times)
+    return render_template('edit_appointment.html', appt=appt, doctors=doctors)
 
 # -------------------------
 # Reception Dashboard
@@ -343,67 +488,117 @@ def edit_appointment(appointment_id):
 @app.route('/reception')
 @login_required
 @role_required('reception', 'admin')
+@pagecache.cached_page(flashes=True)
 def reception():
     date = request.args.get('date', '').strip()
     doctor = request.args.get('doctor', '').strip()
     conn = get_db_connection()
  
-    if date and doctor:
-        rows = conn.execute(
-            "SELECT * FROM appointments WHERE date=? AND doctor_name LIKE ? ORDER BY time",
-            (date, f'%{doctor}%')
-        ).fetchall()
-    elif date:
-        rows = conn.execute(
-            "SELECT * FROM appointments WHERE date=? ORDER BY time", (date,)
-        ).fetchall()
-    elif doctor:
-        rows = conn.execute(
-            "SELECT * FROM appointments WHERE doctor_name LIKE ? ORDER BY date, time",
-            (f'%{doctor}%',)
-        ).fetchall()
-    else:
-        today = datetime.now().date().isoformat()
-        rows = conn.execute("SELECT * FROM appointments WHERE date=? ORDER BY time", (today,)).fetchall()
-        
-    conn.close()
+    page = list_page(conn, staff_filters(conn, date, doctor))
     user = get_current_user()
-    return render_template('reception.html', appointments=rows, user=user)
+    # The live queue feed follows the same filters, including the today default.
+    feed = {'date': date or ('' if doctor else datetime.now().date().isoformat()), 'doctor': doctor}
+    return render_template('reception.html', appointments=page.rows, page=page, user=user, feed=feed)
  
+# -------------------------
+# Live queue board (Server-Sent Events)
+# -------------------------
+@app.route('/events/queue')
+@login_required
+@role_required('reception', 'admin')
+def queue_events():
+    # Pushes booked/moved/checked_in/cancelled deltas; ?date= and ?doctor=
+    # narrow the feed. A "resync" event means: reload the list once.
+    date = request.args.get('date', '').strip()
+    doctor = request.args.get('doctor', '').strip()
+    last_id = request.headers.get('Last-Event-ID', request.args.get('last_id', '')).strip()
+
+    # Same rules as the reception list (case-insensitive doctor substring);
+    # a move is sent to screens showing either its old or its new place.
+    needle = doctor.casefold()
+
+    def match(event):
+        data = event[2]
+        return any(
+            side and (not date or side['date'] == date) and needle in side['doctor_name'].casefold()
+            for side in (data, data.get('previous'))
+        )
+
+    body = events.stream(
+        events.get_broker(),
+        int(last_id) if last_id.isdigit() else None,
+        match if date or doctor else None,
+        app.config['EVENTS_KEEPALIVE'],
+    )
+    return Response(body, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def publish_checked_in(conn, appointment_ids):
+    # Primary-key reads of the rows just admitted; already checked-in rows
+    # are republished harmlessly (the screens key rows by id).
+    if not appointment_ids:
+        return
+    rows = conn.execute(
+        f"SELECT * FROM appointments WHERE id IN ({','.join('?' * len(appointment_ids))})", appointment_ids
+    ).fetchall()
+    for row in rows:
+        events.publish('checked_in', row)
+
 @app.route('/checkin/<int:appointment_id>')
 @login_required
 @role_required('reception', 'admin')
 def checkin(appointment_id):
     conn = get_db_connection()
-    appt = conn.execute("SELECT doctor_name, date FROM appointments WHERE id=?", (appointment_id,)).fetchone()
-    if appt:
-        max_queue = conn.execute(
-            "SELECT MAX(queue_number) FROM appointments WHERE doctor_name=? AND date=?",
-            (appt['doctor_name'], appt['date'])
-        ).fetchone()[0]
-        
-        new_queue = (max_queue or 0) + 1
-        
-        conn.execute(
-            "UPDATE appointments SET status='checked_in', queue_number=? WHERE id=?", 
-            (new_queue, appointment_id)
-        )
-        conn.commit()
+    try:
+        new_queue = reservations.check_in(conn, appointment_id)
+        pagecache.bump()
+        publish_checked_in(conn, [appointment_id])
         flash(f"Patient checked in successfully. Queue Number: {new_queue}", "success")
-    else:
-        flash("Appointment not found.", "error")
+    except reservations.CheckinError as err:
+        flash(str(err), "error")
 
-    conn.close()
     return redirect(url_for('reception'))
  
+@app.route('/checkin/bulk', methods=['POST'])
+@login_required
+@role_required('reception', 'admin')
+def checkin_bulk():
+    # JSON {"appointment_ids": [1, 2]} or repeated appointment_id form fields.
+    payload = request.get_json(silent=True)
+    if payload is not None:
+        ids = payload.get('appointment_ids') if isinstance(payload, dict) else None
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return jsonify({'error': 'appointment_ids must be a list of integers.'}), 400
+    else:
+        try:
+            ids = [int(i) for i in request.form.getlist('appointment_id')]
+        except ValueError:
+            return jsonify({'error': 'appointment_ids must be a list of integers.'}), 400
+    if not ids:
+        return jsonify({'error': 'appointment_ids is required.'}), 400
+
+    conn = get_db_connection()
+    admitted, skipped = reservations.check_in_many(conn, ids)
+    if admitted:
+        pagecache.bump()
+    publish_checked_in(conn, list(admitted))
+    return jsonify({
+        'checked_in': [{'id': i, 'queue_number': n} for i, n in admitted.items()],
+        'skipped': [{'id': i, 'reason': r} for i, r in skipped.items()],
+    })
+ 
 @app.route('/cancel/<int:appointment_id>')
 @login_required
 @role_required('reception', 'admin')
 def cancel(appointment_id):
     conn = get_db_connection()
+    appt = conn.execute("SELECT * FROM appointments WHERE id=?", (appointment_id,)).fetchone()
     conn.execute("UPDATE appointments SET status='cancelled' WHERE id=?", (appointment_id,))
     conn.commit()
-    conn.close()
+    pagecache.bump()
+    if appt and appt['status'] in ('pending', 'checked_in'):
+        availability.get_cache().mark_free(appt['doctor_name'], appt['date'], appt['time'])
+        events.publish('cancelled', dict(appt, status='cancelled'))
     flash("Appointment cancelled.", "info")
     return redirect(url_for('reception'))
  
@@ -413,18 +608,33 @@ def cancel(appointment_id):
 @app.route('/admin')
 @login_required
 @role_required('admin')
+@pagecache.cached_page(per_user=True)
 def admin():
     conn = get_db_connection()
-    total = conn.execute('SELECT COUNT(*) FROM appointments').fetchone()[0]
     today = datetime.now().date().isoformat()
-    today_count = conn.execute('SELECT COUNT(*) FROM appointments WHERE date=?', (today,)).fetchone()[0]
-    checked_in = conn.execute("SELECT COUNT(*) FROM appointments WHERE status='checked_in'").fetchone()[0]
-    cancelled = conn.execute("SELECT COUNT(*) FROM appointments WHERE status='cancelled'").fetchone()[0]
-    todays = conn.execute("SELECT * FROM appointments WHERE date=? ORDER BY time", (today,)).fetchall()
-    conn.close()
-    stats = {'total': total, 'today': today_count, 'checked_in': checked_in, 'cancelled': cancelled}
+    stats = clinic_stats.dashboard(conn, today)
+    page = list_page(conn, [("date=?", (today,))])
     user = get_current_user()
-    return render_template('admin.html', stats=stats, todays=todays, user=user)
+    return render_template('admin.html', stats=stats, todays=page.rows, page=page, user=user)
+ 
+@app.route('/api/stats')
+@login_required
+@role_required('admin')
+def stats_api():
+    # ?date=&end= picks the day(s) for the breakdown; ?by=doctor|status.
+    conn = get_db_connection()
+    today = datetime.now().date().isoformat()
+    start = request.args.get('date', '').strip() or today
+    end = request.args.get('end', '').strip() or start
+    by = request.args.get('by', 'doctor').strip()
+    try:
+        breakdown = clinic_stats.breakdown(conn, start, end, by)
+    except ValueError as err:
+        return jsonify({'error': str(err)}), 400
+    return jsonify({
+        'summary': clinic_stats.dashboard(conn, today),
+        'breakdown': {'start': start, 'end': end, 'by': by, 'counts': breakdown},
+    })
  
 # -------------------------
 # Export CSV (Admin Only)
@@ -433,16 +643,151 @@ def admin():
 @login_required
 @role_required('admin')
 def export_csv():
+    # Streamed in fetchmany() batches; optional ?start=&end=&status= filters,
+    # ?format=csv|ndjson|arrow|parquet and incremental ?since_id=<watermark>.
+    fmt = request.args.get('format', 'csv').strip().lower()
+    filters = {
+        'start': request.args.get('start', '').strip() or None,
+        'end': request.args.get('end', '').strip() or None,
+        'statuses': request.args.getlist('status'),
+    }
+    headers = {"Vary": "Accept-Encoding"}
+    since_id = request.args.get('since_id', '').strip()
+    if since_id:
+        if not since_id.isdigit():
+            return jsonify({'error': 'since_id must be a non-negative integer.'}), 400
+        # Pin the upper bound so the returned watermark matches the rows sent.
+        watermark = export.current_watermark(get_db_connection())
+        filters.update(since_id=int(since_id), until_id=watermark)
+        headers["X-Export-Watermark"] = str(watermark)
+
+    try:
+        body = export.iter_export(db.get_pool(), fmt, **filters)
+    except export.ExportError as err:
+        return jsonify({'error': str(err)}), 400
+    headers["Content-Disposition"] = f"attachment;filename=appointments.{fmt}"
+    if fmt in ('csv', 'ndjson') and request.accept_encodings['gzip']:
+        body = export.gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, mimetype=export.MIMETYPES[fmt], headers=headers)
+ 
+# -------------------------
+# Doctor schedules (Admin Only)
+# -------------------------
+@app.route('/api/schedules/<int:doctor_id>', methods=['GET', 'PUT'])
+@login_required
+@role_required('admin')
+def doctor_schedule(doctor_id):
+    # PUT {"hours": [{"weekday", "start", "end", "slot_minutes"}], "breaks":
+    # [{"weekday" (null: daily), "start", "end"}], "leave": [{"start_date",
+    # "end_date", "reason"}]}; each list given replaces the stored one.
     conn = get_db_connection()
-    rows = conn.execute("SELECT * FROM appointments ORDER BY date, time").fetchall()
-    conn.close()
-    si = StringIO()
-    cw = csv.writer(si)
-    cw.writerow(['id', 'patient_name', 'doctor_name', 'date', 'time', 'status'])
-    for r in rows:
-        cw.writerow([r['id'], r['patient_name'], r['doctor_name'], r['date'], r['time'], r['status']])
-    output = si.getvalue()
-    return Response(output, mimetype="text/csv", headers={"Content-Disposition": "attachment;filename=appointments.csv"})
+    doctor = conn.execute("SELECT full_name FROM users WHERE id=? AND role='doctor'", (doctor_id,)).fetchone()
+    if doctor is None:
+        return jsonify({'error': 'Doctor not found.'}), 404
+    if request.method == 'GET':
+        return jsonify(dict(schedules.get_schedule(conn, doctor_id), doctor_name=doctor['full_name']))
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'A JSON object is required.'}), 400
+    try:
+        lists = {key: payload[key] for key in ('hours', 'breaks', 'leave') if key in payload}
+        if not all(isinstance(items, list) and all(isinstance(i, dict) for i in items) for items in lists.values()):
+            raise schedules.ScheduleError("hours, breaks and leave must be lists of objects")
+        schedule = schedules.set_schedule(conn, doctor_id, days=app.config['SLOT_HORIZON_DAYS'], **lists)
+    except schedules.ScheduleError as err:
+        return jsonify({'error': str(err)}), 400
+    availability.get_cache().invalidate()
+    return jsonify(dict(schedule, doctor_name=doctor['full_name']))
+
+# -------------------------
+# Bulk import (Admin Only)
+# -------------------------
+@app.route('/admin/import', methods=['POST'])
+@login_required
+@role_required('admin')
+def import_data():
+    # ?kind=patients|appointments, ?format=csv|ndjson (default from the file
+    # name), ?dry_run=1. The file is a multipart "file" field or the raw
+    # request body; responds with the per-row report.
+    kind = request.args.get('kind', '').strip()
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    fmt = request.args.get('format', '').strip().lower() or importer.guess_format(
+        upload.filename if upload else None, upload.mimetype if upload else request.mimetype)
+    dry_run = request.args.get('dry_run', '').strip().lower() in ('1', 'true', 'yes')
+    try:
+        report = importer.run(get_db_connection(), stream, kind, fmt, dry_run, passwords.get_hasher(),
+                              app.config['IMPORT_BATCH'], app.config['IMPORT_MAX_ERRORS'])
+    except importer.ImportFileError as err:
+        return jsonify({'error': str(err)}), 400
+    except passwords.HashingBusy as err:
+        return jsonify({'error': str(err)}), 503
+    finally:
+        if not dry_run:
+            # Also after a failure part way: earlier chunks are committed.
+            availability.get_cache().invalidate()
+            pagecache.bump()
+    return jsonify(report)
+
+# -------------------------
+# Database pool stats (Admin Only)
+# -------------------------
+@app.route('/api/db_stats')
+@login_required
+@role_required('admin')
+def db_stats():
+    return jsonify(db.get_pool().stats())
+ 
+@app.route('/api/hash_stats')
+@login_required
+@role_required('admin')
+def hash_stats():
+    return jsonify(passwords.get_hasher().stats())
+ 
+@app.route('/api/cache_stats')
+@login_required
+@role_required('admin')
+def cache_stats():
+    return jsonify({
+        'availability': availability.get_cache().stats(),
+        'users': users.get_cache().stats(),
+        'pages': pagecache.get_cache().stats(),
+    })
+ 
+# -------------------------
+# Prometheus metrics
+# -------------------------
+@app.route('/metrics')
+def metrics_endpoint():
+    # Scrapers authenticate with METRICS_TOKEN as a bearer token; without a
+    # token configured only a logged-in admin can read it.
+    if not app.config['METRICS_ENABLED']:
+        return Response("metrics disabled\n", status=404, mimetype='text/plain')
+    token = app.config['METRICS_TOKEN']
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            return Response("unauthorized\n", status=401, mimetype='text/plain')
+    elif session.get('role') != 'admin':
+        return Response("forbidden\n", status=403, mimetype='text/plain')
+
+    gauges = {
+        'clinic_db_pool': db.get_pool().stats(),
+        'clinic_availability_cache': availability.get_cache().stats(),
+        'clinic_user_cache': users.get_cache().stats(),
+        'clinic_events': events.get_broker().stats(),
+        'clinic_page_cache': pagecache.get_cache().stats(),
+    }
+    hashing = passwords.get_hasher().stats()
+    gauges['clinic_password_hash'] = {k: v for k, v in hashing.items() if isinstance(v, (int, float))}
+    extra = []
+    for prefix, values in gauges.items():
+        for key, value in values.items():
+            if isinstance(value, (int, float)) and value is not None:
+                extra += [f"# TYPE {prefix}_{key} gauge", f"{prefix}_{key} {value}"]
+    body = metrics.get_registry().render(extra)
+    return Response(body, mimetype='text/plain; version=0.0.4')
  
 # -------------------------
 # Run Flask
@@ -0,0 +1,180 @@
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+import migrations
+
+# -------------------------
+# Appointment archive (hot/cold split)
+# -------------------------
+# Day-to-day routes only touch today and the future, so finished
+# appointments older than ARCHIVE_AFTER_DAYS are moved out of `appointments`
+# into `appointments_archive`, keeping the hot table and its indexes small
+# however many years the clinic has run. Lists and exports read the
+# `appointments_history` view, which is both tables. The archive can live in
+# the main file (migration 10) or in a separate file set by ARCHIVE_DATABASE,
+# attached to every pooled connection as `archive`.
+HISTORY_COLUMNS = 'id, patient_name, doctor_name, date, time, status, queue_number, patient_id, doctor_id'
+ARCHIVE_BATCH = 2000
+ARCHIVE_PAUSE = 0.05  # seconds between batches, lets waiting writers in
+ARCHIVE_AFTER_DAYS = 90
+
+ATTACHED_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS archive.appointments_archive (
+        id INTEGER PRIMARY KEY,
+        patient_name TEXT NOT NULL,
+        doctor_name TEXT NOT NULL,
+        date TEXT NOT NULL,
+        time TEXT NOT NULL,
+        status TEXT,
+        queue_number INTEGER,
+        patient_id INTEGER,
+        doctor_id INTEGER,
+        archived_at TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS archive.idx_appointments_archive_date_time
+        ON appointments_archive (date, time);
+    CREATE INDEX IF NOT EXISTS archive.idx_appointments_archive_patient_id
+        ON appointments_archive (patient_id, date, time);
+    CREATE INDEX IF NOT EXISTS archive.idx_appointments_archive_doctor_id
+        ON appointments_archive (doctor_id, date, time);
+'''
+# Temp objects shadow main ones, so this replaces the migration's view for
+# the connection it is created on. A row is briefly in both files while it
+# is being moved (see archive_before); the hot copy wins.
+ATTACHED_VIEW = f'''
+    CREATE TEMP VIEW IF NOT EXISTS appointments_history AS
+        SELECT {HISTORY_COLUMNS} FROM main.appointments
+        UNION ALL
+        SELECT {HISTORY_COLUMNS} FROM archive.appointments_archive AS a
+         WHERE NOT EXISTS (SELECT 1 FROM main.appointments h WHERE h.id = a.id)
+'''
+
+
+def attach(conn, path):
+    conn.execute("ATTACH DATABASE ? AS archive", (path,))
+    conn.execute("PRAGMA archive.journal_mode=WAL")
+    conn.executescript(ATTACHED_SCHEMA)
+    conn.execute(ATTACHED_VIEW)
+
+
+def horizon(days, today=None):
+    return ((today or date.today()) - timedelta(days=days)).isoformat()
+
+
+def archive_before(conn, before, batch_size=ARCHIVE_BATCH, pause=ARCHIVE_PAUSE, schema='main'):
+    # Moves checked-in and cancelled appointments dated before `before`, one
+    # short write transaction per batch; returns the number of rows moved.
+    # Past appointments still 'pending' (no-shows) stay until resolved.
+    # Safe to interrupt and re-run: a batch is copied with INSERT OR IGNORE
+    # and only deleted from the hot table once the copy is committed.
+    position = ('', '', 0)
+    moved = 0
+    while True:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                "SELECT id, date, time FROM appointments "
+                "WHERE date < ? AND (date, time, id) > (?, ?, ?) AND status IN ('checked_in', 'cancelled') "
+                "ORDER BY date, time, id LIMIT ?",
+                (before, *position, batch_size)
+            ).fetchall()
+            if not rows:
+                conn.commit()
+                break
+            ids = [r[0] for r in rows]
+            marks = ','.join('?' * len(ids))
+            conn.execute(
+                f"INSERT OR IGNORE INTO {schema}.appointments_archive ({HISTORY_COLUMNS}, archived_at) "
+                f"SELECT {HISTORY_COLUMNS}, datetime('now') FROM appointments WHERE id IN ({marks})",
+                ids
+            )
+            if schema != 'main':
+                # Commits are atomic per file in WAL mode: make the copy
+                # durable before the hot rows are deleted.
+                conn.commit()
+                conn.execute('BEGIN IMMEDIATE')
+            # The stats delete trigger subtracts every row removed below; add
+            # the batch back first so the summaries keep counting history.
+            conn.execute(
+                "INSERT INTO daily_stats (date, doctor_name, status, count) "
+                "SELECT date, doctor_name, IFNULL(status, ''), COUNT(*) FROM appointments "
+                f"WHERE id IN ({marks}) GROUP BY date, doctor_name, IFNULL(status, '') "
+                "ON CONFLICT (date, doctor_name, status) DO UPDATE SET count = count + excluded.count",
+                ids
+            )
+            conn.execute(
+                "INSERT INTO status_totals (status, count) "
+                f"SELECT IFNULL(status, ''), COUNT(*) FROM appointments WHERE id IN ({marks}) "
+                "GROUP BY IFNULL(status, '') "
+                "ON CONFLICT (status) DO UPDATE SET count = count + excluded.count",
+                ids
+            )
+            conn.execute(f"DELETE FROM appointments WHERE id IN ({marks})", ids)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        moved += len(ids)
+        position = (rows[-1][1], rows[-1][2], rows[-1][0])
+        if pause:
+            time.sleep(pause)
+    return moved
+
+
+def compact(conn):
+    # Deleted rows leave half-empty pages in the hot table and 'delete'
+    # markers in the search index; rewrite both so the hot set is dense.
+    with conn:
+        conn.execute("INSERT INTO appointments_fts(appointments_fts) VALUES ('optimize')")
+    conn.execute('VACUUM')
+
+
+# -------------------------
+# Flask integration
+# -------------------------
+def init_app(app):
+    app.config.setdefault('ARCHIVE_DATABASE', os.environ.get('CLINIC_ARCHIVE_DATABASE'))
+
+
+def pool_setup(app):
+    # Per-connection hook for the pool: attach the separate archive file.
+    path = app.config.get('ARCHIVE_DATABASE')
+    if not path:
+        return None
+    return lambda conn: attach(conn, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Move finished appointments into the archive.')
+    parser.add_argument('--db', default='clinic.db')
+    parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS, help='keep this many days hot')
+    parser.add_argument('--archive-db', default=os.environ.get('CLINIC_ARCHIVE_DATABASE'),
+                        help='separate archive file (default: the archive table in --db)')
+    parser.add_argument('--batch', type=int, default=ARCHIVE_BATCH)
+    parser.add_argument('--pause', type=float, default=ARCHIVE_PAUSE)
+    parser.add_argument('--compact', action='store_true',
+                        help='afterwards merge the search index and VACUUM (blocks writers while it runs)')
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    conn.execute('PRAGMA busy_timeout=30000')
+    migrations.migrate(conn)
+    schema = 'main'
+    if args.archive_db:
+        attach(conn, args.archive_db)
+        schema = 'archive'
+    before = horizon(args.days)
+    started = time.perf_counter()
+    moved = archive_before(conn, before, args.batch, args.pause, schema)
+    print(f"Archived {moved:,} appointments dated before {before} in {time.perf_counter() - started:.1f}s")
+    if args.compact:
+        compact(conn)
+    conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
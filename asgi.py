@@ -0,0 +1,237 @@
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+# -------------------------
+# ASGI serving mode
+# -------------------------
+# Runs the Flask (WSGI) app under an ASGI server such as uvicorn. The event
+# loop only does socket I/O; each request's view code (SQLite queries,
+# password hashing, template rendering) runs in a bounded thread pool, and
+# requests beyond the pool plus a short backlog are refused with 503 rather
+# than queueing without limit. Long-lived bodies (SSE, exports) are drained
+# from a separate pool so they cannot starve ordinary requests.
+#
+#   python serve.py --workers 4 --threads 16
+#   uvicorn asgi:application --workers 4
+DEFAULT_THREADS = 16
+DEFAULT_STREAM_THREADS = 256
+BODY_SPOOL_SIZE = 1024 * 1024
+
+
+class ASGIAdapter:
+    def __init__(self, wsgi_app, threads=DEFAULT_THREADS, stream_threads=DEFAULT_STREAM_THREADS, backlog=None):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self.stream_threads = stream_threads
+        self.max_in_flight = threads + (backlog if backlog is not None else threads * 4)
+        self.in_flight = 0
+        self._executor = None
+        self._stream_executor = None
+        self._closing = False
+
+    # Pools are created lazily so every worker process gets its own.
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix='clinic-req')
+        return self._executor
+
+    @property
+    def stream_executor(self):
+        if self._stream_executor is None:
+            self._stream_executor = ThreadPoolExecutor(self.stream_threads, thread_name_prefix='clinic-stream')
+        return self._stream_executor
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self._closing = False
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                # The server has stopped accepting and drained connections;
+                # finish queued work, then close the hashing and SQLite pools.
+                self._closing = True
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self.close)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def close(self):
+        for pool in (self._executor, self._stream_executor):
+            if pool is not None:
+                pool.shutdown(wait=True)
+        self._executor = self._stream_executor = None
+        extensions = getattr(self.wsgi_app, 'extensions', {})
+        if extensions.get('password_hasher') is not None:
+            extensions['password_hasher'].close()
+        if extensions.get('db_pool') is not None:
+            extensions['db_pool'].close_all()
+
+    async def http(self, scope, receive, send):
+        if self._closing or self.in_flight >= self.max_in_flight:
+            await send({'type': 'http.response.start', 'status': 503,
+                        'headers': [(b'content-type', b'text/plain'), (b'retry-after', b'1')]})
+            await send({'type': 'http.response.body', 'body': b'Server busy, please retry.'})
+            return
+
+        # Only the view itself counts against the limit; a streamed body is
+        # drained from the stream pool afterwards.
+        self.in_flight += 1
+        try:
+            body = await read_body(receive)
+            environ = build_environ(scope, body)
+            loop = asyncio.get_running_loop()
+            response = {}
+            iterable, first = await loop.run_in_executor(self.executor, self.start, environ, response)
+        finally:
+            self.in_flight -= 1
+        await send({'type': 'http.response.start', 'status': response['status'],
+                    'headers': response['headers']})
+        if first is None:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        await self.stream(iterable, first, receive, send)
+
+    def start(self, environ, response):
+        # Runs the view and pulls the first chunk in one hop; plain responses
+        # (a single bytes chunk) are then sent without touching a thread again.
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+        iterable = self.wsgi_app(environ, start_response)
+        if isinstance(iterable, (list, tuple)) and len(iterable) <= 1:
+            close(iterable)
+            return None, (iterable[0] if iterable else b'')
+        iterator = iter(iterable)
+        first = next(iterator, None)
+        length = dict(response['headers']).get(b'content-length')
+        if first is None or (length is not None and int(length) == len(first)):
+            close(iterable)
+            return None, first
+        return (iterable, iterator), first
+
+    async def stream(self, iterable, first, receive, send):
+        if iterable is None:
+            await send({'type': 'http.response.body', 'body': first})
+            return
+        source, iterator = iterable
+        loop = asyncio.get_running_loop()
+        disconnected = asyncio.ensure_future(wait_disconnect(receive))
+        pending = None
+        try:
+            chunk = first
+            while chunk is not None:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                if self._closing:
+                    break
+                pending = loop.run_in_executor(self.stream_executor, next, iterator, None)
+                await asyncio.wait([pending, disconnected], return_when=asyncio.FIRST_COMPLETED)
+                if not pending.done():
+                    return
+                chunk, pending = pending.result(), None
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            # A client that went away mid-wait (e.g. an idle SSE screen) frees
+            # its connection now; the body is closed once the blocked next()
+            # returns, at the latest after one keepalive interval.
+            if pending is None:
+                await loop.run_in_executor(self.stream_executor, close, source)
+            else:
+                pending.add_done_callback(lambda _: close(source))
+
+
+async def read_body(receive):
+    body = SpooledTemporaryFile(BODY_SPOOL_SIZE)
+    more = True
+    while more:
+        message = await receive()
+        body.write(message.get('body', b''))
+        more = message.get('more_body', False)
+    body.seek(0)
+    return body
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def close(iterable):
+    if hasattr(iterable, 'close'):
+        iterable.close()
+
+
+def build_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    size = body.seek(0, os.SEEK_END)
+    body.seek(0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        # The body is fully buffered: chunked uploads (no Content-Length)
+        # are read to EOF instead of as empty.
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1')
+        value = value.decode('latin-1')
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'content-length':
+            continue
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    environ['CONTENT_LENGTH'] = str(size)
+    return environ
+
+
+def create_app(threads=None, stream_threads=None, database=None):
+    from app import app as flask_app
+    threads = threads or int(os.environ.get('CLINIC_THREADS', DEFAULT_THREADS))
+    stream_threads = stream_threads or int(os.environ.get('CLINIC_STREAM_THREADS', DEFAULT_STREAM_THREADS))
+    database = database or os.environ.get('CLINIC_DATABASE')
+    if database:
+        flask_app.config['DATABASE'] = database
+    # One pooled connection per request thread, so views never wait on the pool.
+    flask_app.config['DB_POOL_SIZE'] = max(flask_app.config['DB_POOL_SIZE'], threads)
+    return ASGIAdapter(flask_app, threads, stream_threads)
+
+
+def __getattr__(name):
+    # `uvicorn asgi:application` builds the adapter on first access, after
+    # the CLINIC_* environment is in place.
+    if name == 'application':
+        globals()['application'] = create_app()
+        return globals()['application']
+    raise AttributeError(name)
@@ -0,0 +1,241 @@
+"""Static asset build: fingerprinted, precompressed copies of static/.
+
+    python assets.py build      # static/ -> static/dist/ + manifest.json
+    python assets.py clean
+
+Every file is copied as name.<content hash>.ext, so its URL changes whenever
+its bytes do and it can be cached forever. Text assets also get .gz (and
+.br with the brotli package) variants; images get a WebP derivative and
+narrower WebP widths for srcset when Pillow is installed. Byte-identical
+files are stored once. When a manifest is present the app rewrites
+url_for('static', ...) to the hashed URL; without one it serves static/ as
+before.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import sys
+from io import BytesIO
+from flask import abort, current_app, request, send_from_directory, url_for as flask_url_for
+
+try:
+    import brotli
+except ImportError:  # optional: .br variants are skipped without it
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # optional: WebP / resized derivatives are skipped without it
+    Image = None
+
+# -------------------------
+# Build
+# -------------------------
+COMPRESSIBLE = {'.css', '.js', '.json', '.svg', '.txt', '.map'}
+IMAGES = {'.png', '.jpg', '.jpeg'}
+WIDTHS = (480, 960)
+WEBP_QUALITY = 80
+HASH_LENGTH = 12
+MANIFEST = 'manifest.json'
+DIST = 'dist'
+
+
+def _write(out, name, data):
+    path = os.path.join(out, *name.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _encode_webp(image, width=None):
+    if width is not None:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+    buffer = BytesIO()
+    image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=6)
+    return buffer.getvalue()
+
+
+def _image_variants(out, stem, digest, data, entry):
+    # A derivative is only kept when it is smaller than what it replaces.
+    image = Image.open(BytesIO(data))
+    if image.format != 'WEBP':
+        webp = _encode_webp(image)
+        if len(webp) < len(data):
+            entry['webp'] = f'{stem}.{digest}.webp'
+            _write(out, entry['webp'], webp)
+    widths = {}
+    for width in WIDTHS:
+        if width < image.width:
+            name = f'{stem}.{digest}.w{width}.webp'
+            _write(out, name, _encode_webp(image, width))
+            widths[str(width)] = name
+    if widths:
+        entry['widths'] = widths
+        entry['width'] = image.width
+
+
+def build(source, out=None):
+    # Returns (manifest, duplicates); `out` is rebuilt from scratch.
+    out = out or os.path.join(source, DIST)
+    if os.path.isdir(out):
+        shutil.rmtree(out)
+    os.makedirs(out)
+    assets, by_digest, duplicates = {}, {}, []
+    for root, dirs, files in os.walk(source):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and os.path.join(root, d) != out)
+        for filename in sorted(files):
+            if filename.startswith('.'):
+                continue
+            with open(os.path.join(root, filename), 'rb') as f:
+                data = f.read()
+            logical = os.path.relpath(os.path.join(root, filename), source).replace(os.sep, '/')
+            digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+            if digest in by_digest:
+                duplicates.append((logical, by_digest[digest]))
+                assets[logical] = assets[by_digest[digest]]
+                continue
+            by_digest[digest] = logical
+
+            stem, ext = os.path.splitext(logical)
+            entry = {'file': f'{stem}.{digest}{ext}', 'size': len(data), 'encodings': []}
+            _write(out, entry['file'], data)
+            ext = ext.lower()
+            if ext in COMPRESSIBLE:
+                variants = [('gzip', '.gz', lambda d: gzip.compress(d, 9, mtime=0))]
+                if brotli is not None:
+                    variants.insert(0, ('br', '.br', lambda d: brotli.compress(d, quality=11)))
+                for encoding, suffix, compress in variants:
+                    packed = compress(data)
+                    if len(packed) < len(data):
+                        _write(out, entry['file'] + suffix, packed)
+                        entry['encodings'].append(encoding)
+            if ext in IMAGES and Image is not None:
+                _image_variants(out, stem, digest, data, entry)
+            assets[logical] = entry
+
+    with open(os.path.join(out, MANIFEST), 'w') as f:
+        json.dump({'assets': assets}, f, indent=1, sort_keys=True)
+    return assets, duplicates
+
+
+# -------------------------
+# Flask integration
+# -------------------------
+class Manifest:
+    def __init__(self, directory, assets):
+        self.directory = directory
+        self.assets = assets
+        self.by_file = {entry['file']: entry for entry in assets.values()}
+        # Templates historically link "images/..." while the folder is
+        # "Images/"; lookups fall back to a case-insensitive match.
+        self.folded = {name.lower(): entry for name, entry in assets.items()}
+
+    @classmethod
+    def load(cls, directory):
+        try:
+            with open(os.path.join(directory, MANIFEST)) as f:
+                return cls(directory, json.load(f)['assets'])
+        except FileNotFoundError:
+            return None
+
+    def lookup(self, filename):
+        if not filename:
+            return None
+        return self.assets.get(filename) or self.folded.get(filename.lower())
+
+
+def init_app(app):
+    app.config.setdefault('ASSETS_DIR', os.path.join(app.static_folder, DIST))
+    app.config.setdefault('ASSETS_MAX_AGE', 365 * 24 * 3600)
+    app.config.setdefault('ASSETS_URL_PATH', '/assets')
+    app.extensions['assets'] = Manifest.load(app.config['ASSETS_DIR'])
+    app.add_url_rule(app.config['ASSETS_URL_PATH'] + '/<path:filename>', 'assets', serve)
+    app.jinja_env.globals.update(url_for=url_for, asset_srcset=asset_srcset)
+
+
+def get_manifest():
+    return current_app.extensions['assets']
+
+
+def url_for(endpoint, **values):
+    # Drop-in for flask.url_for: static files listed in the manifest resolve
+    # to their fingerprinted URL, everything else is left to Flask.
+    if endpoint == 'static':
+        manifest = get_manifest()
+        entry = manifest.lookup(values.get('filename')) if manifest else None
+        if entry is not None:
+            return flask_url_for('assets', **dict(values, filename=entry['file']))
+    return flask_url_for(endpoint, **values)
+
+
+def asset_srcset(filename):
+    # "url 480w, url 960w, url <full>w" for <img srcset>, '' without derivatives.
+    manifest = get_manifest()
+    entry = manifest.lookup(filename) if manifest else None
+    if entry is None or 'widths' not in entry:
+        return ''
+    candidates = [(flask_url_for('assets', filename=name), width) for width, name in entry['widths'].items()]
+    candidates.append((flask_url_for('assets', filename=entry.get('webp', entry['file'])), entry['width']))
+    return ', '.join(f'{url} {width}w' for url, width in candidates)
+
+
+def serve(filename):
+    manifest = get_manifest()
+    if manifest is None:
+        abort(404)
+    entry = manifest.by_file.get(filename)
+    path, encoding = filename, None
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    vary = []
+    if entry is not None:
+        if 'webp' in entry:
+            vary.append('Accept')
+            if 'image/webp' in request.headers.get('Accept', ''):
+                path, mimetype = entry['webp'], 'image/webp'
+        if entry['encodings']:
+            vary.append('Accept-Encoding')
+            for candidate in entry['encodings']:
+                if request.accept_encodings[candidate]:
+                    path, encoding = filename + {'br': '.br', 'gzip': '.gz'}[candidate], candidate
+                    break
+
+    response = send_from_directory(manifest.directory, path, mimetype=mimetype,
+                                   max_age=current_app.config['ASSETS_MAX_AGE'])
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    for header in vary:
+        response.vary.add(header)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    source = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    out = os.path.join(source, DIST)
+    if argv[:1] == ['clean']:
+        shutil.rmtree(out, ignore_errors=True)
+        return 0
+    if argv[:1] != ['build']:
+        print(__doc__)
+        return 2
+    assets, duplicates = build(source, out)
+    original = sum(entry['size'] for entry in {e['file']: e for e in assets.values()}.values())
+    print(f"{len(assets)} assets ({original / 1024:.0f} KB) -> {out}")
+    for name, same_as in duplicates:
+        print(f"  duplicate: {name} is identical to {same_as}")
+    if brotli is None:
+        print("  brotli not installed: only gzip variants were written")
+    if Image is None:
+        print("  Pillow not installed: no WebP / resized image derivatives")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
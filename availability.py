@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import date as date_cls, timedelta
+from flask import current_app
+import db
+import schedules
+import users
+
+# -------------------------
+# Bookable time slots
+# -------------------------
+# Each doctor's slots come from their schedule (schedules.py); a doctor-day
+# is a tuple of (time, state) pairs, state 'open', 'booked' or 'closed'.
+def open_times(slots):
+    return [t for t, state in slots if state == 'open']
+
+
+def load_day(conn, doctor, date):
+    doctor_id = users.doctor_id(conn, doctor)
+    if doctor_id is None:
+        return ()
+    return tuple(schedules.read_day(conn, doctor_id, date))
+
+
+# -------------------------
+# Availability cache
+# -------------------------
+# Slots per (doctor, date), LRU-bounded. Write routes keep it current in
+# this process; the TTL bounds staleness from writes made by other worker
+# processes. The unique slot index still has the final say.
+class AvailabilityCache:
+    def __init__(self, max_entries=4096, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._writes = 0
+
+    def version(self):
+        return self._writes
+
+    def get(self, doctor, date):
+        key = (doctor, date)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (self.ttl and time.monotonic() - entry[1] > self.ttl):
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, doctor, date, slots, version=None):
+        key = (doctor, date)
+        with self._lock:
+            # A write landed while the slots were being loaded; they may be stale.
+            if version is not None and version != self._writes:
+                return
+            self._entries[key] = (slots, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def _update(self, doctor, date, slot, before, after):
+        # Same transition as the slot triggers: open <-> booked only.
+        key = (doctor, date)
+        with self._lock:
+            self._writes += 1
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            slots = tuple((t, after if t == slot and state == before else state) for t, state in entry[0])
+            self._entries[key] = (slots, entry[1])
+
+    def mark_booked(self, doctor, date, slot):
+        self._update(doctor, date, slot, 'open', 'booked')
+
+    def mark_free(self, doctor, date, slot):
+        self._update(doctor, date, slot, 'booked', 'open')
+
+    def invalidate(self, doctor=None, date=None):
+        with self._lock:
+            self._writes += 1
+            if doctor is None and date is None:
+                self._entries.clear()
+            else:
+                self._entries.pop((doctor, date), None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# -------------------------
+# Flask integration
+# -------------------------
+def init_app(app):
+    app.config.setdefault('AVAILABILITY_CACHE_SIZE', 4096)
+    app.config.setdefault('AVAILABILITY_CACHE_TTL', 30.0)
+    app.extensions['availability_cache'] = AvailabilityCache(
+        app.config['AVAILABILITY_CACHE_SIZE'], app.config['AVAILABILITY_CACHE_TTL']
+    )
+
+
+def get_cache():
+    return current_app.extensions['availability_cache']
+
+
+def available_times(doctor, date):
+    # Cache hits are answered without touching the connection pool.
+    cache = get_cache()
+    slots = cache.get(doctor, date)
+    if slots is None:
+        version = cache.version()
+        slots = load_day(db.get_db(), doctor, date)
+        cache.put(doctor, date, slots, version)
+    return open_times(slots)
+
+
+# -------------------------
+# Range matrix
+# -------------------------
+MAX_RANGE_DAYS = 62
+
+
+def date_range(start, end):
+    first = date_cls.fromisoformat(start)
+    last = date_cls.fromisoformat(end)
+    if last < first:
+        raise ValueError("end must not be before start")
+    if (last - first).days >= MAX_RANGE_DAYS:
+        raise ValueError(f"range is limited to {MAX_RANGE_DAYS} days")
+    return [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+
+
+def availability_matrix(conn, start, end, doctors):
+    # One slot-range read for every doctor; open times are sent as indexes
+    # into the shared `times` list, and the per-day cache is primed as a
+    # side effect.
+    dates = date_range(start, end)
+    cache = get_cache()
+    version = cache.version()
+    ids = {}
+    if doctors:
+        ids = dict(conn.execute(
+            f"SELECT full_name, MIN(id) FROM users WHERE role='doctor' AND full_name IN ({','.join('?' * len(doctors))}) "
+            "GROUP BY full_name", doctors
+        ))
+    days = schedules.read_days(conn, list(set(ids.values())), dates)
+
+    times = sorted({t for by_day in days.values() for slots in by_day.values() for t, _ in slots})
+    index = {t: i for i, t in enumerate(times)}
+    open_slots = {}
+    for doctor in doctors:
+        by_day = days.get(ids.get(doctor), {})
+        row = []
+        for day in dates:
+            slots = tuple(by_day.get(day, ()))
+            cache.put(doctor, day, slots, version)
+            row.append([index[t] for t in open_times(slots)])
+        open_slots[doctor] = row
+
+    return {'times': times, 'dates': dates, 'open': open_slots}
@@ -0,0 +1,124 @@
+"""Hot/cold split: hot-path latency and working-set size before and after archiving.
+
+Generates --years of history, times the day-to-day queries (availability,
+reception day view, patient page, check-in lookup) and reports the size of
+the appointments table and its indexes, then runs archive.py's batched move
+(everything finished older than --days), compacts, and measures again. A
+writer thread keeps booking during the move to show it is not blocked.
+
+    python benchmarks/archive_bench.py --doctors 40 --patients 50000 --years 5
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from common import ROOT  # noqa: F401  (puts the app modules on sys.path)
+
+import archive  # noqa: E402
+import pagination  # noqa: E402
+import seed_data  # noqa: E402
+
+
+def sizes(conn):
+    rows = conn.execute(
+        "SELECT name, SUM(pgsize) FROM dbstat WHERE name = 'appointments' OR name LIKE 'idx_appointments_%' "
+        "OR name LIKE 'uq_appointments_%' OR name LIKE 'appointments_fts%' GROUP BY name"
+    ).fetchall()
+    hot = sum(size for name, size in rows if 'archive' not in name)
+    return hot / 2 ** 20
+
+
+def probe(conn, doctors, patient_id, rounds=2000):
+    today = date.today().isoformat()
+    queries = [
+        ("SELECT time FROM appointments WHERE doctor_name=? AND date=? AND status IN ('pending', 'checked_in')",
+         lambda i: (doctors[i % len(doctors)], today)),
+        (f"SELECT * FROM appointments_history WHERE date=? AND {pagination.SEEK_AFTER}",
+         lambda i: (today, *pagination.FIRST, 51)),
+        (f"SELECT * FROM appointments_history WHERE patient_id=? AND {pagination.SEEK_AFTER}",
+         lambda i: (patient_id, *pagination.FIRST, 51)),
+        ("SELECT doctor_name, date, status, queue_number FROM appointments WHERE id=?",
+         lambda i: (i % 1000 + 1,)),
+    ]
+    samples = []
+    for i in range(rounds):
+        sql, params = queries[i % len(queries)]
+        started = time.perf_counter()
+        conn.execute(sql, params(i)).fetchall()
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99)]
+
+
+def writer(path, doctors, stop, latencies):
+    conn = sqlite3.connect(path, timeout=30)
+    rnd = random.Random(7)
+    day = date.today() + timedelta(days=500)
+    i = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO appointments (patient_name, doctor_name, date, time, status) "
+                "VALUES (?, ?, ?, ?, 'pending')",
+                ('Load Writer', rnd.choice(doctors), (day + timedelta(days=i // 500)).isoformat(),
+                 seed_data.SLOTS[i % len(seed_data.SLOTS)])
+            )
+        latencies.append((time.perf_counter() - started) * 1000)
+        i += 1
+        time.sleep(0.005)
+    conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--doctors', type=int, default=40)
+    parser.add_argument('--patients', type=int, default=50_000)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--days', type=int, default=archive.ARCHIVE_AFTER_DAYS)
+    parser.add_argument('--batch', type=int, default=archive.ARCHIVE_BATCH)
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'smartclinic_archive.db'))
+    args = parser.parse_args(argv)
+
+    conn = seed_data.generate(args.db, args.doctors, args.patients, args.years, password=None)
+    doctors = [r[0] for r in conn.execute("SELECT full_name FROM users WHERE role='doctor'")]
+    patient_id = conn.execute("SELECT patient_id FROM appointments ORDER BY id DESC LIMIT 1").fetchone()[0]
+    total = conn.execute("SELECT COUNT(*) FROM appointments").fetchone()[0]
+
+    p50, p99 = probe(conn, doctors, patient_id)
+    print(f"before: {total:>10,} hot rows  {sizes(conn):>8.1f} MB hot table+indexes   "
+          f"hot queries p50 {p50:>6.1f} us  p99 {p99:>7.1f} us")
+
+    stop, latencies = threading.Event(), []
+    thread = threading.Thread(target=writer, args=(args.db, doctors, stop, latencies))
+    thread.start()
+    started = time.perf_counter()
+    moved = archive.archive_before(conn, archive.horizon(args.days), args.batch)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    thread.join()
+    latencies.sort()
+    print(f"archived {moved:,} rows in {elapsed:.1f}s ({moved / elapsed:,.0f} rows/s); concurrent writer: "
+          f"{len(latencies)} bookings, p50 {statistics.median(latencies):.1f} ms, max {latencies[-1]:.1f} ms")
+
+    archive.compact(conn)
+    hot = conn.execute("SELECT COUNT(*) FROM appointments").fetchone()[0]
+    p50, p99 = probe(conn, doctors, patient_id)
+    print(f"after:  {hot:>10,} hot rows  {sizes(conn):>8.1f} MB hot table+indexes   "
+          f"hot queries p50 {p50:>6.1f} us  p99 {p99:>7.1f} us")
+    conn.close()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Bytes on the wire for a first and a repeat visit to the home page.
+
+Fetches / and every stylesheet, script and image it links, as a browser
+with a cache would: the repeat visit skips assets that are still fresh
+(immutable / max-age) and revalidates the rest with If-None-Match. Runs once
+with plain static/ serving and once with the assets.py manifest (build it
+first with `python assets.py build`). Header bytes are not counted.
+
+    python benchmarks/asset_bytes.py
+"""
+import os
+import re
+import sys
+import tempfile
+
+from common import build_db
+
+import app as clinic  # noqa: E402
+
+LINKS = re.compile(r'(?:src|href)="(/(?:static|assets)/[^"]+)"')
+BROWSER = {'Accept-Encoding': 'gzip, deflate, br', 'Accept': 'image/avif,image/webp,*/*'}
+
+
+def visit(client, cache):
+    sent = requests = 0
+    page = client.get('/', headers=BROWSER)
+    sent += len(page.get_data())
+    requests += 1
+    for url in LINKS.findall(page.get_data(as_text=True)):
+        cached = cache.get(url)
+        if cached and cached['fresh']:
+            continue
+        headers = dict(BROWSER)
+        if cached and cached['etag']:
+            headers['If-None-Match'] = cached['etag']
+        response = client.get(url, headers=headers)
+        requests += 1
+        sent += len(response.get_data())
+        if response.status_code == 200:
+            control = response.cache_control
+            cache[url] = {'etag': response.headers.get('ETag'),
+                          'fresh': bool(control.immutable or (control.max_age or 0) > 0)}
+        response.close()
+    return sent, requests
+
+
+def main():
+    path = os.path.join(tempfile.gettempdir(), 'smartclinic_assets.db')
+    build_db(path, rows=1000, doctors=5, patients=100).close()
+    clinic.app.config['DATABASE'] = path
+    manifest = clinic.app.extensions['assets']
+    modes = [('static/', None)]
+    if manifest is None:
+        print("no static/dist/manifest.json; run `python assets.py build` first")
+    else:
+        modes.append(('assets manifest', manifest))
+    for label, enabled in modes:
+        clinic.app.extensions['assets'] = enabled
+        client, cache = clinic.app.test_client(), {}
+        first = visit(client, cache)
+        repeat = visit(client, cache)
+        print(f"{label:<16} first visit {first[0] / 1024:>7.1f} KB in {first[1]:>2} requests   "
+              f"repeat visit {repeat[0] / 1024:>6.1f} KB in {repeat[1]:>2} requests")
+    clinic.app.extensions['assets'] = manifest
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Concurrent booking stress test.
+
+Several processes hammer a small set of hot doctor slots with bookings
+(and some cancellations, so slots keep reopening). Reports throughput and
+verifies that no slot ever holds more than one active appointment.
+
+    python benchmarks/booking_stress.py --workers 8 --attempts 1000
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from common import SLOTS, build_db
+
+import db  # noqa: E402
+import reservations  # noqa: E402
+
+
+def worker(path, seed, attempts, doctors, days, cancel_ratio, start):
+    pool = db.ConnectionPool(path, max_size=1, timeout=30)
+    conn = pool.acquire()
+    rnd = random.Random(seed)
+    booked = conflicts = cancels = 0
+    start.wait()
+    for i in range(attempts):
+        doctor = rnd.choice(doctors)
+        day = rnd.choice(days)
+        slot = rnd.choice(SLOTS)
+        try:
+            appt_id = reservations.reserve_slot(conn, f'Stress {seed}-{i}', doctor, day, slot)
+            booked += 1
+        except reservations.SlotTaken:
+            conflicts += 1
+            continue
+        if rnd.random() < cancel_ratio:
+            conn.execute("UPDATE appointments SET status='cancelled' WHERE id=?", (appt_id,))
+            conn.commit()
+            cancels += 1
+    pool.release(conn)
+    pool.close_all()
+    return booked, conflicts, cancels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--attempts', type=int, default=1000, help='booking attempts per worker')
+    parser.add_argument('--doctors', type=int, default=3, help='number of hot doctors')
+    parser.add_argument('--days', type=int, default=2, help='number of hot days')
+    parser.add_argument('--cancel-ratio', type=float, default=0.3)
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'smartclinic_stress.db'))
+    args = parser.parse_args(argv)
+
+    build_db(args.db, rows=0, doctors=args.doctors, patients=1).close()
+    doctors = [f'Dr. Bench {i:03d}' for i in range(args.doctors)]
+    days = [f'2099-01-{d + 1:02d}' for d in range(args.days)]
+
+    start = multiprocessing.Manager().Event()
+    with multiprocessing.Pool(args.workers) as procs:
+        pending = [
+            procs.apply_async(worker, (args.db, seed, args.attempts, doctors, days, args.cancel_ratio, start))
+            for seed in range(args.workers)
+        ]
+        time.sleep(0.5)
+        started = time.perf_counter()
+        start.set()
+        results = [p.get() for p in pending]
+        elapsed = time.perf_counter() - started
+
+    booked = sum(r[0] for r in results)
+    conflicts = sum(r[1] for r in results)
+    cancels = sum(r[2] for r in results)
+    attempts = args.workers * args.attempts
+
+    conn = db.ConnectionPool(args.db, max_size=1).acquire()
+    duplicates = conn.execute(
+        "SELECT COUNT(*) FROM (SELECT 1 FROM appointments WHERE status IN ('pending', 'checked_in') "
+        "GROUP BY doctor_name, date, time HAVING COUNT(*) > 1)"
+    ).fetchone()[0]
+    active = conn.execute("SELECT COUNT(*) FROM appointments WHERE status IN ('pending', 'checked_in')").fetchone()[0]
+    conn.close()
+
+    print(f"{args.workers} workers x {args.attempts} attempts on {len(doctors) * len(days) * len(SLOTS)} hot slots")
+    print(f"  elapsed      {elapsed:.2f}s  ({attempts / elapsed:,.0f} attempts/s)")
+    print(f"  booked       {booked}  (cancelled again: {cancels})")
+    print(f"  conflicts    {conflicts}")
+    print(f"  active rows  {active}")
+    print(f"  duplicates   {duplicates}")
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    ok = duplicates == 0 and active == booked - cancels
+    print("OK" if ok else "FAILED: double bookings detected")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
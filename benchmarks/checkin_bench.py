@@ -0,0 +1,126 @@
+"""Check-in throughput: legacy MAX(queue_number)+1 vs the queue counter.
+
+Seeds pending appointments for a few doctor-days, then checks them all in
+sequentially, concurrently (one process per worker) and, for the counter
+implementation, in bulk batches. Reports check-ins per second and how many
+duplicate queue numbers each strategy handed out.
+
+    python benchmarks/checkin_bench.py --per-day 600 --workers 8
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from common import build_db
+
+import db  # noqa: E402
+import reservations  # noqa: E402
+
+DAY = '2099-01-01'
+
+
+def legacy_check_in(conn, appointment_id):
+    # The pre-counter implementation, kept here only for comparison.
+    appt = conn.execute("SELECT doctor_name, date FROM appointments WHERE id=?", (appointment_id,)).fetchone()
+    max_queue = conn.execute(
+        "SELECT MAX(queue_number) FROM appointments WHERE doctor_name=? AND date=?",
+        (appt[0], appt[1])
+    ).fetchone()[0]
+    new_queue = (max_queue or 0) + 1
+    conn.execute(
+        "UPDATE appointments SET status='checked_in', queue_number=? WHERE id=?",
+        (new_queue, appointment_id)
+    )
+    conn.commit()
+    return new_queue
+
+
+STRATEGIES = {
+    'legacy': legacy_check_in,
+    'counter': reservations.check_in,
+}
+
+
+def seed(path, doctors, per_day):
+    conn = build_db(path, rows=0, doctors=doctors, patients=1)
+    rows = [
+        (f'Patient {d}-{i}', f'Dr. Bench {d:03d}', DAY, f'{i // 60:02d}:{i % 60:02d}', 'pending')
+        for d in range(doctors) for i in range(per_day)
+    ]
+    with conn:
+        conn.executemany(
+            "INSERT INTO appointments (patient_name, doctor_name, date, time, status) VALUES (?,?,?,?,?)", rows
+        )
+    ids = [r[0] for r in conn.execute("SELECT id FROM appointments ORDER BY id")]
+    conn.close()
+    return ids
+
+
+def run_ids(path, strategy, ids, batch=0):
+    pool = db.ConnectionPool(path, max_size=1, timeout=60)
+    conn = pool.acquire()
+    if batch:
+        for i in range(0, len(ids), batch):
+            reservations.check_in_many(conn, ids[i:i + batch])
+    else:
+        fn = STRATEGIES[strategy]
+        for appointment_id in ids:
+            fn(conn, appointment_id)
+    pool.release(conn)
+    pool.close_all()
+
+
+def duplicates(path):
+    conn = db.ConnectionPool(path, max_size=1).acquire()
+    dupes = conn.execute(
+        "SELECT COALESCE(SUM(n - 1), 0) FROM (SELECT COUNT(*) AS n FROM appointments "
+        "WHERE queue_number IS NOT NULL GROUP BY doctor_name, date, queue_number)"
+    ).fetchone()[0]
+    conn.close()
+    return dupes
+
+
+def measure(label, path, ids, fn):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<22} {len(ids) / elapsed:>10,.0f} check-ins/s   duplicates: {duplicates(path)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--doctors', type=int, default=4)
+    parser.add_argument('--per-day', type=int, default=600, help='pending appointments per doctor (max 1440)')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--batch', type=int, default=50, help='bulk check-in batch size')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'smartclinic_checkin.db'))
+    args = parser.parse_args(argv)
+    per_day = min(args.per_day, 1440)
+    print(f"{args.doctors} doctors x {per_day} check-ins on {DAY}")
+
+    for strategy in ('legacy', 'counter'):
+        ids = seed(args.db, args.doctors, per_day)
+        measure(f'{strategy} sequential', args.db, ids, lambda: run_ids(args.db, strategy, ids))
+
+        ids = seed(args.db, args.doctors, per_day)
+        chunks = [ids[w::args.workers] for w in range(args.workers)]
+
+        def concurrent():
+            with multiprocessing.Pool(args.workers) as procs:
+                procs.starmap(run_ids, [(args.db, strategy, chunk) for chunk in chunks])
+        measure(f'{strategy} x{args.workers} procs', args.db, ids, concurrent)
+
+    ids = seed(args.db, args.doctors, per_day)
+    measure(f'bulk batches of {args.batch}', args.db, ids, lambda: run_ids(args.db, 'counter', ids, args.batch))
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,19 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import seed_data  # noqa: E402
+
+SLOTS = seed_data.SLOTS
+STATUSES = seed_data.STATUSES
+
+
+def build_db(path, rows=1_000_000, doctors=40, patients=50_000, seed=1817, batch=50_000, target=None):
+    # Throwaway clinic database with `rows` appointments spread back from
+    # today, migrated to `target` (default: latest schema). Names follow the
+    # "Dr. Bench 000" / "Patient 000000" pattern the benchmarks query for.
+    return seed_data.generate(path, doctors, patients, rows=rows, seed=seed, batch=batch,
+                              password=None, style='bench', target=target)
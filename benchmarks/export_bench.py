@@ -0,0 +1,89 @@
+"""Export benchmark: legacy fetchall/StringIO vs streamed fetchmany CSV.
+
+For each table size, runs both implementations in a fresh process and
+reports time-to-first-byte, total time and peak RSS growth.
+
+    python benchmarks/export_bench.py --sizes 100000 500000 1000000
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from io import StringIO
+
+from common import build_db
+
+import db  # noqa: E402
+import export  # noqa: E402
+
+
+def legacy_export(pool):
+    # The pre-streaming /export body, kept here only for comparison.
+    conn = pool.acquire()
+    rows = conn.execute("SELECT * FROM appointments ORDER BY date, time").fetchall()
+    pool.release(conn)
+    si = StringIO()
+    cw = csv.writer(si)
+    cw.writerow(['id', 'patient_name', 'doctor_name', 'date', 'time', 'status'])
+    for r in rows:
+        cw.writerow([r['id'], r['patient_name'], r['doctor_name'], r['date'], r['time'], r['status']])
+    yield si.getvalue()
+
+
+def streamed_export(pool):
+    return export.iter_csv(pool)
+
+
+def gzip_export(pool):
+    return export.gzip_stream(export.iter_csv(pool))
+
+
+IMPLEMENTATIONS = {'legacy': legacy_export, 'streamed': streamed_export, 'streamed+gzip': gzip_export}
+
+
+def _maxrss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(path, name):
+    pool = db.ConnectionPool(path, max_size=1)
+    baseline = _maxrss_mb()
+    started = time.perf_counter()
+    ttfb = None
+    size = 0
+    for chunk in IMPLEMENTATIONS[name](pool):
+        if ttfb is None:
+            ttfb = time.perf_counter() - started
+        size += len(chunk)
+    total = time.perf_counter() - started
+    pool.close_all()
+    return ttfb, total, _maxrss_mb() - baseline, size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 500_000, 1_000_000])
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'smartclinic_export.db'))
+    args = parser.parse_args(argv)
+
+    ctx = multiprocessing.get_context('spawn')
+    print(f"{'rows':>10} {'impl':<14} {'ttfb ms':>9} {'total s':>8} {'peak RSS +MB':>13} {'bytes':>12}")
+    for rows in args.sizes:
+        build_db(args.db, rows=rows).close()
+        for name in IMPLEMENTATIONS:
+            with ctx.Pool(1) as proc:
+                ttfb, total, rss, size = proc.apply(measure, (args.db, name))
+            print(f"{rows:>10,} {name:<14} {ttfb * 1000:>9.1f} {total:>8.2f} {rss:>13.1f} {size:>12,}")
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,374 @@
+"""Repeatable benchmark harness: every route, latency percentiles to JSON.
+
+Generates a clinic database with seed_data.py (or reuses one with
+--reuse-db), then either
+
+* drives every route in-process through Flask's test client, one route at a
+  time, as a patient, reception or admin session; or
+* with --http URL, runs a multi-process load generator against a running
+  server (python serve.py / python app.py on the same --db) for --duration
+  seconds with --processes x --concurrency keep-alive clients.
+
+Per route it records count, errors, mean/p50/p95/p99/max latency and
+throughput, and writes them with the git revision to --out. --compare
+prints the change against an earlier result file and exits non-zero when a
+route's p95 got slower than --threshold allows.
+
+    python benchmarks/harness.py --patients 20000 --years 2
+    python benchmarks/harness.py --reuse-db --compare benchmarks/results/<old>.json
+    python benchmarks/harness.py --reuse-db --http http://127.0.0.1:8000 --processes 4 --concurrency 8
+
+/events/queue is left out (it never completes); see sse_load.py.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+from common import ROOT
+
+import seed_data  # noqa: E402
+
+PASSWORD = 'bench'
+RESULTS = os.path.join(ROOT, 'benchmarks', 'results')
+STAFF = {'reception': 'reception', 'admin': 'admin'}
+
+
+# -------------------------
+# Fixtures
+# -------------------------
+def prepare(args):
+    if not args.reuse_db or not os.path.exists(args.db):
+        started = time.perf_counter()
+        seed_data.generate(args.db, args.doctors, args.patients, args.years, args.rows,
+                           password=PASSWORD, seed=args.seed).close()
+        print(f"generated {args.db} in {time.perf_counter() - started:.1f}s")
+    conn = sqlite3.connect(args.db)
+    conn.row_factory = sqlite3.Row
+    today = date.today().isoformat()
+    busiest = conn.execute(
+        "SELECT patient_id FROM appointments GROUP BY patient_id ORDER BY COUNT(*) DESC LIMIT 1"
+    ).fetchone()[0]
+    patient = conn.execute("SELECT id, username, full_name FROM users WHERE id=?", (busiest,)).fetchone()
+    fixtures = {
+        'today': today,
+        'appointments': conn.execute("SELECT COUNT(*) FROM appointments").fetchone()[0],
+        'doctors': [r[0] for r in conn.execute("SELECT full_name FROM users WHERE role='doctor' ORDER BY id")],
+        'patient': dict(patient),
+        'staff': {role: dict(conn.execute("SELECT id, username, full_name FROM users WHERE username=?",
+                                          (username,)).fetchone())
+                  for role, username in STAFF.items()},
+        'own': [r[0] for r in conn.execute(
+            "SELECT id FROM appointments WHERE patient_id=? ORDER BY id DESC LIMIT 50", (busiest,))],
+        # Rows the write routes consume; each is checked in or cancelled once.
+        'checkin': [r[0] for r in conn.execute(
+            "SELECT id FROM appointments WHERE date=? AND status='pending' ORDER BY id", (today,))],
+        'cancel': [r[0] for r in conn.execute(
+            "SELECT id FROM appointments WHERE date>? AND status='pending' ORDER BY id", (today,))],
+    }
+    fixtures['surname'] = fixtures['patient']['full_name'].split()[-1]
+    conn.close()
+    return fixtures
+
+
+def routes(fx):
+    # (name, role, method, build(i) -> (path, form), max iterations or None)
+    doctors, today = fx['doctors'], fx['today']
+    week = (date.today() + timedelta(days=6)).isoformat()
+    last_month = (date.today() - timedelta(days=30)).isoformat()
+    booking_day = date.today() + timedelta(days=400)
+
+    def doctor(i):
+        return doctors[i % len(doctors)]
+
+    def book(i):
+        day = (booking_day + timedelta(days=i // (len(doctors) * len(seed_data.SLOTS)))).isoformat()
+        slot = seed_data.SLOTS[(i // len(doctors)) % len(seed_data.SLOTS)]
+        return '/booking', {'doctor_name': doctor(i), 'date': day, 'time': slot}
+
+    return [
+        ('home', 'patient', 'GET', lambda i: ('/', None), None),
+        ('contact', 'patient', 'GET', lambda i: ('/contact', None), None),
+        ('login_page', None, 'GET', lambda i: ('/login', None), None),
+        ('login', None, 'POST', lambda i: ('/login', {'action': 'login', 'username': fx['patient']['username'],
+                                                      'password': PASSWORD}), 20),
+        ('booking_page', 'patient', 'GET', lambda i: ('/booking', None), None),
+        ('booking', 'patient', 'POST', book, None),
+        ('doctor_availability', 'patient', 'GET', lambda i: (
+            '/api/doctor_availability?' + urlencode({'doctor': doctor(i), 'date': today}), None), None),
+        ('availability_range', 'patient', 'GET', lambda i: (
+            '/api/availability_range?' + urlencode({'start': today, 'end': week}), None), None),
+        ('search_people', 'patient', 'GET', lambda i: (
+            '/api/search?' + urlencode({'q': doctor(i).split()[1][:3]}), None), None),
+        ('search_appointments', 'reception', 'GET', lambda i: (
+            '/api/search?' + urlencode({'q': fx['surname'], 'type': 'appointments'}), None), None),
+        ('appointments_api', 'patient', 'GET', lambda i: ('/api/appointments?per_page=20', None), None),
+        ('patient_dashboard', 'patient', 'GET', lambda i: ('/patient_dashboard', None), None),
+        ('edit_page', 'patient', 'GET', lambda i: (f"/edit/{fx['own'][i % len(fx['own'])]}", None), None),
+        ('reception', 'reception', 'GET', lambda i: ('/reception', None), None),
+        ('reception_doctor', 'reception', 'GET', lambda i: (
+            '/reception?' + urlencode({'doctor': doctor(i)}), None), None),
+        ('checkin', 'reception', 'GET', lambda i: (f"/checkin/{fx['checkin'][i]}", None), len(fx['checkin'])),
+        ('cancel', 'reception', 'GET', lambda i: (f"/cancel/{fx['cancel'][i]}", None), len(fx['cancel'])),
+        ('admin', 'admin', 'GET', lambda i: ('/admin', None), None),
+        ('stats_api', 'admin', 'GET', lambda i: (
+            '/api/stats?' + urlencode({'date': last_month, 'end': today}), None), None),
+        ('export_month', 'admin', 'GET', lambda i: (
+            '/export?' + urlencode({'start': last_month, 'end': today}), None), 20),
+        ('export_all', 'admin', 'GET', lambda i: ('/export', None), 3),
+        ('db_stats', 'admin', 'GET', lambda i: ('/api/db_stats', None), None),
+        ('metrics', 'admin', 'GET', lambda i: ('/metrics', None), None),
+    ]
+
+
+# -------------------------
+# Summaries
+# -------------------------
+def pct(values, q):
+    return values[min(int(len(values) * q), len(values) - 1)] if values else None
+
+
+def summarise(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    ms = lambda v: None if v is None else round(v * 1000, 3)  # noqa: E731
+    return {
+        'count': len(latencies),
+        'errors': errors,
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'p50_ms': ms(pct(latencies, 0.50)),
+        'p95_ms': ms(pct(latencies, 0.95)),
+        'p99_ms': ms(pct(latencies, 0.99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+
+def git_revision():
+    try:
+        sha = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return sha + ('-dirty' if dirty else '')
+
+
+# -------------------------
+# In-process mode (Flask test client)
+# -------------------------
+def run_client(args, fx):
+    import app as clinic
+    clinic.app.config['DATABASE'] = args.db
+    identities = {'patient': fx['patient'], **fx['staff']}
+    clients = {}
+    for role in (None, 'patient', 'reception', 'admin'):
+        clients[role] = clinic.app.test_client()
+        if role:
+            who = identities[role]
+            with clients[role].session_transaction() as session:
+                session.update(user_id=who['id'], username=who['username'], role=role, full_name=who['full_name'])
+
+    results = {}
+    try:
+        for name, role, method, build, limit in routes(fx):
+            if args.only and name not in args.only:
+                continue
+            count = args.iterations if limit is None else min(args.iterations, limit)
+            client = clients[role]
+            for i in range(min(args.warmup, count) if method == 'GET' and limit is None else 0):
+                path, form = build(i)
+                client.open(path, method=method, data=form).close()
+            latencies, errors = [], 0
+            started = time.perf_counter()
+            for i in range(count):
+                path, form = build(i)
+                t0 = time.perf_counter()
+                response = client.open(path, method=method, data=form)
+                response.get_data()
+                response.close()
+                latencies.append(time.perf_counter() - t0)
+                errors += response.status_code >= 400
+            results[name] = summarise(latencies, errors, time.perf_counter() - started)
+            print(format_row(name, results[name]))
+    finally:
+        if clinic.app.extensions['password_hasher'] is not None:
+            clinic.app.extensions['password_hasher'].close()
+    return results
+
+
+# -------------------------
+# HTTP mode (multi-process load generator)
+# -------------------------
+def http_login(target, username):
+    conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+    conn.request('POST', '/login', body=urlencode({'action': 'login', 'username': username, 'password': PASSWORD}),
+                 headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    cookie = response.getheader('Set-Cookie')
+    if not cookie:
+        raise RuntimeError(f"login as {username} failed ({response.status})")
+    return cookie.split(';', 1)[0]
+
+
+def http_worker(url, fx, names, concurrency, duration, seed):
+    # One process: `concurrency` threads share the process's route mix and
+    # each keeps its own keep-alive connection. Read-only routes only.
+    import threading
+    target = urlsplit(url)
+    cookies = {None: None, 'patient': http_login(target, fx['patient']['username'])}
+    for role, who in fx['staff'].items():
+        cookies[role] = http_login(target, who['username'])
+    mix = [(name, role, build) for name, role, method, build, limit in routes(fx)
+           if method == 'GET' and limit is None and name in names]
+    samples = {name: [] for name, _, _ in mix}
+    errors = {name: 0 for name, _, _ in mix}
+    deadline = time.perf_counter() + duration
+
+    def loop(n):
+        rnd = random.Random(seed * 1000 + n)
+        conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+        i = 0
+        while time.perf_counter() < deadline:
+            name, role, build = rnd.choice(mix)
+            path, _ = build(i)
+            i += 1
+            t0 = time.perf_counter()
+            try:
+                conn.request('GET', path, headers={'Cookie': cookies[role]} if role else {})
+                response = conn.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                errors[name] += 1
+                conn.close()
+                continue
+            if response.status >= 400:
+                errors[name] += 1
+                continue
+            samples[name].append(time.perf_counter() - t0)
+        conn.close()
+
+    threads = [threading.Thread(target=loop, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, errors
+
+
+def run_http(args, fx):
+    names = {name for name, _, method, _, limit in routes(fx) if method == 'GET' and limit is None}
+    if args.only:
+        names &= set(args.only)
+    jobs = [(args.http, fx, names, args.concurrency, args.duration, n) for n in range(args.processes)]
+    with multiprocessing.get_context('spawn').Pool(args.processes) as pool:
+        parts = pool.starmap(http_worker, jobs)
+    # Workers log in before their clock starts, so throughput is over --duration.
+    elapsed = args.duration
+    results = {}
+    for name in sorted(names):
+        latencies = [v for samples, _ in parts for v in samples[name]]
+        results[name] = summarise(latencies, sum(errors[name] for _, errors in parts), elapsed)
+        print(format_row(name, results[name]))
+    everything = [v for samples, _ in parts for values in samples.values() for v in values]
+    results['_all'] = summarise(everything, sum(sum(e.values()) for _, e in parts), elapsed)
+    print(format_row('_all', results['_all']))
+    return results
+
+
+# -------------------------
+# Output
+# -------------------------
+def format_row(name, r):
+    cell = lambda v: '-' if v is None else f'{v:.2f}'  # noqa: E731
+    return (f"{name:<22} {r['count']:>6} {r['errors']:>4} {cell(r['p50_ms']):>9} {cell(r['p95_ms']):>9} "
+            f"{cell(r['p99_ms']):>9} {cell(r['rps']):>9}")
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nagainst {baseline_path} ({baseline['meta'].get('revision')}), p95 threshold +{threshold:.0%}")
+    regressions = []
+    for name, r in results.items():
+        old = baseline['routes'].get(name)
+        if not old or not old.get('p95_ms') or r['p95_ms'] is None:
+            continue
+        change = r['p95_ms'] / old['p95_ms'] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<22} p95 {old['p95_ms']:>9.2f} -> {r['p95_ms']:>9.2f} ms  {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'smartclinic_harness.db'))
+    parser.add_argument('--reuse-db', action='store_true', help='keep an existing --db instead of regenerating it')
+    parser.add_argument('--doctors', type=int, default=40)
+    parser.add_argument('--patients', type=int, default=20_000)
+    parser.add_argument('--years', type=int, default=2)
+    parser.add_argument('--rows', type=int, help='cap the number of generated appointments')
+    parser.add_argument('--seed', type=int, default=1817)
+    parser.add_argument('--iterations', type=int, default=200, help='requests per route (test-client mode)')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--only', nargs='+', help='route names to run')
+    parser.add_argument('--http', metavar='URL', help='load-test a running server instead')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads per process')
+    parser.add_argument('--duration', type=float, default=15, help='seconds (HTTP mode)')
+    parser.add_argument('--out', help='result file (default benchmarks/results/<revision>-<mode>.json)')
+    parser.add_argument('--compare', metavar='JSON', help='earlier result file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p95 slowdown, 0.2 = 20%%')
+    args = parser.parse_args(argv)
+
+    if os.path.abspath(args.db) == os.path.join(ROOT, 'clinic.db'):
+        sys.exit("Refusing to benchmark against clinic.db; pick another --db.")
+    fx = prepare(args)
+    mode = 'http' if args.http else 'client'
+    print(f"{fx['appointments']:,} appointments, {len(fx['doctors'])} doctors; mode {mode}")
+    print(f"{'route':<22} {'count':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+    results = run_http(args, fx) if args.http else run_client(args, fx)
+
+    revision = git_revision()
+    report = {
+        'meta': {
+            'revision': revision,
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'mode': mode,
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'cpus': os.cpu_count(),
+            'appointments': fx['appointments'],
+            'doctors': len(fx['doctors']),
+            'args': {k: v for k, v in vars(args).items() if k not in ('out', 'compare')},
+        },
+        'routes': results,
+    }
+    out = args.out or os.path.join(RESULTS, f"{revision or 'unknown'}-{mode}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {out}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Password hashing: inline on request threads vs the process-pool service.
+
+Simulates a login storm (--logins verifications from --threads request
+threads) while a probe thread keeps issuing a cheap availability-style
+query, for each cost in --costs. Shows login throughput/latency and how
+much the unrelated probe requests are slowed down in each mode, plus the
+raw compute time per hash to help pick a cost.
+
+    python benchmarks/hash_bench.py --costs 260000 600000 --threads 16 --logins 64
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from common import build_db
+
+from passwords import HashingBusy, PasswordHasher  # noqa: E402
+
+
+def probe(path, stop, samples):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    while not stop.is_set():
+        started = time.perf_counter()
+        conn.execute(
+            "SELECT time FROM appointments WHERE doctor_name=? AND date=? AND status IN ('pending', 'checked_in')",
+            ('Dr. Bench 001', '2030-01-01')
+        ).fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.002)
+    conn.close()
+
+
+def storm(hasher, stored, threads, logins):
+    latencies, rejected = [], []
+
+    def worker(count):
+        for _ in range(count):
+            started = time.perf_counter()
+            try:
+                assert hasher.verify(stored, 'correct horse')
+            except HashingBusy:
+                rejected.append(1)
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    per_thread = [logins // threads + (i < logins % threads) for i in range(threads)]
+    pool = [threading.Thread(target=worker, args=(n,)) for n in per_thread]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return time.perf_counter() - started, sorted(latencies), len(rejected)
+
+
+def pct(values, q):
+    return values[min(int(len(values) * q), len(values) - 1)] if values else float('nan')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--costs', type=int, nargs='+', default=[260_000, 600_000])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--logins', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--queue', type=int, default=64)
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'smartclinic_hash.db'))
+    args = parser.parse_args(argv)
+    build_db(args.db, rows=50_000).close()
+
+    print(f"{args.logins} logins from {args.threads} threads; pool of {args.workers} processes, queue {args.queue}")
+    print(f"{'cost':>8} {'mode':<8} {'compute':>8} {'logins/s':>9} {'login p95':>10} "
+          f"{'probe p50':>10} {'probe p99':>10} {'rejected':>9}")
+    for cost in args.costs:
+        method = f'pbkdf2:sha256:{cost}'
+        for mode, workers in (('inline', 0), ('pool', args.workers)):
+            hasher = PasswordHasher(method, workers=workers, max_queue=args.queue)
+            stored = hasher.hash('correct horse')  # also warms the pool up
+            compute = hasher.stats()['hash']['compute_p50_ms']
+
+            stop, samples = threading.Event(), []
+            prober = threading.Thread(target=probe, args=(args.db, stop, samples))
+            prober.start()
+            elapsed, latencies, rejected = storm(hasher, stored, args.threads, args.logins)
+            stop.set()
+            prober.join()
+            hasher.close()
+
+            samples.sort()
+            print(f"{cost:>8} {mode:<8} {compute:>7.0f}ms {len(latencies) / elapsed:>9.1f} "
+                  f"{pct(latencies, 0.95):>8.0f}ms {statistics.median(samples):>8.2f}ms "
+                  f"{pct(samples, 0.99):>8.2f}ms {rejected:>9}")
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Bulk import vs one request per row: rows per second.
+
+Builds a clinic database, then loads --patients new patients and
+--appointments new future bookings two ways: through the per-row routes
+(/register, /booking: one request, one transaction and one hash per row;
+only --baseline rows, extrapolated) and through /admin/import (streamed CSV
+/ NDJSON, chunked executemany). --hashed of the imported patients carry a
+password, which the import hashes on the process pool; the rest get
+accounts that cannot sign in yet.
+
+    python benchmarks/import_bench.py --patients 20000 --appointments 50000 --hashed 200
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from common import SLOTS
+
+import seed_data  # noqa: E402
+
+PASSWORD = 'bench'
+
+
+def login(client, username):
+    response = client.post('/login', data={'action': 'login', 'username': username, 'password': PASSWORD})
+    assert response.status_code == 302, f"login as {username} failed"
+
+
+def future_slots(doctors, count, offset_days):
+    start = date.today() + timedelta(days=offset_days)
+    i = 0
+    while i < count:
+        day = (start + timedelta(days=i // (len(doctors) * len(SLOTS)))).isoformat()
+        doctor = doctors[i // len(SLOTS) % len(doctors)]
+        yield doctor, day, SLOTS[i % len(SLOTS)]
+        i += 1
+
+
+def per_row(clinic, doctors, rows):
+    client = clinic.app.test_client()
+    login(client, 'admin')
+    started = time.perf_counter()
+    for i in range(rows):
+        client.post('/register', data={'role': 'patient', 'username': f'row_patient_{i}',
+                                       'full_name': f'Row Patient {i}', 'email': '', 'password': PASSWORD})
+    register = rows / (time.perf_counter() - started)
+    client = clinic.app.test_client()
+    login(client, 'patient_000000')
+    started = time.perf_counter()
+    for doctor, day, slot in future_slots(doctors, rows, 400):
+        client.post('/booking', data={'doctor_name': doctor, 'date': day, 'time': slot})
+    booking = rows / (time.perf_counter() - started)
+    return register, booking
+
+
+def bulk(client, kind, body, content_type):
+    response = client.post(f'/admin/import?kind={kind}', data=body, content_type=content_type)
+    report = response.get_json()
+    assert response.status_code == 200 and not report['rejected'], report
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=20_000)
+    parser.add_argument('--appointments', type=int, default=50_000)
+    parser.add_argument('--hashed', type=int, default=200, help='imported patients that carry a password')
+    parser.add_argument('--baseline', type=int, default=200, help='rows sent through the per-row routes')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'smartclinic_import.db'))
+    args = parser.parse_args(argv)
+
+    seed_data.generate(args.db, doctors=40, patients=2000, years=1, password=PASSWORD).close()
+    import app as clinic
+    clinic.app.config.update(DATABASE=args.db, PAGE_CACHE_ENABLED=False)
+    with clinic.app.app_context():
+        doctors = [r[0] for r in clinic.db.get_db().execute(
+            "SELECT full_name FROM users WHERE role='doctor' ORDER BY id")]
+
+    register, booking = per_row(clinic, doctors, args.baseline)
+    print(f"per-row routes     /register {register:>9,.0f} rows/s   /booking {booking:>9,.0f} rows/s")
+
+    client = clinic.app.test_client()
+    login(client, 'admin')
+    csv_body = io.StringIO()
+    csv_body.write('username,full_name,email,password\n')
+    for i in range(args.patients):
+        password = PASSWORD if i < args.hashed else ''
+        csv_body.write(f'import_{i:06d},Imported Patient {i},import_{i:06d}@clinic.test,{password}\n')
+    patients = bulk(client, 'patients', csv_body.getvalue().encode(), 'text/csv')
+    appointments = bulk(client, 'appointments', ''.join(
+        json.dumps({'patient_username': f'import_{i % args.patients:06d}', 'doctor_name': doctor,
+                    'date': day, 'time': slot}) + '\n'
+        for i, (doctor, day, slot) in enumerate(future_slots(doctors, args.appointments, 800))
+    ).encode(), 'application/x-ndjson')
+    print(f"/admin/import      patients  {patients['rows_per_second']:>9,.0f} rows/s   "
+          f"appointments {appointments['rows_per_second']:>9,.0f} rows/s   "
+          f"({patients['rows']:,} patients, {args.hashed} hashed, in {patients['seconds']:.1f}s; "
+          f"{appointments['rows']:,} appointments in {appointments['seconds']:.1f}s)")
+
+    if clinic.app.extensions['password_hasher'] is not None:
+        clinic.app.extensions['password_hasher'].close()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""Instrumentation overhead: the same request mix with metrics on and off.
+
+Each mode runs in a fresh interpreter (CLINIC_METRICS=1/0) against one
+generated database and drives /api/doctor_availability, /patient_dashboard
+and /api/appointments through the Flask test client. Prints per-request
+mean and p99 for both, so the cost of the request hooks, the instrumented
+SQLite connection and template timing can be read directly.
+
+    python benchmarks/metrics_overhead.py --requests 5000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import build_db
+
+
+def drive(path, count):
+    import app as clinic
+    clinic.app.config['DATABASE'] = path
+    client = clinic.app.test_client()
+    with client.session_transaction() as session:
+        session.update(user_id=1, role='patient', full_name='Patient 000000')
+    paths = [
+        '/api/doctor_availability?doctor=Dr.+Bench+001&date=2030-01-01',
+        '/patient_dashboard',
+        '/api/appointments?per_page=20',
+    ]
+    for p in paths:
+        client.get(p)
+    samples = []
+    for i in range(count):
+        started = time.perf_counter()
+        client.get(paths[i % len(paths)])
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    mode = 'on' if clinic.app.config['METRICS_ENABLED'] else 'off'
+    print(f"metrics {mode:<3}  mean {sum(samples) / len(samples):>8.1f} us   "
+          f"p50 {samples[len(samples) // 2]:>8.1f} us   p99 {samples[int(len(samples) * 0.99)]:>8.1f} us")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'smartclinic_metrics.db'))
+    parser.add_argument('--drive', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.drive:
+        drive(args.db, args.requests)
+        return 0
+
+    build_db(args.db, rows=args.rows).close()
+    for flag in ('0', '1'):
+        subprocess.run(
+            [sys.executable, __file__, '--drive', '--db', args.db, '--requests', str(args.requests)],
+            env=dict(os.environ, CLINIC_METRICS=flag), check=True,
+        )
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
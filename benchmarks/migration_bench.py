@@ -0,0 +1,122 @@
+"""Online migration benchmark for the appointment user-id foreign keys.
+
+Builds a database at schema version 5 (names only), then applies the
+remaining migrations -- add columns and indexes, batched id backfill --
+while a separate process keeps booking appointments. The writer uses the
+app's connection settings (db.DEFAULT_PRAGMAS, 5s busy_timeout), so a step
+that holds the write lock longer shows up as lock errors. Reports each
+step's time and the longest writer stall while it ran.
+
+    python benchmarks/migration_bench.py --rows 3000000 --batch 5000
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from common import build_db
+
+import db  # noqa: E402
+import migrations  # noqa: E402
+
+
+def writer(path, stop, results):
+    # Plays the part of the running clinic: name-only inserts (older code)
+    # plus a day-view read, each timed individually.
+    conn = sqlite3.connect(path)
+    for name, value in db.DEFAULT_PRAGMAS.items():
+        conn.execute(f'PRAGMA {name}={value}')
+    samples, i = [], 0
+    while not stop.is_set():
+        started = time.monotonic()
+        failed = False
+        try:
+            conn.execute(
+                "INSERT INTO appointments (patient_name, doctor_name, date, time, status) VALUES (?,?,?,?,?)",
+                ('Patient 000001', 'Dr. Bench 000', f'2100-{1 + i // 1440 % 12:02d}-01',
+                 f'{i % 1440 // 60:02d}:{i % 60:02d}', 'pending')
+            )
+            conn.commit()
+            conn.execute("SELECT COUNT(*) FROM appointments WHERE date=?", ('2100-01-01',)).fetchone()
+        except sqlite3.OperationalError:
+            failed = True
+            conn.rollback()
+        samples.append((started, time.monotonic() - started, failed))
+        i += 1
+        time.sleep(0.002)
+    conn.close()
+    results.put(samples)
+
+
+def pct(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--batch', type=int, default=migrations.BACKFILL_BATCH)
+    parser.add_argument('--pause', type=float, default=migrations.BACKFILL_PAUSE)
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'smartclinic_migrate.db'))
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    conn = build_db(args.db, rows=args.rows, target=5)
+    conn.execute('PRAGMA synchronous=NORMAL')
+    print(f"Generated {args.rows:,} appointments at schema 5 in {time.perf_counter() - started:.1f}s")
+
+    stop = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=writer, args=(args.db, stop, results))
+    proc.start()
+    time.sleep(0.5)
+
+    steps = []
+    for number, name, step in migrations.MIGRATIONS:
+        if number <= migrations.current_version(conn):
+            continue
+        step_started = time.monotonic()
+        if callable(step):
+            step(conn, batch_size=args.batch, pause=args.pause)
+            conn.execute(f'PRAGMA user_version={number}')
+            conn.commit()
+        else:
+            migrations.migrate(conn, target=number)
+        steps.append((number, name, step_started, time.monotonic()))
+
+    time.sleep(0.5)
+    stop.set()
+    samples = results.get()
+    proc.join()
+    latencies = sorted(s[1] for s in samples)
+    errors = sum(s[2] for s in samples)
+
+    missing = conn.execute(
+        "SELECT COUNT(*) FROM appointments WHERE patient_id IS NULL OR doctor_id IS NULL"
+    ).fetchone()[0]
+    conn.close()
+
+    for number, name, started, finished in steps:
+        # Writes that overlapped the step, including ones that began before it.
+        during = [s for s in samples if s[0] < finished and s[0] + s[1] > started]
+        stall = max((s[1] for s in during), default=0.0)
+        print(f"  migration {number:<2} {finished - started:>8.2f}s  max stall {stall * 1000:>8.1f} ms  "
+              f"{sum(s[2] for s in during)} lock errors  {name}")
+    total = sum(finished - started for _, _, started, finished in steps)
+    print(f"  total        {total:>8.2f}s  ({args.rows / total:,.0f} rows/s)")
+    print(f"writer: {len(latencies)} writes during migration, {errors} lock errors")
+    print(f"  latency p50 {pct(latencies, 0.5) * 1000:.1f} ms  p99 {pct(latencies, 0.99) * 1000:.1f} ms  "
+          f"max {latencies[-1] * 1000 if latencies else 0:.1f} ms")
+    print(f"rows still missing ids: {missing}")
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    return 0 if missing == 0 and errors == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""Appointment lists: fetchall() of a doctor's history vs one keyset page.
+
+Builds databases of growing size and, for the busiest doctor, compares the
+old "SELECT every row, ORDER BY date, time" list with a single page from
+pagination.fetch_page(), plus a page deep in the history (seeked via a
+cursor). Keyset pages should cost the same whatever the history size.
+
+    python benchmarks/pagination_bench.py --sizes 100000 1000000 --per-page 50
+"""
+import argparse
+import os
+import statistics
+import sqlite3
+import sys
+import tempfile
+import time
+
+from common import build_db
+
+import pagination  # noqa: E402
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--per-page', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'smartclinic_pages.db'))
+    args = parser.parse_args(argv)
+
+    print(f"{'rows':>10} {'history':>8} {'fetchall ms':>12} {'first page':>11} {'deep page':>10}")
+    for rows in args.sizes:
+        conn = build_db(args.db, rows=rows)
+        conn.row_factory = sqlite3.Row
+        doctor_id, history = conn.execute(
+            "SELECT doctor_id, COUNT(*) FROM appointments GROUP BY doctor_id ORDER BY 2 DESC LIMIT 1"
+        ).fetchone()
+        filters = [("doctor_id=?", (doctor_id,))]
+
+        full_ms, full = timed(lambda: conn.execute(
+            "SELECT * FROM appointments WHERE doctor_id=? ORDER BY date, time", (doctor_id,)
+        ).fetchall(), args.repeat)
+        first_ms, _ = timed(lambda: pagination.fetch_page(conn, filters, limit=args.per_page), args.repeat)
+        cursor = pagination.encode_cursor(full[len(full) * 3 // 4])
+        deep_ms, _ = timed(lambda: pagination.fetch_page(conn, filters, after=cursor, limit=args.per_page),
+                           args.repeat)
+        print(f"{rows:>10,} {history:>8,} {full_ms:>12.2f} {first_ms:>11.3f} {deep_ms:>10.3f}")
+        conn.close()
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
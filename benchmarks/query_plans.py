@@ -0,0 +1,156 @@
+"""Query-plan regression check.
+
+Collects every SQL statement literal from the application modules, runs
+EXPLAIN QUERY PLAN for each against a generated multi-million-row
+database and exits non-zero if any of them falls back to a table scan.
+
+    python benchmarks/query_plans.py              # 2,000,000 rows
+    python benchmarks/query_plans.py --rows 200000 --db /tmp/plans.db --keep
+"""
+import argparse
+import ast
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+from common import ROOT, build_db
+
+SOURCES = ['app.py', 'reservations.py', 'availability.py', 'export.py', 'stats.py', 'users.py', 'search.py',
+           'archive.py', 'importer.py', 'schedules.py']
+SQL_START = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b')
+SCAN = re.compile(r'\bSCAN (\w+)(.*)')
+# FTS5 reports a MATCH lookup as "SCAN x VIRTUAL TABLE INDEX 0:M..".
+FTS_MATCH = re.compile(r'VIRTUAL TABLE INDEX \d+:M')
+
+# Statements that are allowed to scan, with the reason. Keep this short.
+ALLOWED_SCANS = {
+    "INSERT INTO status_totals (status, count) SELECT status, SUM(count) FROM daily_stats GROUP BY status":
+        "explicit full rebuild of the summary tables",
+    "SELECT COUNT(*), IFNULL(SUM(date = ?), 0), IFNULL(SUM(status = 'checked_in'), 0), "
+    "IFNULL(SUM(status = 'cancelled'), 0) FROM appointments_history":
+        "stats.dashboard_live: reference recount, verification only",
+}
+# Tables whose size does not grow with history; scanning them is fine.
+# days: importer's VALUES list; schedule_templates: a few rows per doctor.
+BOUNDED_TABLES = {'status_totals', 'sqlite_sequence', 'days', 'schedule_templates'}
+
+
+def collect_statements(sources=SOURCES):
+    found = []
+    for name in sources:
+        path = os.path.join(ROOT, name)
+        with open(path, encoding='utf-8') as fh:
+            tree = ast.parse(fh.read(), filename=name)
+        # Literal pieces of f-strings are fragments, not statements.
+        fragments = {id(v) for n in ast.walk(tree) if isinstance(n, ast.JoinedStr) for v in n.values}
+        for node in ast.walk(tree):
+            if id(node) in fragments:
+                continue
+            if isinstance(node, ast.Constant) and isinstance(node.value, str) and SQL_START.match(node.value):
+                found.append((name, node.lineno, ' '.join(node.value.split())))
+    return found
+
+
+def dynamic_statements():
+    # Statements assembled at runtime, in their widest and narrowest forms.
+    import archive
+    import export
+    import pagination
+    pages = [
+        (where, seek) for where in ("date=?", "doctor_id=?", "doctor_id=? AND date=?", "patient_id=?")
+        for seek in (pagination.SEEK_AFTER, pagination.SEEK_BEFORE)
+    ]
+    return [
+        ('export.py', 'build_query', export.build_query(export.CSV_COLUMNS)[0]),
+        ('export.py', 'build_query', export.build_query(export.CSV_COLUMNS, 'a', 'b', ['pending'])[0]),
+        ('export.py', 'build_query', export.build_query(export.COLUMNS, since_id=0, until_id=1)[0]),
+        ('search.py', 'search_people',
+         "SELECT u.id FROM people_fts JOIN users u ON u.id = people_fts.rowid "
+         "WHERE people_fts MATCH ? AND u.role IN (?,?) ORDER BY people_fts.rank LIMIT ? OFFSET ?"),
+        ('archive.py', 'archive_before',
+         f"INSERT OR IGNORE INTO appointments_archive ({archive.HISTORY_COLUMNS}, archived_at) "
+         f"SELECT {archive.HISTORY_COLUMNS}, datetime('now') FROM appointments WHERE id IN (?,?)"),
+        ('archive.py', 'archive_before', "DELETE FROM appointments WHERE id IN (?,?)"),
+        ('schedules.py', 'read_days',
+         "SELECT h.doctor_id, h.first_date, h.last_date, s.date, s.time, s.state FROM slot_horizon h "
+         "LEFT JOIN slots s ON s.doctor_id = h.doctor_id AND s.date BETWEEN ? AND ? "
+         "WHERE h.doctor_id IN (?,?) ORDER BY h.doctor_id, s.date, s.time"),
+        ('schedules.py', 'read_day', "SELECT time, state FROM slots WHERE doctor_id=? AND date=? ORDER BY time"),
+        ('schedules.py', 'claim',
+         "UPDATE slots SET state='booked' WHERE doctor_id=? AND date=? AND time=? AND state='open'"),
+        ('availability.py', 'availability_matrix',
+         "SELECT full_name, MIN(id) FROM users WHERE role='doctor' AND full_name IN (?,?) GROUP BY full_name"),
+        ('importer.py', 'flush', "SELECT username FROM users WHERE username IN (?,?)"),
+        ('importer.py', 'flush', "SELECT username, id, full_name FROM users WHERE role='patient' AND username IN (?,?)"),
+        ('importer.py', '_load_booked',
+         "WITH days (doctor_name, date) AS (VALUES (?,?),(?,?)) SELECT a.doctor_name, a.date, a.time FROM days "
+         "JOIN appointments a ON a.doctor_name = days.doctor_name AND a.date = days.date "
+         "WHERE a.status IN ('pending', 'checked_in')"),
+    ] + [('pagination.py', 'fetch_page', f"SELECT * FROM appointments_history WHERE {where} AND {seek}")
+         for where, seek in pages]
+
+
+def scans_in(conn, sql):
+    params = [None] * sql.count('?')
+    plan = conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    has_where = re.search(r'\bWHERE\b', sql, re.I) is not None
+    bad = []
+    for row in plan:
+        detail = row[-1]
+        m = SCAN.search(detail)
+        if not m or m.group(1) in BOUNDED_TABLES or 'CONSTANT ROW' in detail \
+                or FTS_MATCH.search(detail):
+            continue
+        # A full read with no predicate (export, totals) is expected; an
+        # index walk is only acceptable there too.
+        if has_where or 'USING' not in m.group(2):
+            bad.append(detail)
+    return plan, bad
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'smartclinic_plans.db'))
+    parser.add_argument('--reuse', action='store_true', help='use an existing --db instead of regenerating it')
+    parser.add_argument('--keep', action='store_true', help='keep the generated database afterwards')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.reuse and os.path.exists(args.db):
+        conn = sqlite3.connect(args.db)
+    else:
+        started = time.perf_counter()
+        conn = build_db(args.db, rows=args.rows)
+        print(f"Generated {args.rows:,} appointments in {time.perf_counter() - started:.1f}s")
+
+    failures = 0
+    statements = collect_statements() + dynamic_statements()
+    for source, line, sql in statements:
+        plan, bad = scans_in(conn, sql)
+        allowed = ALLOWED_SCANS.get(sql)
+        if bad and not allowed:
+            failures += 1
+            print(f"FAIL {source}:{line}: {sql}")
+            for detail in bad:
+                print(f"     {detail}")
+        elif args.verbose:
+            status = f"allowed ({allowed})" if bad else "ok"
+            print(f"{status:>4} {source}:{line}: {sql}")
+            for row in plan:
+                print(f"     {row[-1]}")
+
+    conn.close()
+    if not args.keep and not args.reuse:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    print(f"{len(statements)} statements checked, {failures} scanning")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""Name search: LIKE '%term%' scans vs the FTS5 index, as the table grows.
+
+For each size, generates a database and times the same set of patient-name
+lookups both ways: the substring LIKE the reception page used to run and
+search.search_appointments() (prefix match via appointments_fts). A term
+that matches nothing shows the worst case for the scan.
+
+    python benchmarks/search_bench.py --sizes 50000 200000 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from common import build_db
+
+import search  # noqa: E402
+
+LIKE_SQL = ("SELECT id, patient_name, doctor_name, date, time, status FROM appointments "
+            "WHERE patient_name LIKE ? OR doctor_name LIKE ? ORDER BY date DESC LIMIT ?")
+
+
+def timed(fn, terms):
+    samples = []
+    for term in terms:
+        started = time.perf_counter()
+        fn(term)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50_000, 200_000, 1_000_000])
+    parser.add_argument('--patients', type=int, default=50_000)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'smartclinic_search.db'))
+    args = parser.parse_args(argv)
+    rnd = random.Random(7)
+    terms = [f'{rnd.randrange(args.patients):06d}' for _ in range(args.queries)]
+
+    print(f"{'rows':>10} {'LIKE p50':>10} {'p95':>8} {'FTS p50':>10} {'p95':>8} "
+          f"{'LIKE miss':>10} {'FTS miss':>9}   (ms)")
+    for rows in args.sizes:
+        conn = build_db(args.db, rows=rows, patients=args.patients)
+
+        def like(term):
+            pattern = f'%{term}%'
+            return conn.execute(LIKE_SQL, (pattern, pattern, args.limit)).fetchall()
+
+        def fts(term):
+            return search.search_appointments(conn, term, args.limit)
+
+        for term in terms[:3]:
+            assert {r[0] for r in like(term)} <= {r['id'] for r in search.search_appointments(conn, term, 10 ** 6)}
+        like_p50, like_p95 = timed(like, terms)
+        fts_p50, fts_p95 = timed(fts, terms)
+        like_miss, _ = timed(like, ['zzzzzz'] * 5)
+        fts_miss, _ = timed(fts, ['zzzzzz'] * 5)
+        print(f"{rows:>10,} {like_p50:>10.2f} {like_p95:>8.2f} {fts_p50:>10.2f} {fts_p95:>8.2f} "
+              f"{like_miss:>10.2f} {fts_miss:>9.2f}")
+        conn.close()
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Serving-mode benchmark: Flask dev server vs serve.py (ASGI).
+
+Starts each server as a subprocess on a generated database and drives the
+read-heavy routes (/api/doctor_availability, /patient_dashboard,
+/reception) from --clients concurrent keep-alive clients for --seconds,
+then prints throughput and latency percentiles for both.
+
+    python benchmarks/serve_bench.py --clients 32 --seconds 10 --workers 2 --threads 16
+"""
+import argparse
+import http.client
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+
+from common import ROOT, build_db
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+DEV_SERVER = (
+    "import sys; sys.path.insert(0, {root!r}); import app; "
+    "app.app.config['DATABASE'] = {db!r}; app.app.run(port={port}, threaded=True)"
+)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def login(port, username, password):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('POST', '/login', body=f'action=login&username={username}&password={password}',
+                 headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.getheader('Set-Cookie').split(';', 1)[0]
+
+
+def client(port, requests, stop, latencies, errors):
+    rnd = random.Random(threading.get_ident())
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    while not stop.is_set():
+        path, cookie = rnd.choice(requests)
+        started = time.perf_counter()
+        try:
+            conn.request('GET', path, headers={'Cookie': cookie})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as err:
+            errors.append(type(err).__name__)
+            conn.close()
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+    conn.close()
+
+
+def run(label, command, port, args, targets):
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    proc = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(port)
+        patient = login(port, 'bench_patient', 'bench')
+        admin = login(port, 'bench_admin', 'bench')
+        requests = [(path, patient if role == 'patient' else admin) for path, role in targets]
+
+        stop = threading.Event()
+        latencies, errors = [], []
+        threads = [threading.Thread(target=client, args=(port, requests, stop, latencies, errors))
+                   for _ in range(args.clients)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    latencies.sort()
+    pct = lambda p: latencies[max(int(len(latencies) * p) - 1, 0)] if latencies else float('nan')  # noqa: E731
+    print(f"{label:<28} {len(latencies) / elapsed:>8,.0f} req/s   p50 {statistics.median(latencies or [0]):>7.1f}"
+          f"   p95 {pct(0.95):>7.1f}   p99 {pct(0.99):>7.1f} ms   errors {len(errors)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'smartclinic_serve.db'))
+    args = parser.parse_args(argv)
+
+    conn = build_db(args.db, rows=args.rows)
+    password = generate_password_hash('bench')
+    patient_id = conn.execute(
+        "SELECT patient_id FROM appointments GROUP BY patient_id ORDER BY COUNT(*) DESC LIMIT 1"
+    ).fetchone()[0]
+    conn.execute("UPDATE users SET username='bench_patient', password=? WHERE id=?", (password, patient_id))
+    conn.execute("INSERT INTO users (username, full_name, password, role) VALUES (?,?,?,?)",
+                 ('bench_admin', 'Bench Admin', password, 'admin'))
+    doctors = [r[0] for r in conn.execute("SELECT full_name FROM users WHERE role='doctor' LIMIT 10")]
+    conn.commit()
+    conn.close()
+
+    today = date.today().isoformat()
+    targets = [(f"/api/doctor_availability?doctor={d.replace(' ', '+')}&date={today}", 'patient') for d in doctors]
+    targets += [('/patient_dashboard', 'patient')] * 3
+    targets += [(f'/reception?date={today}', 'admin'), ('/reception?doctor=Bench+001', 'admin')] * 2
+    print(f"{args.clients} clients, {args.seconds:.0f}s per server, {len(targets)} request mix")
+
+    port = free_port()
+    run('dev server (threaded)', [sys.executable, '-c', DEV_SERVER.format(root=ROOT, db=args.db, port=port)],
+        port, args, targets)
+    port = free_port()
+    run(f'serve.py {args.workers}w x {args.threads}t',
+        [sys.executable, 'serve.py', '--port', str(port), '--workers', str(args.workers),
+         '--threads', str(args.threads), '--database', args.db, '--log-level', 'warning'],
+        port, args, targets)
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""Availability and booking: booked-row diffing vs the materialized slot table.
+
+On a generated database, times three read paths for random doctor-days in
+the booking window (uncached): the old one (fetch the booked times, filter
+the fixed time list), a slot-table read (schedules.read_day) and the
+14-day matrix for every doctor. Then books --bookings free slots with and
+without the slot claim in the transaction, interleaved in random order so
+both see the same cache and WAL state, and times a full refresh() of the
+--horizon.
+
+    python benchmarks/slots_bench.py --rows 1000000 --doctors 40
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from common import SLOTS, build_db
+
+import db  # noqa: E402
+import reservations  # noqa: E402
+import schedules  # noqa: E402
+
+
+def legacy_day(conn, doctor_name, day):
+    # The pre-schedule implementation, kept here only for comparison.
+    booked = {r[0] for r in conn.execute(
+        "SELECT time FROM appointments WHERE doctor_name=? AND date=? AND status IN ('pending', 'checked_in')",
+        (doctor_name, day)
+    )}
+    return [t for t in SLOTS if t not in booked]
+
+
+def insert_only(conn, doctor_id, doctor_name, day, t):
+    # The same row reserve_slot writes, without the slot claim.
+    conn.execute('BEGIN IMMEDIATE')
+    conn.execute(
+        "INSERT INTO appointments (patient_name, doctor_name, date, time, status, doctor_id) "
+        "VALUES ('Slots Bench', ?, ?, ?, 'pending', ?)",
+        (doctor_name, day, t, doctor_id)
+    )
+    conn.commit()
+
+
+def timed(fn, cases):
+    samples = []
+    for case in cases:
+        started = time.perf_counter()
+        fn(*case)
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--doctors', type=int, default=40)
+    parser.add_argument('--horizon', type=int, default=schedules.SLOT_HORIZON_DAYS)
+    parser.add_argument('--lookups', type=int, default=5000)
+    parser.add_argument('--bookings', type=int, default=1000)
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'smartclinic_slots.db'))
+    args = parser.parse_args(argv)
+
+    build_db(args.db, rows=args.rows, doctors=args.doctors).close()
+    pool = db.ConnectionPool(args.db, max_size=1)
+    conn = pool.acquire()
+    started = time.perf_counter()
+    conn.execute("DELETE FROM slot_horizon")
+    conn.execute("DELETE FROM slots")
+    conn.commit()
+    written = schedules.refresh(conn, args.horizon)
+    print(f"refresh: {written:,} slots for {args.doctors} doctors x {args.horizon} days "
+          f"in {time.perf_counter() - started:.2f}s")
+
+    doctors = conn.execute("SELECT id, full_name FROM users WHERE role='doctor' ORDER BY id").fetchall()
+    rnd = random.Random(1)
+    today = date.today()
+    cases = [(rnd.choice(doctors), (today + timedelta(days=rnd.randrange(14))).isoformat())
+             for _ in range(args.lookups)]
+    for label, fn in (
+        ('booked-row diff', lambda d, day: legacy_day(conn, d[1], day)),
+        ('slot table', lambda d, day: schedules.read_day(conn, d[0], day)),
+    ):
+        p50, p99 = timed(fn, cases)
+        print(f"{label:<16} one doctor-day   p50 {p50:>8.1f} us  p99 {p99:>8.1f} us")
+    ids = [d[0] for d in doctors]
+    window = [(today + timedelta(days=i)).isoformat() for i in range(14)]
+    p50, p99 = timed(lambda: schedules.read_days(conn, ids, window), [()] * 50)
+    print(f"{'slot table':<16} 14-day matrix    p50 {p50 / 1000:>8.2f} ms  p99 {p99 / 1000:>8.2f} ms")
+
+    free = [(d, day, t) for d, days in schedules.read_days(conn, ids, window).items()
+            for day, slots in days.items() for t, state in slots if state == 'open']
+    rnd.shuffle(free)
+    names = dict(doctors)
+    for doctor_id, day, t in free[:100]:  # warm-up
+        reservations.reserve_slot(conn, 'Slots Bench', names[doctor_id], day, t, doctor_id=doctor_id)
+    free = free[100:]
+    samples = {'insert only': [], 'slot claim': []}
+    # Random order, so periodic costs (WAL checkpoints) do not always land
+    # on the same side.
+    labels = [label for label in samples for _ in range(args.bookings)]
+    rnd.shuffle(labels)
+    for label, (doctor_id, day, t) in zip(labels, free):
+        started = time.perf_counter()
+        if label == 'slot claim':
+            reservations.reserve_slot(conn, 'Slots Bench', names[doctor_id], day, t, doctor_id=doctor_id)
+        else:
+            insert_only(conn, doctor_id, names[doctor_id], day, t)
+        samples[label].append((time.perf_counter() - started) * 1e6)
+    for label, times in samples.items():
+        times.sort()
+        print(f"reserve_slot {label:<12} {len(times) * 1e6 / sum(times):>8,.0f} bookings/s  "
+              f"p50 {statistics.median(times):>6.0f} us  p99 {times[int(len(times) * 0.99)]:>6.0f} us")
+    stale = conn.execute(
+        "SELECT COUNT(*) FROM appointments a JOIN slots s ON s.doctor_id = a.doctor_id AND s.date = a.date "
+        "AND s.time = a.time WHERE a.patient_name = 'Slots Bench' AND s.state != 'booked'"
+    ).fetchone()[0]
+    print(f"slots left open under a booking: {stale}")
+
+    pool.release(conn)
+    pool.close_all()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
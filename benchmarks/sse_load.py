@@ -0,0 +1,139 @@
+"""Queue board load test: N SSE subscribers vs N polling screens.
+
+Starts the app on a threaded local server against a generated database,
+connects --subscribers EventSource-style clients to /events/queue, then
+checks in --events appointments through the normal /checkin route and
+measures how long each delta takes to reach every subscriber. For
+comparison it also times one round of N screens polling /api/appointments.
+
+    python benchmarks/sse_load.py --subscribers 300 --events 50
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from common import build_db
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+
+
+def login(port):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('POST', '/login', body='action=login&username=bench_admin&password=bench',
+                 headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    cookie = response.getheader('Set-Cookie').split(';', 1)[0]
+    conn.close()
+    return cookie
+
+
+def get(port, path, cookie):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('GET', path, headers={'Cookie': cookie})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.status
+
+
+class Subscriber(threading.Thread):
+    def __init__(self, port, cookie, query, connected):
+        super().__init__(daemon=True)
+        self.port, self.cookie, self.query = port, cookie, query
+        self.connected = connected
+        self.received = {}
+
+    def run(self):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port)
+        conn.request('GET', '/events/queue?' + self.query, headers={'Cookie': self.cookie})
+        response = conn.getresponse()
+        self.connected.release()
+        while True:
+            line = response.fp.readline()
+            if not line:
+                return
+            if line.startswith(b'data: {"id"'):
+                self.received[json.loads(line[6:])['id']] = time.perf_counter()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subscribers', type=int, default=300)
+    parser.add_argument('--events', type=int, default=50)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'smartclinic_sse.db'))
+    args = parser.parse_args(argv)
+
+    conn = build_db(args.db, rows=args.rows)
+    conn.execute("INSERT INTO users (username, full_name, password, role) VALUES (?,?,?,?)",
+                 ('bench_admin', 'Bench Admin', generate_password_hash('bench'), 'admin'))
+    today = date.today().isoformat()
+    pending = [r[0] for r in conn.execute(
+        "SELECT id FROM appointments WHERE date=? AND status='pending' ORDER BY id LIMIT ?", (today, args.events)
+    )]
+    conn.commit()
+    conn.close()
+
+    import app as clinic
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    clinic.app.config.update(DATABASE=args.db, EVENTS_KEEPALIVE=1.0)
+    server = make_server('127.0.0.1', 0, clinic.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+    cookie = login(port)
+
+    connected = threading.Semaphore(0)
+    subscribers = [Subscriber(port, cookie, f'date={today}', connected) for _ in range(args.subscribers)]
+    for sub in subscribers:
+        sub.start()
+    for _ in subscribers:
+        connected.acquire()
+    time.sleep(0.5)
+
+    sent = {}
+    started = time.perf_counter()
+    for appointment_id in pending:
+        sent[appointment_id] = time.perf_counter()
+        get(port, f'/checkin/{appointment_id}', cookie)
+    write_time = time.perf_counter() - started
+    deadline = time.time() + 10
+    while time.time() < deadline and any(len(s.received) < len(pending) for s in subscribers):
+        time.sleep(0.05)
+
+    latencies = sorted(
+        (sub.received[i] - sent[i]) * 1000 for sub in subscribers for i in pending if i in sub.received
+    )
+    expected = len(pending) * len(subscribers)
+    print(f"{len(subscribers)} subscribers, {len(pending)} check-ins in {write_time:.2f}s")
+    if latencies:
+        print(f"deliveries: {len(latencies):,}/{expected:,}   latency ms p50 {statistics.median(latencies):.1f}  "
+              f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.1f}  p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f}")
+    else:
+        print(f"deliveries: 0/{expected:,}")
+
+    # What the same screens would cost by polling once each.
+    started = time.perf_counter()
+    with ThreadPoolExecutor(8) as workers:
+        list(workers.map(lambda _: get(port, f'/api/appointments?date={today}', cookie), subscribers))
+    print(f"one polling round ({len(subscribers)} list queries): {time.perf_counter() - started:.2f}s")
+
+    server.shutdown()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    return 0 if len(latencies) == expected else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,207 @@
+import logging
+import sqlite3
+import threading
+import time
+from flask import g, current_app
+import archive
+import metrics
+import migrations
+
+log = logging.getLogger('smartclinic.db')
+
+# -------------------------
+# Connection tuning
+# -------------------------
+# Applied once when a pooled connection is opened, not on every request.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',        # readers no longer block on writers
+    'synchronous': 'NORMAL',      # safe with WAL, avoids an fsync per commit
+    'cache_size': -20000,         # ~20 MB page cache per connection
+    'mmap_size': 268435456,       # 256 MB memory-mapped reads
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,
+}
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+# -------------------------
+# Connection pool
+# -------------------------
+class ConnectionPool:
+    def __init__(self, path, max_size=8, timeout=5.0, pragmas=None, factory=sqlite3.Connection, on_connect=None,
+                 setup=None):
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self.factory = factory
+        self.on_connect = on_connect
+        self.setup = setup
+        self._idle = []
+        self._size = 0
+        self._cond = threading.Condition()
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._timeouts = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False, factory=self.factory)
+        conn.row_factory = sqlite3.Row
+        if self.on_connect is not None:
+            self.on_connect()
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name}={value}')
+        if self.setup is not None:
+            self.setup(conn)
+        return conn
+
+    def connect(self):
+        # Configured like pooled connections but not counted against
+        # max_size, for long-lived readers (streamed exports) that would
+        # otherwise starve requests. The caller closes it.
+        return self._connect()
+
+    def acquire(self):
+        with self._cond:
+            if not self._idle and self._size >= self.max_size:
+                self._waits += 1
+                started = time.perf_counter()
+                deadline = started + self.timeout
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        self._wait_time += time.perf_counter() - started
+                        raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                    self._cond.wait(remaining)
+                self._wait_time += time.perf_counter() - started
+
+            if self._idle:
+                self._hits += 1
+                return self._idle.pop()
+            self._size += 1
+            self._misses += 1
+
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Broken connection: drop it and let the next acquire open a new one.
+            conn.close()
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            return
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.max_size,
+                'hits': self._hits,
+                'misses': self._misses,
+                'waits': self._waits,
+                'wait_time_ms': round(self._wait_time * 1000, 3),
+                'timeouts': self._timeouts,
+            }
+
+
+# -------------------------
+# Flask integration
+# -------------------------
+_pool_lock = threading.Lock()
+
+
+def init_app(app):
+    app.config.setdefault('DB_POOL_SIZE', 8)
+    app.config.setdefault('DB_POOL_TIMEOUT', 5.0)
+    app.config.setdefault('DB_PRAGMAS', {})
+    app.config.setdefault('DB_AUTO_MIGRATE', True)
+    # Above this many appointments, table-wide migration steps are left to
+    # `python migrations.py` (see migrations.OFFLINE_STEPS).
+    app.config.setdefault('DB_AUTO_MIGRATE_MAX_ROWS', 50000)
+    app.teardown_appcontext(_release_db)
+
+
+def get_pool(app=None):
+    app = app or current_app
+    pool = app.extensions.get('db_pool')
+    if pool is None:
+        with _pool_lock:
+            pool = app.extensions.get('db_pool')
+            if pool is None:
+                pool = ConnectionPool(
+                    app.config['DATABASE'],
+                    max_size=app.config['DB_POOL_SIZE'],
+                    timeout=app.config['DB_POOL_TIMEOUT'],
+                    pragmas=app.config['DB_PRAGMAS'],
+                    setup=archive.pool_setup(app),
+                    **(metrics.pool_options(app) if 'metrics' in app.extensions else {}),
+                )
+                if app.config['DB_AUTO_MIGRATE']:
+                    # Quick schema steps only: data backfills and table-wide
+                    # index builds would hold _pool_lock, and the write lock,
+                    # for as long as they run. Backfills go to a background
+                    # thread, index builds to `python migrations.py`.
+                    conn = pool.acquire()
+                    try:
+                        migrations.migrate(conn, defer_data=True,
+                                           offline_max_rows=app.config['DB_AUTO_MIGRATE_MAX_ROWS'])
+                        pending = migrations.deferred(conn)
+                    finally:
+                        pool.release(conn)
+                    if pending:
+                        threading.Thread(target=_run_deferred, args=(pool,), name='data-migrations',
+                                         daemon=True).start()
+                app.extensions['db_pool'] = pool
+    return pool
+
+
+def _run_deferred(pool):
+    conn = pool.acquire()
+    try:
+        for number, name in migrations.run_deferred(conn):
+            log.info("data migration %d (%s) finished", number, name)
+    except Exception:
+        log.exception("data migrations failed; they resume on the next start")
+    finally:
+        pool.release(conn)
+
+
+def get_db():
+    # One pooled connection per app context; returned in _release_db.
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+
+def _release_db(exc=None):
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool().release(conn)
@@ -0,0 +1,141 @@
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from flask import current_app
+
+# -------------------------
+# Queue events (in-process pub/sub)
+# -------------------------
+# Write routes publish one small delta per committed change; every connected
+# queue screen holds a bounded mailbox fed by that single publish, so N
+# screens cost one database write plus N queue appends instead of N queries.
+# A short replay buffer lets reconnecting clients resume from Last-Event-ID.
+# The broker is per process: with several worker processes each one only
+# fans out the writes it handled itself.
+EVENT_FIELDS = ('id', 'patient_name', 'doctor_name', 'date', 'time', 'status', 'queue_number')
+
+
+class Subscription:
+    def __init__(self, max_pending, match=None):
+        self.max_pending = max_pending
+        self.match = match
+        self.overflowed = False
+        self._pending = deque()
+        self._ready = threading.Condition()
+
+    def offer(self, event):
+        if self.match is not None and not self.match(event):
+            return
+        with self._ready:
+            if len(self._pending) >= self.max_pending:
+                # A screen that stops reading is told to resync, not buffered forever.
+                self._pending.clear()
+                self.overflowed = True
+            else:
+                self._pending.append(event)
+            self._ready.notify()
+
+    def next(self, timeout):
+        with self._ready:
+            if not self._pending and not self.overflowed:
+                self._ready.wait(timeout)
+            if self.overflowed:
+                self.overflowed = False
+                return 'resync'
+            return self._pending.popleft() if self._pending else None
+
+
+class Broker:
+    def __init__(self, replay=500, max_pending=256):
+        self.max_pending = max_pending
+        self._recent = deque(maxlen=replay)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._published = 0
+        self._delivered = 0
+
+    def publish(self, kind, data):
+        with self._lock:
+            event = (next(self._ids), kind, data)
+            self._recent.append(event)
+            subscribers = list(self._subscribers)
+            self._published += 1
+            self._delivered += len(subscribers)
+        for sub in subscribers:
+            sub.offer(event)
+        return event[0]
+
+    def subscribe(self, last_id=None, match=None):
+        # Replay and registration happen under one lock so nothing is missed
+        # or delivered twice in between.
+        sub = Subscription(self.max_pending, match)
+        with self._lock:
+            if last_id is not None:
+                newest = self._recent[-1][0] if self._recent else 0
+                if last_id > newest or (self._recent and last_id < self._recent[0][0] - 1):
+                    # Gap in the replay buffer, or ids from before a restart.
+                    sub.overflowed = True
+                else:
+                    for event in self._recent:
+                        if event[0] > last_id:
+                            sub.offer(event)
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self._published,
+                'delivered': self._delivered,
+                'last_id': self._recent[-1][0] if self._recent else 0,
+            }
+
+
+# -------------------------
+# Flask integration
+# -------------------------
+def init_app(app):
+    app.config.setdefault('EVENTS_REPLAY', 500)
+    app.config.setdefault('EVENTS_MAX_PENDING', 256)
+    app.config.setdefault('EVENTS_KEEPALIVE', 15.0)
+    app.extensions['event_broker'] = Broker(app.config['EVENTS_REPLAY'], app.config['EVENTS_MAX_PENDING'])
+
+
+def get_broker():
+    return current_app.extensions['event_broker']
+
+
+def publish(kind, row, **extra):
+    data = {key: row[key] for key in EVENT_FIELDS}
+    data.update(extra)
+    return get_broker().publish(kind, data)
+
+
+def format_sse(event):
+    event_id, kind, data = event
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def stream(broker, last_id=None, match=None, keepalive=15.0):
+    # Generator for a text/event-stream body; never touches the database.
+    sub = broker.subscribe(last_id, match)
+    try:
+        yield f"retry: 3000\n: connected {time.time():.0f}\n\n"
+        while True:
+            event = sub.next(keepalive)
+            if event is None:
+                yield ": keepalive\n\n"
+            elif event == 'resync':
+                yield "event: resync\ndata: {}\n\n"
+            else:
+                yield format_sse(event)
+    finally:
+        broker.unsubscribe(sub)
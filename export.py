@@ -0,0 +1,186 @@
+import csv
+import json
+import zlib
+from io import StringIO
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # optional: only needed for the arrow/parquet formats
+    pa = None
+
+# -------------------------
+# Appointment export
+# -------------------------
+CSV_COLUMNS = ['id', 'patient_name', 'doctor_name', 'date', 'time', 'status']
+COLUMNS = CSV_COLUMNS + ['queue_number']
+BATCH_SIZE = 1000
+FORMATS = ('csv', 'ndjson', 'arrow', 'parquet')
+MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+class ExportError(Exception):
+    pass
+
+
+def build_query(columns, start=None, end=None, statuses=None, since_id=None, until_id=None):
+    # Reads the full history (live + archived rows). Date bounds hit the
+    # date/time index of each table, which also yields the order, so the two
+    # walks are merged and only the requested range is ever read.
+    # Incremental exports (since_id) walk the primary keys instead.
+    where, params = [], []
+    if since_id is not None:
+        where.append("id > ?")
+        params.append(since_id)
+    if until_id is not None:
+        where.append("id <= ?")
+        params.append(until_id)
+    if start:
+        where.append("date >= ?")
+        params.append(start)
+    if end:
+        where.append("date <= ?")
+        params.append(end)
+    if statuses:
+        where.append(f"status IN ({','.join('?' * len(statuses))})")
+        params.extend(statuses)
+    sql = f"SELECT {', '.join(columns)} FROM appointments_history"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    order = "id" if since_id is not None else "date, time"
+    return sql + " ORDER BY " + order, params
+
+
+def iter_batches(pool, sql, params, batch_size=BATCH_SIZE):
+    # Own connection outside the pool: a streamed body outlives the request
+    # context, and slow download clients must not exhaust the pool.
+    conn = pool.connect()
+    try:
+        cur = conn.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+def current_watermark(conn):
+    # Highest id ever handed out (appointments is AUTOINCREMENT); archived
+    # rows keep their ids, wherever the archive table lives.
+    return conn.execute(
+        "SELECT IFNULL((SELECT seq FROM sqlite_sequence WHERE name = 'appointments'), 0)"
+    ).fetchone()[0]
+
+
+def iter_csv(pool, batch_size=BATCH_SIZE, **filters):
+    sql, params = build_query(CSV_COLUMNS, **filters)
+    buf = StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(CSV_COLUMNS)
+    for rows in iter_batches(pool, sql, params, batch_size):
+        writer.writerows(tuple(r) for r in rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def iter_ndjson(pool, batch_size=BATCH_SIZE, **filters):
+    sql, params = build_query(COLUMNS, **filters)
+    for rows in iter_batches(pool, sql, params, batch_size):
+        yield ''.join(json.dumps(dict(zip(COLUMNS, r))) + '\n' for r in rows)
+
+
+# -------------------------
+# Arrow / Parquet (optional pyarrow)
+# -------------------------
+class _ChunkSink:
+    # Minimal write-only file object; the generator drains it after each batch.
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+def arrow_schema():
+    return pa.schema([
+        ('id', pa.int64()),
+        ('patient_name', pa.string()),
+        ('doctor_name', pa.string()),
+        ('date', pa.string()),
+        ('time', pa.string()),
+        ('status', pa.string()),
+        ('queue_number', pa.int64()),
+    ])
+
+
+def _record_batch(schema, rows):
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(col, type=field.type) for col, field in zip(columns, schema)], schema=schema
+    )
+
+
+def iter_arrow(pool, fmt='arrow', batch_size=BATCH_SIZE * 10, **filters):
+    if pa is None:
+        raise ExportError("The arrow and parquet formats require pyarrow to be installed.")
+    schema = arrow_schema()
+    sql, params = build_query(COLUMNS, **filters)
+
+    def generate():
+        sink = _ChunkSink()
+        out = pa.PythonFile(sink, mode='w')
+        if fmt == 'parquet':
+            writer = pa.parquet.ParquetWriter(out, schema)
+        else:
+            writer = pa.ipc.new_stream(out, schema)
+        for rows in iter_batches(pool, sql, params, batch_size):
+            writer.write_batch(_record_batch(schema, rows))
+            data = sink.drain()
+            if data:
+                yield data
+        writer.close()
+        yield sink.drain()
+
+    return generate()
+
+
+def iter_export(pool, fmt, **filters):
+    if fmt == 'csv':
+        return iter_csv(pool, **filters)
+    if fmt == 'ndjson':
+        return iter_ndjson(pool, **filters)
+    if fmt in ('arrow', 'parquet'):
+        return iter_arrow(pool, fmt, **filters)
+    raise ExportError(f"Unknown export format '{fmt}'. Choose one of: {', '.join(FORMATS)}.")
+
+
+def gzip_stream(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,341 @@
+import csv
+import io
+import json
+import re
+import sqlite3
+import time
+from datetime import date as date_cls
+
+# -------------------------
+# Bulk import
+# -------------------------
+# Onboarding / migration path for patients (and doctors) and appointments.
+# The upload is parsed one record at a time; valid records are gathered into
+# chunks of IMPORT_BATCH, and each chunk is checked against the database in a
+# couple of set-based lookups (existing usernames, the booked slots of every
+# doctor-day it touches), then written with executemany() in one short
+# BEGIN IMMEDIATE transaction so bookings keep going during a long import.
+# What a chunk accepts is added to the in-memory index, so later rows of the
+# same file are checked against it too. The unique indexes still have the
+# final say: a chunk that races a concurrent writer is replayed row by row.
+# Rejected rows are skipped and reported by line; dry_run does the parsing
+# and checking without hashing or writing anything.
+KINDS = ('patients', 'appointments')
+FORMATS = ('csv', 'ndjson')
+IMPORT_BATCH = 500  # rows per write transaction, ~50 ms of write lock
+MAX_ERRORS = 1000
+STATUSES = ('pending', 'checked_in', 'cancelled')
+ACTIVE_STATUSES = ('pending', 'checked_in')
+IMPORT_ROLES = ('patient', 'doctor')  # staff accounts are created one by one
+NO_PASSWORD = '!'  # never matches: the account cannot sign in yet
+DATE_FORMAT = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+TIME_FORMAT = re.compile(r'^([01]\d|2[0-3]):[0-5]\d$')
+
+
+class ImportFileError(Exception):
+    pass
+
+
+class RowError(Exception):
+    pass
+
+
+def guess_format(filename=None, mimetype=None):
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')) or mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return 'ndjson'
+    return 'csv'
+
+
+def iter_records(stream, fmt, columns):
+    # Yields (line number, record, problem) one record at a time; `problem`
+    # is set (and `record` None) for lines that could not be parsed.
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        if fmt == 'csv':
+            reader = csv.DictReader(text)
+            missing = [c for c in columns if c not in (reader.fieldnames or ())]
+            if missing:
+                raise ImportFileError(f"CSV header is missing column(s): {', '.join(missing)}.")
+            for record in reader:
+                yield reader.line_num, record, None
+        else:
+            for number, line in enumerate(text, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as err:
+                    yield number, None, f"invalid JSON: {err}"
+                    continue
+                if not isinstance(record, dict):
+                    yield number, None, "each line must be a JSON object"
+                    continue
+                yield number, record, None
+    except UnicodeDecodeError:
+        raise ImportFileError("The file is not UTF-8 encoded.")
+    finally:
+        # The upload stream belongs to the request; do not close it with the wrapper.
+        text.detach()
+
+
+def _text(record, key):
+    value = record.get(key)
+    return '' if value is None else str(value).strip()
+
+
+def _write_chunk(conn, sql, numbered, report, conflict, after=None):
+    # Returns the number of rows written. If a concurrent writer got in first
+    # the whole executemany() fails, so the chunk is replayed row by row and
+    # only the clashing rows are rejected.
+    rows = [row for _, row in numbered]
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        try:
+            conn.executemany(sql, rows)
+            written = len(rows)
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            conn.execute('BEGIN IMMEDIATE')
+            written = 0
+            for number, row in numbered:
+                try:
+                    conn.execute(sql, row)
+                    written += 1
+                except sqlite3.IntegrityError:
+                    report.reject(number, conflict)
+        if after is not None:
+            after(conn, rows)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return written
+
+
+class Report:
+    def __init__(self, kind, fmt, dry_run, max_errors=MAX_ERRORS):
+        self.kind = kind
+        self.format = fmt
+        self.dry_run = dry_run
+        self.max_errors = max_errors
+        self.rows = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'kind': self.kind,
+            'format': self.format,
+            'dry_run': self.dry_run,
+            'rows': self.rows,
+            # dry run: rows that would be written
+            'imported': self.accepted,
+            'rejected': self.rejected,
+            'errors': sorted(self.errors, key=lambda e: e['line']),
+            'errors_truncated': self.rejected > len(self.errors),
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(self.rows / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+class PatientImport:
+    # username, full_name, optional email / password / role (patient or
+    # doctor) / specialization. Rows without a password get an account that
+    # cannot sign in until one is set.
+    COLUMNS = ('username', 'full_name')
+    SQL = 'INSERT INTO users (username, full_name, email, password, role, specialization) VALUES (?,?,?,?,?,?)'
+
+    def __init__(self, conn, hasher=None):
+        self.conn = conn
+        self.hasher = hasher
+        self.usernames = set()
+        self.doctors = {r[0] for r in conn.execute("SELECT full_name FROM users WHERE role='doctor'")}
+
+    def validate(self, record):
+        username = _text(record, 'username')
+        full_name = _text(record, 'full_name')
+        email = _text(record, 'email')
+        password = record.get('password') or ''
+        role = _text(record, 'role') or 'patient'
+        specialization = _text(record, 'specialization') or None
+        if not (username and full_name):
+            raise RowError("username and full_name are required")
+        if len(username) > 64 or any(c.isspace() for c in username):
+            raise RowError("username must be at most 64 characters without spaces")
+        if email and '@' not in email:
+            raise RowError(f"invalid email {email!r}")
+        if role not in IMPORT_ROLES:
+            raise RowError(f"role must be one of {', '.join(IMPORT_ROLES)}")
+        if not isinstance(password, str):
+            raise RowError("password must be a string")
+        return (username, full_name, email or None, password, role, specialization if role == 'doctor' else None)
+
+    def flush(self, numbered, report, dry_run):
+        names = list({row[0] for _, row in numbered})
+        taken = {r[0] for r in self.conn.execute(
+            f"SELECT username FROM users WHERE username IN ({','.join('?' * len(names))})", names
+        )}
+        ready = []
+        for number, row in numbered:
+            username, full_name, role = row[0], row[1], row[4]
+            if username in taken or username in self.usernames:
+                report.reject(number, f"username {username!r} already exists")
+                continue
+            if role == 'doctor' and full_name in self.doctors:
+                # Appointments refer to doctors by name.
+                report.reject(number, f"a doctor named {full_name!r} already exists")
+                continue
+            self.usernames.add(username)
+            if role == 'doctor':
+                self.doctors.add(full_name)
+            ready.append((number, row))
+        if dry_run or not ready:
+            return len(ready)
+
+        plain = [row[3] for _, row in ready if row[3]]
+        hashes = iter(self.hasher.hash_many(plain) if plain else ())
+        ready = [(number, row[:3] + (next(hashes) if row[3] else NO_PASSWORD,) + row[4:])
+                 for number, row in ready]
+        return _write_chunk(self.conn, self.SQL, ready, report, "username already exists")
+
+
+class AppointmentImport:
+    # patient_username, doctor_name, date (YYYY-MM-DD), time (HH:MM),
+    # optional status (default pending) and queue_number (checked_in only).
+    COLUMNS = ('patient_username', 'doctor_name', 'date', 'time')
+    SQL = ("INSERT INTO appointments (patient_name, doctor_name, date, time, status, queue_number, "
+           "patient_id, doctor_id) VALUES (?,?,?,?,?,?,?,?)")
+
+    def __init__(self, conn, hasher=None):
+        self.conn = conn
+        self.doctors = dict(conn.execute("SELECT full_name, MIN(id) FROM users WHERE role='doctor' GROUP BY full_name"))
+        self.loaded_days = set()
+        self.booked = set()
+
+    def validate(self, record):
+        patient = _text(record, 'patient_username')
+        doctor = _text(record, 'doctor_name')
+        day = _text(record, 'date')
+        slot = _text(record, 'time')
+        status = _text(record, 'status') or 'pending'
+        queue_number = _text(record, 'queue_number')
+        if not (patient and doctor and day and slot):
+            raise RowError("patient_username, doctor_name, date and time are required")
+        if doctor not in self.doctors:
+            raise RowError(f"unknown doctor {doctor!r}")
+        try:
+            if not DATE_FORMAT.match(day):
+                raise ValueError
+            date_cls.fromisoformat(day)
+        except ValueError:
+            raise RowError(f"invalid date {day!r}, expected YYYY-MM-DD")
+        if not TIME_FORMAT.match(slot):
+            raise RowError(f"invalid time {slot!r}, expected HH:MM")
+        if status not in STATUSES:
+            raise RowError(f"status must be one of {', '.join(STATUSES)}")
+        if queue_number:
+            if status != 'checked_in':
+                raise RowError("queue_number is only valid for checked_in appointments")
+            if not queue_number.isdigit() or int(queue_number) < 1:
+                raise RowError(f"invalid queue_number {queue_number!r}")
+        return (patient, doctor, day, slot, status, int(queue_number) if queue_number else None)
+
+    def _load_booked(self, days):
+        # Active bookings of the doctor-days this chunk touches, one seek each.
+        days = [d for d in days if d not in self.loaded_days]
+        for start in range(0, len(days), 400):
+            part = days[start:start + 400]
+            values = ','.join(['(?,?)'] * len(part))
+            params = [value for day in part for value in day]
+            self.booked.update(tuple(r) for r in self.conn.execute(
+                f"WITH days (doctor_name, date) AS (VALUES {values}) "
+                "SELECT a.doctor_name, a.date, a.time FROM days "
+                "JOIN appointments a ON a.doctor_name = days.doctor_name AND a.date = days.date "
+                "WHERE a.status IN ('pending', 'checked_in')",
+                params
+            ))
+            self.loaded_days.update(part)
+
+    def flush(self, numbered, report, dry_run):
+        names = list({row[0] for _, row in numbered})
+        patients = {r[0]: (r[1], r[2]) for r in self.conn.execute(
+            "SELECT username, id, full_name FROM users "
+            f"WHERE role='patient' AND username IN ({','.join('?' * len(names))})", names
+        )}
+        self._load_booked(list({(row[1], row[2]) for _, row in numbered}))
+        ready = []
+        for number, (username, doctor, day, slot, status, queue_number) in numbered:
+            patient = patients.get(username)
+            if patient is None:
+                report.reject(number, f"unknown patient {username!r}")
+                continue
+            if status in ACTIVE_STATUSES:
+                if (doctor, day, slot) in self.booked:
+                    report.reject(number, f"{doctor} is already booked on {day} at {slot}")
+                    continue
+                self.booked.add((doctor, day, slot))
+            ready.append((number, (patient[1], doctor, day, slot, status, queue_number,
+                                   patient[0], self.doctors[doctor])))
+        if dry_run or not ready:
+            return len(ready)
+        return _write_chunk(self.conn, self.SQL, ready, report, "slot already booked", self._bump_queue_counters)
+
+    @staticmethod
+    def _bump_queue_counters(conn, rows):
+        # Keep check-in numbering above any imported queue number.
+        highest = {}
+        for row in rows:
+            if row[5] is not None:
+                key = (row[1], row[2])
+                highest[key] = max(highest.get(key, 0), row[5])
+        conn.executemany(
+            "INSERT INTO queue_counters (doctor_name, date, last_number) VALUES (?,?,?) "
+            "ON CONFLICT(doctor_name, date) DO UPDATE SET last_number=MAX(last_number, excluded.last_number)",
+            [(doctor, day, number) for (doctor, day), number in highest.items()]
+        )
+
+
+def run(conn, stream, kind, fmt='csv', dry_run=False, hasher=None, batch_size=IMPORT_BATCH,
+        max_errors=MAX_ERRORS):
+    # Returns the report as a dict. Chunks already written stay written if a
+    # later one fails; re-running the file rejects those rows as duplicates.
+    if kind not in KINDS:
+        raise ImportFileError(f"kind must be one of {', '.join(KINDS)}.")
+    if fmt not in FORMATS:
+        raise ImportFileError(f"Unsupported format {fmt!r}; expected one of {', '.join(FORMATS)}.")
+    job = (PatientImport if kind == 'patients' else AppointmentImport)(conn, hasher)
+    report = Report(kind, fmt, dry_run, max_errors)
+    chunk = []
+    for number, record, problem in iter_records(stream, fmt, job.COLUMNS):
+        report.rows += 1
+        if problem:
+            report.reject(number, problem)
+            continue
+        try:
+            chunk.append((number, job.validate(record)))
+        except RowError as err:
+            report.reject(number, str(err))
+            continue
+        if len(chunk) >= batch_size:
+            report.accepted += job.flush(chunk, report, dry_run)
+            chunk = []
+    if chunk:
+        report.accepted += job.flush(chunk, report, dry_run)
+    return report.as_dict()
+
+
+# -------------------------
+# Flask integration
+# -------------------------
+def init_app(app):
+    app.config.setdefault('IMPORT_BATCH', IMPORT_BATCH)
+    app.config.setdefault('IMPORT_MAX_ERRORS', MAX_ERRORS)
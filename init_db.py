@@ -1,37 +1,18 @@
+import os
 import sqlite3
 from werkzeug.security import generate_password_hash
+import migrations
  
-conn = sqlite3.connect('clinic.db')
- 
-# Drop old tables if you want a fresh start (optional)
-conn.execute("DROP TABLE IF EXISTS appointments")
-conn.execute("DROP TABLE IF EXISTS users")
+# Fresh start: remove the old file (and its WAL) rather than dropping tables,
+# so counters, summaries, search indexes and slots cannot outlive the data.
+for suffix in ('', '-wal', '-shm'):
+    if os.path.exists('clinic.db' + suffix):
+        os.remove('clinic.db' + suffix)
  
-# Create appointments table
-conn.execute('''
-CREATE TABLE appointments (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    patient_name TEXT NOT NULL,
-    doctor_name TEXT NOT NULL,
-    date TEXT NOT NULL,
-    time TEXT NOT NULL,
-    status TEXT DEFAULT 'pending',
-    queue_number INTEGER
-)
-''')
+conn = sqlite3.connect('clinic.db')
  
-# Create users table with specialization
-conn.execute('''
-CREATE TABLE users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT UNIQUE NOT NULL,
-    full_name TEXT NOT NULL,
-    email TEXT,
-    password TEXT NOT NULL,
-    role TEXT CHECK(role IN ('patient','reception','admin','doctor')) NOT NULL,
-    specialization TEXT
-)
-''')
+# Create tables and indexes
+migrations.migrate(conn)
  
 # Add sample doctors
 doctors = [
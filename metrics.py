@@ -0,0 +1,225 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from flask import current_app, g, request
+from jinja2 import Template
+
+# -------------------------
+# Instrumentation
+# -------------------------
+# Per-process request, SQL and template timings, rendered in the Prometheus
+# text format on /metrics. With METRICS_ENABLED off the request hooks return
+# after one config lookup and pooled connections are plain sqlite3 ones, so
+# the disabled cost is close to nothing. With several server processes each
+# one reports its own numbers (scrape them individually or aggregate).
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+MAX_STATEMENTS = 500
+IN_LIST = re.compile(r'\(\?(?:\s*,\s*\?)+\)')
+sql_log = logging.getLogger('smartclinic.sql')
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.labels = labels
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v[0]), v[1]) for k, v in self._series.items()]
+        for label_values, counts, total in sorted(items):
+            base = _labels(self.labels, label_values)
+            running = 0
+            for bound, count in zip(self.buckets, counts):
+                running += count
+                lines.append(f'{self.name}_bucket{_labels(self.labels, label_values, le=bound)} {running}')
+            running += counts[-1]
+            lines.append(f'{self.name}_bucket{_labels(self.labels, label_values, le="+Inf")} {running}')
+            lines.append(f'{self.name}_sum{base} {total:.6f}')
+            lines.append(f'{self.name}_count{base} {running}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            value = f'{value:.6f}' if isinstance(value, float) else value
+            lines.append(f'{self.name}{_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def _labels(names, values, **extra):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{v}"' for n, v in extra.items()]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Registry:
+    def __init__(self):
+        self.requests = Histogram('clinic_request_duration_seconds', 'Request latency by endpoint.',
+                                  REQUEST_BUCKETS, ('endpoint', 'method', 'status'))
+        self.sql = Histogram('clinic_sql_duration_seconds', 'SQL execute() latency.', SQL_BUCKETS)
+        self.statements = Counter('clinic_sql_statements_total', 'Executions per SQL statement.', ('statement',))
+        self.statement_time = Counter('clinic_sql_statement_seconds_total',
+                                      'Time spent per SQL statement.', ('statement',))
+        self.slow = Counter('clinic_sql_slow_queries_total', 'Statements slower than the slow-query threshold.')
+        self.connections = Counter('clinic_db_connections_opened_total', 'SQLite connections opened.')
+        self.templates = Histogram('clinic_template_render_seconds', 'Template render time.',
+                                   REQUEST_BUCKETS, ('template',))
+        self.page_cache = Counter('clinic_page_cache_requests_total', 'Page and fragment cache lookups.',
+                                  ('name', 'result'))
+        self.slow_query_seconds = 0.1
+        self._known = {}
+        self._known_lock = threading.Lock()
+
+    def statement_label(self, sql):
+        # Collapse whitespace and IN-lists so one code path is one series;
+        # the normalised form is memoised per distinct SQL string.
+        label = self._known.get(sql)
+        if label is None:
+            label = IN_LIST.sub('(?...)', ' '.join(sql.split()))[:300]
+            with self._known_lock:
+                if len(self._known) >= MAX_STATEMENTS:
+                    return 'other'
+                self._known[sql] = label
+        return label
+
+    def observe_sql(self, sql, elapsed):
+        label = self.statement_label(sql)
+        self.sql.observe(elapsed)
+        self.statements.inc(1, label)
+        self.statement_time.inc(elapsed, label)
+        if elapsed >= self.slow_query_seconds:
+            self.slow.inc()
+            sql_log.warning("slow query (%.1f ms): %s", elapsed * 1000, label)
+
+    def render(self, extra=()):
+        lines = []
+        for metric in (self.requests, self.sql, self.statements, self.statement_time,
+                       self.slow, self.connections, self.templates, self.page_cache):
+            lines += metric.render()
+        lines += extra
+        return '\n'.join(lines) + '\n'
+
+
+# -------------------------
+# Instrumented SQLite connection
+# -------------------------
+class InstrumentedConnection(sqlite3.Connection):
+    # Times execute()/executemany() made through the connection; rows pulled
+    # later with fetchmany() (streamed exports) are not included.
+    registry = None
+
+    def execute(self, sql, *args):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            self.registry.observe_sql(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, *args):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            self.registry.observe_sql(sql, time.perf_counter() - started)
+
+
+def connection_factory(registry):
+    return type('InstrumentedConnection', (InstrumentedConnection,), {'registry': registry})
+
+
+class TimedTemplate(Template):
+    def render(self, *args, **kwargs):
+        registry = active_registry()
+        if registry is None:
+            return super().render(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            registry.templates.observe(time.perf_counter() - started, self.name or '<string>')
+
+
+# -------------------------
+# Flask integration
+# -------------------------
+def init_app(app):
+    app.config.setdefault('METRICS_ENABLED', os.environ.get('CLINIC_METRICS', '1') != '0')
+    app.config.setdefault('METRICS_SLOW_QUERY_MS', 100)
+    app.config.setdefault('METRICS_TOKEN', os.environ.get('CLINIC_METRICS_TOKEN'))
+    app.extensions['metrics'] = Registry()
+    app.jinja_env.template_class = TimedTemplate
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+
+
+def active_registry():
+    try:
+        if not current_app.config['METRICS_ENABLED']:
+            return None
+        return current_app.extensions['metrics']
+    except RuntimeError:  # rendered outside an app context
+        return None
+
+
+def get_registry():
+    return current_app.extensions['metrics']
+
+
+def pool_options(app):
+    # Extra sqlite3.connect() arguments for the connection pool.
+    if not app.config['METRICS_ENABLED']:
+        return {}
+    registry = app.extensions['metrics']
+    registry.slow_query_seconds = app.config['METRICS_SLOW_QUERY_MS'] / 1000
+    return {'factory': connection_factory(registry), 'on_connect': lambda: registry.connections.inc()}
+
+
+def _start_timer():
+    if current_app.config['METRICS_ENABLED']:
+        g.request_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        get_registry().requests.observe(
+            time.perf_counter() - started, request.endpoint or 'unmatched', request.method, response.status_code
+        )
+    return response
@@ -0,0 +1,534 @@
+import sqlite3
+import time
+
+# -------------------------
+# Data migrations
+# -------------------------
+# Python steps for work too large for one transaction. They commit in
+# small batches so other connections can keep writing in between, and they
+# are resumable: a restarted step only touches rows it has not done yet.
+BACKFILL_BATCH = 2000
+BACKFILL_PAUSE = 0.05  # seconds between batches, lets waiting writers in
+
+
+def backfill_user_ids(conn, batch_size=BACKFILL_BATCH, pause=BACKFILL_PAUSE):
+    # Walk the primary key in fixed ranges. Historic name strings can be
+    # ambiguous; the lowest matching user id wins.
+    top = conn.execute("SELECT IFNULL(MAX(id), 0) FROM appointments").fetchone()[0]
+    low = conn.execute(
+        "SELECT IFNULL(MIN(id), 0) - 1 FROM appointments WHERE patient_id IS NULL OR doctor_id IS NULL"
+    ).fetchone()[0]
+    while low < top:
+        high = low + batch_size
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                """
+                UPDATE appointments SET
+                    patient_id = IFNULL(patient_id, (SELECT MIN(u.id) FROM users u
+                                                      WHERE u.role IN ('patient', 'reception', 'admin')
+                                                        AND u.full_name = appointments.patient_name)),
+                    doctor_id = IFNULL(doctor_id, (SELECT MIN(u.id) FROM users u
+                                                    WHERE u.role = 'doctor'
+                                                      AND u.full_name = appointments.doctor_name))
+                 WHERE id > ? AND id <= ? AND (patient_id IS NULL OR doctor_id IS NULL)
+                """,
+                (low, high)
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        low = high
+        if pause:
+            time.sleep(pause)
+
+
+class MigrationRequired(Exception):
+    pass
+
+
+def index_appointments(conn, batch_size=BACKFILL_BATCH, pause=BACKFILL_PAUSE):
+    # Fills appointments_fts for the rows that existed when migration 9
+    # created it (its insert trigger indexes newer ones), one id range per
+    # transaction; appointments_fts_backfill holds the position.
+    if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='appointments_fts_backfill'"
+    ).fetchone() is None:
+        return
+    while True:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            position = conn.execute("SELECT next_id, last_id FROM appointments_fts_backfill").fetchone()
+            if position is None:
+                conn.commit()
+                break
+            low, top = position
+            high = min(low + batch_size, top)
+            conn.execute(
+                "INSERT INTO appointments_fts(rowid, patient_name, doctor_name) "
+                "SELECT id, patient_name, doctor_name FROM appointments WHERE id > ? AND id <= ?",
+                (low, high)
+            )
+            if high >= top:
+                conn.execute("DELETE FROM appointments_fts_backfill")
+            else:
+                conn.execute("UPDATE appointments_fts_backfill SET next_id = ?", (high,))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        if pause:
+            time.sleep(pause)
+
+
+# -------------------------
+# Schema migrations
+# -------------------------
+# Applied in order; PRAGMA user_version stores the last applied version,
+# so each step runs exactly once per database file. A step is either an
+# SQL script (run in one transaction) or a resumable callable taking the
+# connection.
+# Never edit a released step -- append a new one instead.
+MIGRATIONS = [
+    (1, 'baseline schema', '''
+        CREATE TABLE IF NOT EXISTS appointments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patient_name TEXT NOT NULL,
+            doctor_name TEXT NOT NULL,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',
+            queue_number INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            full_name TEXT NOT NULL,
+            email TEXT,
+            password TEXT NOT NULL,
+            role TEXT CHECK(role IN ('patient','reception','admin','doctor')) NOT NULL,
+            specialization TEXT
+        );
+    '''),
+    (2, 'appointment access-path indexes', '''
+        -- booking/edit conflict checks, availability and checkin queue lookups
+        CREATE INDEX IF NOT EXISTS idx_appointments_doctor_slot
+            ON appointments (doctor_name, date, time, status);
+        -- reception/admin day views and the date-ordered export
+        CREATE INDEX IF NOT EXISTS idx_appointments_date_time
+            ON appointments (date, time);
+        -- patient dashboard
+        CREATE INDEX IF NOT EXISTS idx_appointments_patient
+            ON appointments (patient_name, date, time);
+        -- admin status counters
+        CREATE INDEX IF NOT EXISTS idx_appointments_status
+            ON appointments (status);
+        -- doctor dropdowns
+        CREATE INDEX IF NOT EXISTS idx_users_role_name
+            ON users (role, full_name);
+    '''),
+    (3, 'one active booking per doctor slot', '''
+        -- Earlier check-then-insert code could double book; keep the first
+        -- booking of any duplicated active slot and cancel the rest. The
+        -- cancelled ones are recorded so reception can contact the patients.
+        CREATE TABLE IF NOT EXISTS cancelled_duplicates (
+            appointment_id INTEGER PRIMARY KEY,
+            kept_id INTEGER NOT NULL,
+            previous_status TEXT NOT NULL,
+            cancelled_at TEXT NOT NULL DEFAULT (datetime('now'))
+        );
+        INSERT OR IGNORE INTO cancelled_duplicates (appointment_id, kept_id, previous_status)
+            SELECT d.id, MIN(a.id), d.status FROM appointments d
+              JOIN appointments a ON a.doctor_name = d.doctor_name AND a.date = d.date AND a.time = d.time
+                                 AND a.status IN ('pending', 'checked_in') AND a.id < d.id
+             WHERE d.status IN ('pending', 'checked_in')
+             GROUP BY d.id;
+        UPDATE appointments SET status='cancelled'
+         WHERE status IN ('pending', 'checked_in')
+           AND id IN (SELECT appointment_id FROM cancelled_duplicates);
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_appointments_active_slot
+            ON appointments (doctor_name, date, time)
+            WHERE status IN ('pending', 'checked_in');
+    '''),
+    (4, 'per doctor-day queue counters', '''
+        CREATE TABLE IF NOT EXISTS queue_counters (
+            doctor_name TEXT NOT NULL,
+            date TEXT NOT NULL,
+            last_number INTEGER NOT NULL,
+            PRIMARY KEY (doctor_name, date)
+        ) WITHOUT ROWID;
+        INSERT OR IGNORE INTO queue_counters (doctor_name, date, last_number)
+            SELECT doctor_name, date, MAX(queue_number) FROM appointments
+             WHERE queue_number IS NOT NULL
+             GROUP BY doctor_name, date;
+    '''),
+    (5, 'incrementally maintained appointment statistics', '''
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            date TEXT NOT NULL,
+            doctor_name TEXT NOT NULL,
+            status TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (date, doctor_name, status)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS status_totals (
+            status TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+
+        DELETE FROM daily_stats;
+        DELETE FROM status_totals;
+        INSERT INTO daily_stats (date, doctor_name, status, count)
+            SELECT date, doctor_name, IFNULL(status, ''), COUNT(*) FROM appointments
+             GROUP BY date, doctor_name, IFNULL(status, '');
+        INSERT INTO status_totals (status, count)
+            SELECT status, SUM(count) FROM daily_stats GROUP BY status;
+
+        CREATE TRIGGER IF NOT EXISTS trg_appointments_stats_insert
+        AFTER INSERT ON appointments
+        BEGIN
+            INSERT INTO daily_stats (date, doctor_name, status, count)
+                VALUES (NEW.date, NEW.doctor_name, IFNULL(NEW.status, ''), 1)
+                ON CONFLICT (date, doctor_name, status) DO UPDATE SET count = count + 1;
+            INSERT INTO status_totals (status, count) VALUES (IFNULL(NEW.status, ''), 1)
+                ON CONFLICT (status) DO UPDATE SET count = count + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_appointments_stats_delete
+        AFTER DELETE ON appointments
+        BEGIN
+            UPDATE daily_stats SET count = count - 1
+             WHERE date = OLD.date AND doctor_name = OLD.doctor_name AND status = IFNULL(OLD.status, '');
+            UPDATE status_totals SET count = count - 1 WHERE status = IFNULL(OLD.status, '');
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_appointments_stats_update
+        AFTER UPDATE OF date, doctor_name, status ON appointments
+        WHEN OLD.date IS NOT NEW.date OR OLD.doctor_name IS NOT NEW.doctor_name OR OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE daily_stats SET count = count - 1
+             WHERE date = OLD.date AND doctor_name = OLD.doctor_name AND status = IFNULL(OLD.status, '');
+            INSERT INTO daily_stats (date, doctor_name, status, count)
+                VALUES (NEW.date, NEW.doctor_name, IFNULL(NEW.status, ''), 1)
+                ON CONFLICT (date, doctor_name, status) DO UPDATE SET count = count + 1;
+            UPDATE status_totals SET count = count - 1 WHERE status = IFNULL(OLD.status, '');
+            INSERT INTO status_totals (status, count) VALUES (IFNULL(NEW.status, ''), 1)
+                ON CONFLICT (status) DO UPDATE SET count = count + 1;
+        END;
+    '''),
+    (6, 'patient and doctor foreign keys on appointments', '''
+        ALTER TABLE appointments ADD COLUMN patient_id INTEGER REFERENCES users(id);
+        ALTER TABLE appointments ADD COLUMN doctor_id INTEGER REFERENCES users(id);
+        CREATE INDEX IF NOT EXISTS idx_appointments_patient_id
+            ON appointments (patient_id, date, time);
+        CREATE INDEX IF NOT EXISTS idx_appointments_doctor_id
+            ON appointments (doctor_id, date, time);
+        -- Writers that only know names (older code, scripts) still get ids.
+        CREATE TRIGGER IF NOT EXISTS trg_appointments_fill_user_ids
+        AFTER INSERT ON appointments
+        WHEN NEW.patient_id IS NULL OR NEW.doctor_id IS NULL
+        BEGIN
+            UPDATE appointments SET
+                patient_id = IFNULL(NEW.patient_id, (SELECT MIN(u.id) FROM users u
+                                                      WHERE u.role IN ('patient', 'reception', 'admin')
+                                                        AND u.full_name = NEW.patient_name)),
+                doctor_id = IFNULL(NEW.doctor_id, (SELECT MIN(u.id) FROM users u
+                                                    WHERE u.role = 'doctor'
+                                                      AND u.full_name = NEW.doctor_name))
+             WHERE id = NEW.id;
+        END;
+    '''),
+    (7, 'backfill appointment user ids', backfill_user_ids),
+    (8, 'drop name-based patient index', '''
+        DROP INDEX IF EXISTS idx_appointments_patient;
+    '''),
+    (9, 'full-text search over people and appointments', '''
+        -- External-content FTS5 tables: the text lives in users/appointments,
+        -- the index is kept in step by the triggers below.
+        CREATE VIRTUAL TABLE IF NOT EXISTS people_fts USING fts5(
+            full_name, specialization, role UNINDEXED,
+            content='users', content_rowid='id', prefix='2 3'
+        );
+        CREATE VIRTUAL TABLE IF NOT EXISTS appointments_fts USING fts5(
+            patient_name, doctor_name,
+            content='appointments', content_rowid='id', prefix='2 3'
+        );
+        INSERT INTO people_fts(people_fts) VALUES ('rebuild');
+        -- Existing appointments are indexed in batches by migration 12; until
+        -- then the delete/update triggers skip the rows it has not reached.
+        CREATE TABLE IF NOT EXISTS appointments_fts_backfill (
+            next_id INTEGER NOT NULL,
+            last_id INTEGER NOT NULL
+        );
+        INSERT INTO appointments_fts_backfill (next_id, last_id)
+            SELECT 0, MAX(id) FROM appointments HAVING MAX(id) IS NOT NULL;
+
+        CREATE TRIGGER IF NOT EXISTS trg_users_fts_insert AFTER INSERT ON users
+        BEGIN
+            INSERT INTO people_fts(rowid, full_name, specialization, role)
+                VALUES (NEW.id, NEW.full_name, NEW.specialization, NEW.role);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_users_fts_delete AFTER DELETE ON users
+        BEGIN
+            INSERT INTO people_fts(people_fts, rowid, full_name, specialization, role)
+                VALUES ('delete', OLD.id, OLD.full_name, OLD.specialization, OLD.role);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_users_fts_update
+        AFTER UPDATE OF full_name, specialization, role ON users
+        BEGIN
+            INSERT INTO people_fts(people_fts, rowid, full_name, specialization, role)
+                VALUES ('delete', OLD.id, OLD.full_name, OLD.specialization, OLD.role);
+            INSERT INTO people_fts(rowid, full_name, specialization, role)
+                VALUES (NEW.id, NEW.full_name, NEW.specialization, NEW.role);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_appointments_fts_insert AFTER INSERT ON appointments
+        BEGIN
+            INSERT INTO appointments_fts(rowid, patient_name, doctor_name)
+                VALUES (NEW.id, NEW.patient_name, NEW.doctor_name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_appointments_fts_delete AFTER DELETE ON appointments
+        WHEN NOT EXISTS (SELECT 1 FROM appointments_fts_backfill WHERE OLD.id > next_id AND OLD.id <= last_id)
+        BEGIN
+            INSERT INTO appointments_fts(appointments_fts, rowid, patient_name, doctor_name)
+                VALUES ('delete', OLD.id, OLD.patient_name, OLD.doctor_name);
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_appointments_fts_update
+        AFTER UPDATE OF patient_name, doctor_name ON appointments
+        WHEN NOT EXISTS (SELECT 1 FROM appointments_fts_backfill WHERE OLD.id > next_id AND OLD.id <= last_id)
+        BEGIN
+            INSERT INTO appointments_fts(appointments_fts, rowid, patient_name, doctor_name)
+                VALUES ('delete', OLD.id, OLD.patient_name, OLD.doctor_name);
+            INSERT INTO appointments_fts(rowid, patient_name, doctor_name)
+                VALUES (NEW.id, NEW.patient_name, NEW.doctor_name);
+        END;
+    '''),
+    (10, 'appointment archive and history view', '''
+        -- Finished appointments past the archive horizon move here (see
+        -- archive.py); ids are kept, so links and export watermarks hold.
+        CREATE TABLE IF NOT EXISTS appointments_archive (
+            id INTEGER PRIMARY KEY,
+            patient_name TEXT NOT NULL,
+            doctor_name TEXT NOT NULL,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            status TEXT,
+            queue_number INTEGER,
+            patient_id INTEGER,
+            doctor_id INTEGER,
+            archived_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_appointments_archive_date_time
+            ON appointments_archive (date, time);
+        CREATE INDEX IF NOT EXISTS idx_appointments_archive_patient_id
+            ON appointments_archive (patient_id, date, time);
+        CREATE INDEX IF NOT EXISTS idx_appointments_archive_doctor_id
+            ON appointments_archive (doctor_id, date, time);
+        -- Full history for lists and exports; ordered reads over it merge
+        -- the two index walks instead of sorting.
+        CREATE VIEW IF NOT EXISTS appointments_history AS
+            SELECT id, patient_name, doctor_name, date, time, status, queue_number, patient_id, doctor_id
+              FROM appointments
+            UNION ALL
+            SELECT id, patient_name, doctor_name, date, time, status, queue_number, patient_id, doctor_id
+              FROM appointments_archive;
+    '''),
+    (11, 'doctor schedules and materialized slots', '''
+        -- Weekly working hours per doctor; doctors without rows work the
+        -- clinic default (schedules.DEFAULT_HOURS). weekday: Monday = 0.
+        CREATE TABLE IF NOT EXISTS schedule_templates (
+            id INTEGER PRIMARY KEY,
+            doctor_id INTEGER NOT NULL REFERENCES users(id),
+            weekday INTEGER NOT NULL CHECK (weekday BETWEEN 0 AND 6),
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            slot_minutes INTEGER NOT NULL DEFAULT 30
+        );
+        CREATE INDEX IF NOT EXISTS idx_schedule_templates_doctor
+            ON schedule_templates (doctor_id, weekday);
+        -- Recurring breaks (weekday NULL: every day) and leave date ranges.
+        CREATE TABLE IF NOT EXISTS schedule_breaks (
+            id INTEGER PRIMARY KEY,
+            doctor_id INTEGER NOT NULL REFERENCES users(id),
+            weekday INTEGER CHECK (weekday BETWEEN 0 AND 6),
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_schedule_breaks_doctor
+            ON schedule_breaks (doctor_id);
+        CREATE TABLE IF NOT EXISTS schedule_leave (
+            id INTEGER PRIMARY KEY,
+            doctor_id INTEGER NOT NULL REFERENCES users(id),
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            reason TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_schedule_leave_doctor
+            ON schedule_leave (doctor_id, end_date);
+
+        -- One row per bookable slot, filled by schedules.refresh() for
+        -- [first_date, last_date] of each doctor's slot_horizon row.
+        CREATE TABLE IF NOT EXISTS slots (
+            doctor_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            state TEXT NOT NULL CHECK (state IN ('open', 'booked', 'closed')),
+            PRIMARY KEY (doctor_id, date, time)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS slot_horizon (
+            doctor_id INTEGER PRIMARY KEY,
+            first_date TEXT NOT NULL,
+            last_date TEXT NOT NULL
+        );
+
+        -- Active bookings flip open slots to booked and back. A closed slot
+        -- (break, leave) stays closed whatever is booked on it.
+        CREATE TRIGGER IF NOT EXISTS trg_appointments_slots_insert
+        AFTER INSERT ON appointments
+        WHEN NEW.status IN ('pending', 'checked_in')
+        BEGIN
+            UPDATE slots SET state = 'booked'
+             WHERE doctor_id = IFNULL(NEW.doctor_id, (SELECT MIN(u.id) FROM users u
+                                                       WHERE u.role = 'doctor' AND u.full_name = NEW.doctor_name))
+               AND date = NEW.date AND time = NEW.time AND state = 'open';
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_appointments_slots_delete
+        AFTER DELETE ON appointments
+        WHEN OLD.status IN ('pending', 'checked_in')
+        BEGIN
+            UPDATE slots SET state = 'open'
+             WHERE doctor_id = IFNULL(OLD.doctor_id, (SELECT MIN(u.id) FROM users u
+                                                       WHERE u.role = 'doctor' AND u.full_name = OLD.doctor_name))
+               AND date = OLD.date AND time = OLD.time AND state = 'booked';
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_appointments_slots_update
+        AFTER UPDATE OF doctor_name, date, time, status ON appointments
+        WHEN OLD.doctor_name IS NOT NEW.doctor_name OR OLD.date IS NOT NEW.date OR OLD.time IS NOT NEW.time
+          OR (IFNULL(OLD.status, '') IN ('pending', 'checked_in')) IS NOT (IFNULL(NEW.status, '') IN ('pending', 'checked_in'))
+        BEGIN
+            UPDATE slots SET state = 'open'
+             WHERE OLD.status IN ('pending', 'checked_in')
+               AND doctor_id = IFNULL(OLD.doctor_id, (SELECT MIN(u.id) FROM users u
+                                                       WHERE u.role = 'doctor' AND u.full_name = OLD.doctor_name))
+               AND date = OLD.date AND time = OLD.time AND state = 'booked';
+            UPDATE slots SET state = 'booked'
+             WHERE NEW.status IN ('pending', 'checked_in')
+               AND doctor_id = IFNULL(NEW.doctor_id, (SELECT MIN(u.id) FROM users u
+                                                       WHERE u.role = 'doctor' AND u.full_name = NEW.doctor_name))
+               AND date = NEW.date AND time = NEW.time AND state = 'open';
+        END;
+    '''),
+    (12, 'index existing appointments for search', index_appointments),
+]
+
+
+# Steps that index or rewrite the whole appointments table. They hold the
+# write lock for seconds on a large table, longer than the app's
+# busy_timeout, so the app applies them itself only to small databases;
+# larger ones run `python migrations.py` before deploying.
+OFFLINE_STEPS = {2, 3, 4, 5, 6}
+
+
+def table_rows(conn, table='appointments'):
+    # Upper bound from the rowid, without a scan; 0 before the table exists.
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone() is None:
+        return 0
+    return conn.execute(f"SELECT IFNULL(MAX(rowid), 0) FROM {table}").fetchone()[0]
+
+
+def current_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def _statements(script):
+    # executescript() commits any open transaction first, so a script is fed
+    # to execute() one complete statement (triggers included) at a time.
+    pending = ''
+    for line in script.splitlines(keepends=True):
+        pending += line
+        if sqlite3.complete_statement(pending):
+            yield pending
+            pending = ''
+    if pending.strip():
+        yield pending
+
+
+def migrate(conn, target=None, defer_data=False, offline_max_rows=None):
+    # Safe to run from several processes at once (each worker migrates on
+    # its first request): a step takes the write lock and re-reads
+    # user_version, so it is applied by exactly one of them. With
+    # defer_data, callable steps are only recorded in deferred_migrations
+    # and left for run_deferred(); otherwise they, and any recorded earlier,
+    # run here. With offline_max_rows, an OFFLINE_STEPS step over a larger
+    # appointments table raises MigrationRequired instead of running.
+    applied = []
+    for number, name, step in MIGRATIONS:
+        if number <= current_version(conn) or (target is not None and number > target):
+            continue
+        if offline_max_rows is not None and number in OFFLINE_STEPS and table_rows(conn) > offline_max_rows:
+            raise MigrationRequired(
+                f"Migration {number} ({name}) works through the whole appointments table; "
+                "run `python migrations.py` before starting the app."
+            )
+        if conn.in_transaction:
+            conn.commit()
+        if callable(step) and not defer_data:
+            step(conn)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if current_version(conn) >= number:
+                conn.rollback()
+                continue
+            if callable(step) and defer_data:
+                conn.execute("CREATE TABLE IF NOT EXISTS deferred_migrations "
+                             "(number INTEGER PRIMARY KEY, name TEXT NOT NULL)")
+                conn.execute("INSERT OR IGNORE INTO deferred_migrations (number, name) VALUES (?, ?)",
+                             (number, name))
+            elif not callable(step):
+                for statement in _statements(step):
+                    conn.execute(statement)
+            conn.execute(f'PRAGMA user_version={number}')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied.append((number, name))
+    if not defer_data:
+        run_deferred(conn)
+    return applied
+
+
+def deferred(conn):
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='deferred_migrations'").fetchone() is None:
+        return []
+    return [tuple(r) for r in conn.execute("SELECT number, name FROM deferred_migrations ORDER BY number")]
+
+
+def run_deferred(conn):
+    # Data steps are resumable, so two processes running the same one only
+    # repeat a little work; the record is removed once a step completes.
+    steps = {number: step for number, _, step in MIGRATIONS}
+    done = []
+    for number, name in deferred(conn):
+        steps[number](conn)
+        with conn:
+            conn.execute("DELETE FROM deferred_migrations WHERE number = ?", (number,))
+        done.append((number, name))
+    return done
+
+
+if __name__ == '__main__':
+    import sys
+    path = sys.argv[1] if len(sys.argv) > 1 else 'clinic.db'
+    conn = sqlite3.connect(path)
+    for number, name in deferred(conn):
+        print(f"Running deferred data migration {number}: {name}")
+    for number, name in migrate(conn):
+        print(f"Applied migration {number}: {name}")
+        if number == 3:
+            for appointment_id, kept_id in conn.execute(
+                "SELECT appointment_id, kept_id FROM cancelled_duplicates ORDER BY appointment_id"
+            ):
+                print(f"  cancelled duplicate booking {appointment_id} (kept {kept_id})")
+    print(f"{path} is at schema version {current_version(conn)}")
+    conn.close()
@@ -0,0 +1,269 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+from flask import current_app, request, session, Response
+from markupsafe import Markup
+import metrics
+
+# -------------------------
+# Page and fragment cache
+# -------------------------
+# Rendered responses (and template fragments) keyed by endpoint, query
+# string, role (or user) and a data-version counter. Write routes bump the
+# counter, which retires every data-dependent entry at once; nothing is
+# invalidated one key at a time. The memory backend's counter is per process,
+# so PAGE_CACHE_TTL bounds staleness from writes in other workers; the disk
+# backend keeps the counter next to the entries and is shared by every
+# process using the same directory.
+class MemoryBackend:
+    def __init__(self, max_entries=1024, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self._evictions = 0
+
+    def version(self):
+        return self._version
+
+    def bump(self):
+        with self._lock:
+            self._version += 1
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'memory', 'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'evictions': self._evictions, 'version': self._version}
+
+
+class DiskBackend:
+    # One pickle per entry, written atomically. The version is the length of
+    # an append-only file: an O_APPEND write is atomic across processes.
+    PRUNE_EVERY = 64
+
+    def __init__(self, directory, max_entries=10000, ttl=300.0):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+        self._version_path = os.path.join(directory, 'version')
+        self._writes = 0
+        self._evictions = 0
+        self._lock = threading.Lock()
+
+    def version(self):
+        try:
+            return os.stat(self._version_path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def bump(self):
+        fd = os.open(self._version_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, b'.')
+        finally:
+            os.close(fd)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + '.page')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if self.ttl and time.time() - os.stat(path).st_mtime > self.ttl:
+                return None
+            with open(path, 'rb') as f:
+                stored_key, value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return value if stored_key == key else None
+
+    def set(self, key, value):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((key, value), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._path(key))
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            self._prune()
+
+    def _prune(self):
+        # Expired entries first, then the oldest beyond max_entries.
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.page'):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass
+        entries.sort()
+        cutoff = time.time() - self.ttl if self.ttl else 0
+        excess = len(entries) - self.max_entries
+        for i, (mtime, path) in enumerate(entries):
+            if mtime >= cutoff and i >= excess:
+                break
+            try:
+                os.remove(path)
+                self._evictions += 1
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.page'):
+                os.remove(entry.path)
+
+    def stats(self):
+        entries = sum(1 for e in os.scandir(self.directory) if e.name.endswith('.page'))
+        return {'backend': 'disk', 'entries': entries, 'max_entries': self.max_entries,
+                'evictions': self._evictions, 'version': self.version()}
+
+
+class PageCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, name, result):
+        with self._lock:
+            counts = self._counts.setdefault(name, {'hit': 0, 'miss': 0, 'bypass': 0})
+            counts[result] += 1
+        registry = metrics.active_registry()
+        if registry is not None:
+            registry.page_cache.inc(1, name, result)
+
+    def stats(self):
+        with self._lock:
+            names = {name: dict(counts) for name, counts in self._counts.items()}
+        hits = sum(c['hit'] for c in names.values())
+        misses = sum(c['miss'] for c in names.values())
+        return {
+            **self.backend.stats(),
+            'hits': hits,
+            'misses': misses,
+            'bypassed': sum(c['bypass'] for c in names.values()),
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            'by_name': names,
+        }
+
+
+# -------------------------
+# Flask integration
+# -------------------------
+def init_app(app):
+    app.config.setdefault('PAGE_CACHE_ENABLED', os.environ.get('CLINIC_PAGE_CACHE', '1') != '0')
+    app.config.setdefault('PAGE_CACHE_BACKEND', os.environ.get('CLINIC_PAGE_CACHE_BACKEND', 'memory'))
+    app.config.setdefault('PAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'smartclinic_pages'))
+    app.config.setdefault('PAGE_CACHE_SIZE', 1024)
+    app.config.setdefault('PAGE_CACHE_TTL', 30.0)
+    if app.config['PAGE_CACHE_BACKEND'] == 'disk':
+        backend = DiskBackend(app.config['PAGE_CACHE_DIR'], app.config['PAGE_CACHE_SIZE'],
+                              app.config['PAGE_CACHE_TTL'])
+    else:
+        backend = MemoryBackend(app.config['PAGE_CACHE_SIZE'], app.config['PAGE_CACHE_TTL'])
+    app.extensions['page_cache'] = PageCache(backend)
+    app.jinja_env.globals['cached_fragment'] = cached_fragment
+
+
+def get_cache():
+    return current_app.extensions['page_cache']
+
+
+def bump():
+    # Called by every route that writes appointments or users.
+    get_cache().backend.bump()
+
+
+def _conditional(response, etag, state):
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.headers['X-Cache'] = state
+    return response.make_conditional(request)
+
+
+def cached_page(per_user=False, data=True, flashes=False):
+    # GET-only response cache with ETag revalidation. Place it below the
+    # login/role decorators so access checks still run on every hit.
+    # per_user: the page shows the user's own details; data: it lists
+    # appointments, so the key carries the data version and today's date;
+    # flashes: its template renders flash messages, so requests with some
+    # pending skip the cache.
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method != 'GET' or not current_app.config['PAGE_CACHE_ENABLED']:
+                return f(*args, **kwargs)
+            cache = get_cache()
+            # Pending flash messages are rendered (and consumed) by the page.
+            if flashes and '_flashes' in session:
+                cache.record(request.endpoint, 'bypass')
+                return f(*args, **kwargs)
+            key = ('page', request.endpoint, request.query_string, session.get('role'),
+                   session.get('user_id') if per_user else None,
+                   (cache.backend.version(), date.today().isoformat()) if data else None)
+            entry = cache.backend.get(key)
+            if entry is not None:
+                cache.record(request.endpoint, 'hit')
+                body, mimetype, etag = entry
+                return _conditional(Response(body, mimetype=mimetype), etag, 'HIT')
+            cache.record(request.endpoint, 'miss')
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            body = response.get_data()
+            entry = (body, response.mimetype, hashlib.sha1(body).hexdigest())
+            cache.backend.set(key, entry)
+            return _conditional(response, entry[2], 'MISS')
+        return decorated_function
+    return decorator
+
+
+def cached_fragment(name, *vary, caller):
+    # {% call cached_fragment('name', arg, ...) %}...{% endcall %}: the block
+    # output keyed by name, the extra args, the role and the data version.
+    if not current_app.config['PAGE_CACHE_ENABLED']:
+        return caller()
+    cache = get_cache()
+    key = ('fragment', name, vary, session.get('role'), cache.backend.version(), date.today().isoformat())
+    html = cache.backend.get(key)
+    if html is not None:
+        cache.record(f'fragment:{name}', 'hit')
+        return Markup(html)
+    cache.record(f'fragment:{name}', 'miss')
+    html = caller()
+    cache.backend.set(key, str(html))
+    return html
@@ -0,0 +1,81 @@
+import base64
+import heapq
+import json
+
+# -------------------------
+# Keyset pagination
+# -------------------------
+# Appointment lists are paged by seeking on (date, time, id) instead of
+# OFFSET: every page is an index range read of at most `limit + 1` rows, so
+# cost does not grow with history. Cursors encode the key of the boundary
+# row and stay valid while rows are inserted or cancelled around them.
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+SEEK_AFTER = "(date, time, id) > (?, ?, ?) ORDER BY date, time, id LIMIT ?"
+SEEK_BEFORE = "(date, time, id) < (?, ?, ?) ORDER BY date DESC, time DESC, id DESC LIMIT ?"
+FIRST = ("", "", 0)
+
+
+def sort_key(row):
+    return (row['date'], row['time'], row['id'])
+
+
+def encode_cursor(row):
+    raw = json.dumps(list(sort_key(row)), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        date, time, row_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid page cursor.")
+    if not (isinstance(date, str) and isinstance(time, str) and isinstance(row_id, int)):
+        raise ValueError("Invalid page cursor.")
+    return date, time, row_id
+
+
+class Page:
+    def __init__(self, rows, next_cursor=None, prev_cursor=None):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def as_dict(self, limit):
+        return {
+            'appointments': [dict(r) for r in self.rows],
+            'limit': limit,
+            'next_cursor': self.next_cursor,
+            'prev_cursor': self.prev_cursor,
+        }
+
+
+def fetch_page(conn, filters, after=None, before=None, limit=DEFAULT_PAGE_SIZE):
+    # `filters` is a list of (where, params) alternatives, e.g. one per
+    # matching doctor_id. Each is seeked separately along its own index and
+    # the sorted runs are merged, so an IN-list never forces a full sort.
+    backwards = before is not None and after is None
+    if backwards:
+        key, seek, reverse = decode_cursor(before), SEEK_BEFORE, True
+    else:
+        key, seek, reverse = (decode_cursor(after) if after else FIRST), SEEK_AFTER, False
+
+    runs = [
+        conn.execute(f"SELECT * FROM appointments_history WHERE {where} AND {seek}",
+                     (*params, *key, limit + 1)).fetchall()
+        for where, params in filters
+    ]
+    rows = list(heapq.merge(*runs, key=sort_key, reverse=reverse))[:limit + 1]
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+    if not rows:
+        return Page(rows)
+
+    if backwards:
+        return Page(rows, next_cursor=encode_cursor(rows[-1]),
+                    prev_cursor=encode_cursor(rows[0]) if more else None)
+    return Page(rows, next_cursor=encode_cursor(rows[-1]) if more else None,
+                prev_cursor=encode_cursor(rows[0]) if after else None)
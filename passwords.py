@@ -0,0 +1,236 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+# -------------------------
+# Password hashing service
+# -------------------------
+# Key derivation is deliberately slow and holds the GIL, so running it on
+# request threads stalls every other request in the process. Hashes are
+# computed in a small process pool instead; callers past the queue limit get
+# HashingBusy right away rather than piling up behind a login storm. The
+# method string is the policy: hashes made under an older one are upgraded
+# on the next successful login.
+DEFAULT_METHOD = 'pbkdf2:sha256:600000'
+LATENCY_SAMPLES = 1000
+
+
+class HashingBusy(Exception):
+    pass
+
+
+def _timed_hash(password, method, salt_length):
+    started = time.perf_counter()
+    return generate_password_hash(password, method, salt_length), time.perf_counter() - started
+
+
+def _timed_check(stored, password):
+    started = time.perf_counter()
+    return check_password_hash(stored, password), time.perf_counter() - started
+
+
+class PasswordHasher:
+    def __init__(self, method=DEFAULT_METHOD, salt_length=16, workers=None, max_queue=64, timeout=10.0):
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._pool = None
+        self._pool_pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._rejected = 0
+        self._rehashed = 0
+        self._samples = {'hash': deque(maxlen=LATENCY_SAMPLES), 'verify': deque(maxlen=LATENCY_SAMPLES)}
+        self._counts = {'hash': 0, 'verify': 0}
+
+    def _executor(self):
+        # One pool per process (server workers fork after import). Spawned
+        # children do not inherit the parent's threads or SQLite handles.
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _discard(self, pool):
+        # A worker that dies (OOM killer, crash) breaks its executor for good;
+        # the next call starts a fresh one.
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _acquire(self, force=False):
+        with self._lock:
+            if not force and self._pending >= self.max_queue:
+                self._rejected += 1
+                raise HashingBusy("Too many sign-ins at once, please try again in a moment.")
+            self._pending += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def _remote(self, fn, *args):
+        # The queue slot taken by _run is handed to the job and released when
+        # it finishes, so jobs left behind by a timeout still count against
+        # max_queue. A broken pool is replaced and the job retried once.
+        for attempt in range(2):
+            if attempt:
+                self._acquire(force=True)
+            pool = self._executor()
+            try:
+                future = pool.submit(fn, *args)
+            except BrokenProcessPool:
+                self._release()
+                self._discard(pool)
+                continue
+            future.add_done_callback(self._release)
+            try:
+                return future.result(self.timeout)
+            except FutureTimeout:
+                future.cancel()
+                raise HashingBusy("Signing in is taking longer than usual, please try again.")
+            except BrokenProcessPool:
+                self._discard(pool)
+        raise HashingBusy("Signing in is temporarily unavailable, please try again.")
+
+    def _run(self, op, fn, *args):
+        self._acquire()
+        started = time.perf_counter()
+        if self.workers:
+            result, compute = self._remote(fn, *args)
+        else:
+            try:
+                result, compute = fn(*args)
+            finally:
+                self._release()
+        total = time.perf_counter() - started
+        with self._lock:
+            self._counts[op] += 1
+            self._samples[op].append((total, compute))
+        return result
+
+    def hash(self, password):
+        return self._run('hash', _timed_hash, password, self.method, self.salt_length)
+
+    def _hash_chunk(self, chunk):
+        for attempt in range(2):
+            pool = self._executor()
+            futures = []
+            try:
+                futures = [pool.submit(_timed_hash, p, self.method, self.salt_length) for p in chunk]
+                return [f.result(self.timeout) for f in futures]
+            except FutureTimeout:
+                for f in futures:
+                    f.cancel()
+                raise HashingBusy("Password hashing is taking longer than usual, please try again.")
+            except BrokenProcessPool:
+                self._discard(pool)
+        raise HashingBusy("Password hashing is temporarily unavailable, please try again.")
+
+    def hash_many(self, passwords):
+        # Bulk hashing for imports, bypassing the queue limit. At most two jobs
+        # per worker are in flight, so a login arriving meanwhile waits behind
+        # one round instead of the whole batch.
+        hashes = []
+        window = max(self.workers * 2, 1)
+        for start in range(0, len(passwords), window):
+            chunk = passwords[start:start + window]
+            if self.workers:
+                results = self._hash_chunk(chunk)
+            else:
+                results = [_timed_hash(p, self.method, self.salt_length) for p in chunk]
+            with self._lock:
+                self._counts['hash'] += len(results)
+            hashes.extend(hashed for hashed, _ in results)
+        return hashes
+
+    def verify(self, stored, password):
+        return self._run('verify', _timed_check, stored, password)
+
+    def needs_rehash(self, stored):
+        return stored.split('$', 1)[0] != self.method
+
+    def rehashed(self):
+        with self._lock:
+            self._rehashed += 1
+
+    def close(self):
+        if self._pool is not None and self._pool_pid == os.getpid():
+            self._pool.shutdown(wait=True)
+        self._pool = None
+
+    def stats(self):
+        with self._lock:
+            ops = {}
+            for op, samples in self._samples.items():
+                totals = sorted(s[0] * 1000 for s in samples)
+                compute = sorted(s[1] * 1000 for s in samples)
+                ops[op] = {
+                    'count': self._counts[op],
+                    'p50_ms': _percentile(totals, 0.50),
+                    'p95_ms': _percentile(totals, 0.95),
+                    'p99_ms': _percentile(totals, 0.99),
+                    'compute_p50_ms': _percentile(compute, 0.50),
+                }
+            return {
+                'method': self.method,
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'pending': self._pending,
+                'rejected': self._rejected,
+                'rehashed': self._rehashed,
+                **ops,
+            }
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    return round(values[min(int(len(values) * q), len(values) - 1)], 2)
+
+
+# -------------------------
+# Flask integration
+# -------------------------
+def _env_number(name, cast, default):
+    value = os.environ.get(name)
+    return cast(value) if value else default
+
+
+def init_app(app):
+    # CLINIC_PASSWORD_* override the defaults; the hasher itself is built on
+    # first use, so config changed after import (serve.py, tests) applies.
+    app.config.setdefault('PASSWORD_HASH_METHOD', os.environ.get('CLINIC_PASSWORD_HASH_METHOD', DEFAULT_METHOD))
+    app.config.setdefault('PASSWORD_SALT_LENGTH', _env_number('CLINIC_PASSWORD_SALT_LENGTH', int, 16))
+    app.config.setdefault('PASSWORD_HASH_WORKERS', _env_number('CLINIC_PASSWORD_HASH_WORKERS', int, None))
+    app.config.setdefault('PASSWORD_HASH_QUEUE', _env_number('CLINIC_PASSWORD_HASH_QUEUE', int, 64))
+    app.config.setdefault('PASSWORD_HASH_TIMEOUT', _env_number('CLINIC_PASSWORD_HASH_TIMEOUT', float, 10.0))
+    app.extensions['password_hasher'] = None
+
+
+_build_lock = threading.Lock()
+
+
+def get_hasher():
+    app = current_app._get_current_object()
+    with _build_lock:
+        if app.extensions['password_hasher'] is None:
+            app.extensions['password_hasher'] = PasswordHasher(
+                app.config['PASSWORD_HASH_METHOD'],
+                app.config['PASSWORD_SALT_LENGTH'],
+                app.config['PASSWORD_HASH_WORKERS'],
+                app.config['PASSWORD_HASH_QUEUE'],
+                app.config['PASSWORD_HASH_TIMEOUT'],
+            )
+        return app.extensions['password_hasher']
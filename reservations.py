@@ -0,0 +1,150 @@
+import sqlite3
+import schedules
+
+# -------------------------
+# Slot reservation
+# -------------------------
+# The unique partial index uq_appointments_active_slot (migration 3) is the
+# source of truth: at most one pending/checked_in row per doctor, date and
+# time. Writers take the write lock with BEGIN IMMEDIATE and let the index
+# reject a taken slot, so there is no window between "check" and "write".
+# When the doctor is known, the slot itself is claimed first inside the
+# same transaction (schedules.claim): only open slots of the doctor's
+# schedule can be booked.
+ACTIVE_STATUSES = ('pending', 'checked_in')
+
+
+class SlotTaken(Exception):
+    pass
+
+
+class SlotUnavailable(Exception):
+    # Not one of the doctor's slots, or closed (break, leave).
+    pass
+
+
+def _claim(conn, doctor_id, slot, appointment_id=None):
+    if appointment_id is not None:
+        # Moving a cancelled appointment, or keeping its current slot, claims nothing.
+        current = conn.execute(
+            "SELECT doctor_name, date, time, status FROM appointments WHERE id=?", (appointment_id,)
+        ).fetchone()
+        if current is None or current[3] not in ACTIVE_STATUSES or tuple(current[:3]) == slot:
+            return
+    state = schedules.claim(conn, doctor_id, slot[1], slot[2])
+    if state == 'booked':
+        raise SlotTaken(*slot)
+    if state != 'open':
+        raise SlotUnavailable(*slot)
+
+
+def _write_slot(conn, sql, params, slot, doctor_id=None, appointment_id=None):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if doctor_id is not None:
+            _claim(conn, doctor_id, slot, appointment_id)
+        cur = conn.execute(sql, params)
+        conn.commit()
+    except sqlite3.IntegrityError as err:
+        conn.rollback()
+        if 'UNIQUE constraint failed: appointments.doctor_name' in str(err):
+            raise SlotTaken(*slot) from err
+        raise
+    except BaseException:
+        conn.rollback()
+        raise
+    return cur
+
+
+def reserve_slot(conn, patient, doctor, date, time, patient_id=None, doctor_id=None):
+    cur = _write_slot(
+        conn,
+        "INSERT INTO appointments (patient_name, doctor_name, date, time, status, patient_id, doctor_id) "
+        "VALUES (?,?,?,?,?,?,?)",
+        (patient, doctor, date, time, 'pending', patient_id, doctor_id),
+        (doctor, date, time),
+        doctor_id
+    )
+    return cur.lastrowid
+
+
+def move_slot(conn, appointment_id, doctor, date, time, doctor_id=None):
+    _write_slot(
+        conn,
+        "UPDATE appointments SET doctor_name=?, doctor_id=?, date=?, time=? WHERE id=?",
+        (doctor, doctor_id, date, time, appointment_id),
+        (doctor, date, time),
+        doctor_id,
+        appointment_id
+    )
+
+
+# -------------------------
+# Check-in queue numbers
+# -------------------------
+# queue_counters (migration 4) holds the last number handed out per doctor
+# and day. Bumping it inside the check-in transaction makes allocation O(1)
+# and race-free; the old MAX(queue_number)+1 read could hand out duplicates.
+class CheckinError(Exception):
+    pass
+
+
+def _next_queue_number(conn, doctor, date):
+    conn.execute(
+        "INSERT INTO queue_counters (doctor_name, date, last_number) VALUES (?,?,1) "
+        "ON CONFLICT(doctor_name, date) DO UPDATE SET last_number=last_number+1",
+        (doctor, date)
+    )
+    return conn.execute(
+        "SELECT last_number FROM queue_counters WHERE doctor_name=? AND date=?",
+        (doctor, date)
+    ).fetchone()[0]
+
+
+def _admit(conn, appointment_id):
+    appt = conn.execute(
+        "SELECT doctor_name, date, status, queue_number FROM appointments WHERE id=?",
+        (appointment_id,)
+    ).fetchone()
+    if appt is None:
+        raise CheckinError("Appointment not found.")
+    doctor, date, status, queue_number = appt
+    if status == 'checked_in':
+        return queue_number
+    if status != 'pending':
+        raise CheckinError(f"Appointment is {status} and cannot be checked in.")
+    queue_number = _next_queue_number(conn, doctor, date)
+    conn.execute(
+        "UPDATE appointments SET status='checked_in', queue_number=? WHERE id=?",
+        (queue_number, appointment_id)
+    )
+    return queue_number
+
+
+def check_in(conn, appointment_id):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        queue_number = _admit(conn, appointment_id)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return queue_number
+
+
+def check_in_many(conn, appointment_ids):
+    # One write transaction for the whole batch; rows that cannot be admitted
+    # are reported back instead of aborting the rest.
+    admitted, skipped = {}, {}
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for appointment_id in appointment_ids:
+            try:
+                admitted[appointment_id] = _admit(conn, appointment_id)
+            except CheckinError as err:
+                skipped[appointment_id] = str(err)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return admitted, skipped
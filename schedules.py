@@ -0,0 +1,389 @@
+import argparse
+import logging
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+from datetime import date as date_cls, timedelta
+import db
+import migrations
+
+# -------------------------
+# Doctor schedules and the slot table
+# -------------------------
+# Working hours are weekly templates per doctor (schedule_templates: weekday,
+# start, end, slot length) minus recurring breaks and leave date ranges;
+# doctors without a template work DEFAULT_HOURS every day. refresh() writes
+# the resulting slots, one row per doctor, date and time with state open,
+# booked or closed (break / leave), from today to SLOT_HORIZON_DAYS ahead,
+# and records the materialized window in slot_horizon. Triggers on
+# appointments keep the booked state current (migration 11), so a doctor-day
+# is one primary-key range read and reserving is one lookup before the
+# insert. Days outside a doctor's window are worked out from the same rules
+# on the fly; the unique slot index still has the final say on bookings.
+DEFAULT_HOURS = (('09:00', '12:00'), ('14:00', '17:00'))
+DEFAULT_SLOT_MINUTES = 30
+SLOT_HORIZON_DAYS = 60
+REFRESH_SECONDS = 3600
+SLOT_MINUTES_RANGE = (5, 240)
+CLOCK = re.compile(r'^([01]\d|2[0-3]):[0-5]\d$')
+
+log = logging.getLogger('smartclinic.schedules')
+
+Rules = namedtuple('Rules', 'hours breaks leave')
+
+
+class ScheduleError(ValueError):
+    pass
+
+
+def _minutes(clock):
+    hours, minutes = clock.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def _clock(minutes):
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def _starts(start, end, step):
+    # Slot start times (minutes) of a working block; a partial last slot is dropped.
+    return range(start, end - step + 1, step)
+
+
+def _days(first, last):
+    first, last = date_cls.fromisoformat(first), date_cls.fromisoformat(last)
+    return [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+
+
+# -------------------------
+# Rules -> slots
+# -------------------------
+def load_rules(conn, doctor_id, since):
+    hours = {}
+    for weekday, start, end, step in conn.execute(
+        "SELECT weekday, start_time, end_time, slot_minutes FROM schedule_templates WHERE doctor_id=?",
+        (doctor_id,)
+    ):
+        hours.setdefault(weekday, []).append((_minutes(start), _minutes(end), step))
+    if not hours:
+        default = [(_minutes(start), _minutes(end), DEFAULT_SLOT_MINUTES) for start, end in DEFAULT_HOURS]
+        hours = {weekday: default for weekday in range(7)}
+    breaks = [(weekday, _minutes(start), _minutes(end)) for weekday, start, end in conn.execute(
+        "SELECT weekday, start_time, end_time FROM schedule_breaks WHERE doctor_id=?", (doctor_id,)
+    )]
+    leave = [tuple(r) for r in conn.execute(
+        "SELECT start_date, end_date FROM schedule_leave WHERE doctor_id=? AND end_date >= ?", (doctor_id, since)
+    )]
+    return Rules(hours, breaks, leave)
+
+
+def day_slots(rules, day):
+    # [(time, 'open' | 'closed')] for one date, in time order.
+    weekday = date_cls.fromisoformat(day).weekday()
+    on_leave = any(first <= day <= last for first, last in rules.leave)
+    slots = {}
+    for start, end, step in rules.hours.get(weekday, ()):
+        for minute in _starts(start, end, step):
+            closed = on_leave or any(
+                (days is None or days == weekday) and minute < until and minute + step > since
+                for days, since, until in rules.breaks
+            )
+            slots[_clock(minute)] = 'closed' if closed else 'open'
+    return sorted(slots.items())
+
+
+def compute_days(conn, doctor_id, dates):
+    # What refresh() would store for these dates, straight from the rules
+    # and the active appointments.
+    rules = load_rules(conn, doctor_id, dates[0])
+    booked = {tuple(r) for r in conn.execute(
+        "SELECT date, time FROM appointments WHERE doctor_id=? AND date BETWEEN ? AND ? "
+        "AND status IN ('pending', 'checked_in')",
+        (doctor_id, dates[0], dates[-1])
+    )}
+    return {
+        day: [(t, 'booked' if state == 'open' and (day, t) in booked else state) for t, state in day_slots(rules, day)]
+        for day in dates
+    }
+
+
+def materialize(conn, doctor_id, first, last):
+    # Inside the caller's transaction. Existing rows are kept: their state
+    # is already maintained by the triggers.
+    days = compute_days(conn, doctor_id, _days(first, last))
+    rows = [(doctor_id, day, t, state) for day, slots in days.items() for t, state in slots]
+    conn.executemany("INSERT OR IGNORE INTO slots (doctor_id, date, time, state) VALUES (?,?,?,?)", rows)
+    return len(rows)
+
+
+def _set_horizon(conn, doctor_id, first, last):
+    conn.execute(
+        "INSERT INTO slot_horizon (doctor_id, first_date, last_date) VALUES (?,?,?) "
+        "ON CONFLICT (doctor_id) DO UPDATE SET first_date=excluded.first_date, last_date=excluded.last_date",
+        (doctor_id, first, last)
+    )
+
+
+def refresh(conn, days=SLOT_HORIZON_DAYS, today=None):
+    # The background job: per doctor, drop past slots and extend the window
+    # to today + days, one short write transaction each. Returns rows written.
+    today = today or date_cls.today()
+    first, last = today.isoformat(), (today + timedelta(days=days - 1)).isoformat()
+    written = 0
+    for (doctor_id,) in conn.execute("SELECT id FROM users WHERE role='doctor'").fetchall():
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            horizon = conn.execute(
+                "SELECT first_date, last_date FROM slot_horizon WHERE doctor_id=?", (doctor_id,)
+            ).fetchone()
+            conn.execute("DELETE FROM slots WHERE doctor_id=? AND date < ?", (doctor_id, first))
+            start = first
+            if horizon is not None and horizon[1] >= first:
+                start = (date_cls.fromisoformat(horizon[1]) + timedelta(days=1)).isoformat()
+            if start <= last:
+                written += materialize(conn, doctor_id, start, last)
+            _set_horizon(conn, doctor_id, first, last)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    return written
+
+
+def rebuild(conn, doctor_id, days=SLOT_HORIZON_DAYS, today=None):
+    # After a schedule change, inside the caller's transaction: every future
+    # slot of the doctor is recomputed from the new rules.
+    today = today or date_cls.today()
+    first, last = today.isoformat(), (today + timedelta(days=days - 1)).isoformat()
+    conn.execute("DELETE FROM slots WHERE doctor_id=? AND date >= ?", (doctor_id, first))
+    written = materialize(conn, doctor_id, first, last)
+    _set_horizon(conn, doctor_id, first, last)
+    return written
+
+
+# -------------------------
+# Slot lookups
+# -------------------------
+def read_days(conn, doctor_ids, dates):
+    # {doctor_id: {date: [(time, state)]}}: stored slots inside each doctor's
+    # window (one primary-key range read per doctor), computed ones for the
+    # dates outside it.
+    if not doctor_ids:
+        return {}
+    result = {doctor_id: {} for doctor_id in doctor_ids}
+    windows = {}
+    for doctor_id, first, last, day, t, state in conn.execute(
+        "SELECT h.doctor_id, h.first_date, h.last_date, s.date, s.time, s.state FROM slot_horizon h "
+        "LEFT JOIN slots s ON s.doctor_id = h.doctor_id AND s.date BETWEEN ? AND ? "
+        f"WHERE h.doctor_id IN ({','.join('?' * len(doctor_ids))}) ORDER BY h.doctor_id, s.date, s.time",
+        [dates[0], dates[-1], *doctor_ids]
+    ):
+        windows[doctor_id] = (first, last)
+        if day is not None:
+            result[doctor_id].setdefault(day, []).append((t, state))
+    for doctor_id, days in result.items():
+        first, last = windows.get(doctor_id, (None, None))
+        outside = [day for day in dates if first is None or not first <= day <= last]
+        if outside:
+            days.update(compute_days(conn, doctor_id, outside))
+        for day in dates:
+            days.setdefault(day, [])
+    return result
+
+
+def read_day(conn, doctor_id, day):
+    # [(time, state)] for one doctor-day: a single primary-key range read of
+    # the stored slots. Only a day with none stored (outside the window, or
+    # one the doctor does not work) goes through read_days.
+    slots = [(t, state) for t, state in conn.execute(
+        "SELECT time, state FROM slots WHERE doctor_id=? AND date=? ORDER BY time", (doctor_id, day)
+    )]
+    return slots or read_days(conn, [doctor_id], [day])[doctor_id][day]
+
+
+def claim(conn, doctor_id, day, slot):
+    # Inside the booking transaction: books an open stored slot with one
+    # UPDATE and returns 'open'. Otherwise returns its state ('booked',
+    # 'closed', or None when it is not a slot of this doctor). A day outside
+    # the window is judged from the rules and stored nothing; refresh()
+    # picks its bookings up when the window reaches it.
+    params = (doctor_id, day, slot)
+    if conn.execute(
+        "UPDATE slots SET state='booked' WHERE doctor_id=? AND date=? AND time=? AND state='open'", params
+    ).rowcount:
+        return 'open'
+    row = conn.execute("SELECT state FROM slots WHERE doctor_id=? AND date=? AND time=?", params).fetchone()
+    if row is not None:
+        return row[0]
+    try:
+        return dict(compute_days(conn, doctor_id, [day])[day]).get(slot)
+    except ValueError:  # not a date
+        return None
+
+
+def clinic_times(conn):
+    # Every start time any doctor offers, for forms without per-doctor data.
+    times = set()
+    for start, end, step in conn.execute("SELECT DISTINCT start_time, end_time, slot_minutes FROM schedule_templates"):
+        times.update(_clock(m) for m in _starts(_minutes(start), _minutes(end), step))
+    if not times or conn.execute(
+        "SELECT EXISTS (SELECT 1 FROM users u WHERE u.role='doctor' "
+        "AND NOT EXISTS (SELECT 1 FROM schedule_templates t WHERE t.doctor_id = u.id))"
+    ).fetchone()[0]:
+        for start, end in DEFAULT_HOURS:
+            times.update(_clock(m) for m in _starts(_minutes(start), _minutes(end), DEFAULT_SLOT_MINUTES))
+    return sorted(times)
+
+
+# -------------------------
+# Editing schedules
+# -------------------------
+def _check_clock(value, what):
+    if not isinstance(value, str) or not CLOCK.match(value):
+        raise ScheduleError(f"{what} must be HH:MM")
+    return value
+
+
+def _check_weekday(value, optional=False):
+    if value is None and optional:
+        return None
+    if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= 6:
+        raise ScheduleError("weekday must be 0 (Monday) to 6 (Sunday)")
+    return value
+
+
+def _check_date(value, what):
+    try:
+        return date_cls.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        raise ScheduleError(f"{what} must be YYYY-MM-DD")
+
+
+def _interval(item, what):
+    start = _check_clock(item.get('start'), f"{what} start")
+    end = _check_clock(item.get('end'), f"{what} end")
+    if start >= end:
+        raise ScheduleError(f"{what} start must be before its end")
+    return start, end
+
+
+def get_schedule(conn, doctor_id):
+    hours = [{'weekday': r[0], 'start': r[1], 'end': r[2], 'slot_minutes': r[3]} for r in conn.execute(
+        "SELECT weekday, start_time, end_time, slot_minutes FROM schedule_templates WHERE doctor_id=? "
+        "ORDER BY weekday, start_time", (doctor_id,)
+    )]
+    breaks = [{'weekday': r[0], 'start': r[1], 'end': r[2]} for r in conn.execute(
+        "SELECT weekday, start_time, end_time FROM schedule_breaks WHERE doctor_id=?", (doctor_id,)
+    )]
+    leave = [{'start_date': r[0], 'end_date': r[1], 'reason': r[2]} for r in conn.execute(
+        "SELECT start_date, end_date, reason FROM schedule_leave WHERE doctor_id=? AND end_date >= ? "
+        "ORDER BY end_date", (doctor_id, date_cls.today().isoformat())
+    )]
+    return {'doctor_id': doctor_id, 'default_hours': not hours, 'hours': hours, 'breaks': breaks, 'leave': leave}
+
+
+def set_schedule(conn, doctor_id, hours=None, breaks=None, leave=None, days=SLOT_HORIZON_DAYS):
+    # Replaces whichever of the three lists is given (an empty hours list
+    # means the clinic default) and rebuilds the doctor's future slots in
+    # the same transaction. Existing bookings are kept either way.
+    rows = {}
+    if hours is not None:
+        rows['hours'] = []
+        for item in hours:
+            start, end = _interval(item, 'hours')
+            step = item.get('slot_minutes', DEFAULT_SLOT_MINUTES)
+            if not isinstance(step, int) or not SLOT_MINUTES_RANGE[0] <= step <= SLOT_MINUTES_RANGE[1]:
+                raise ScheduleError(f"slot_minutes must be {SLOT_MINUTES_RANGE[0]} to {SLOT_MINUTES_RANGE[1]}")
+            if _minutes(end) - _minutes(start) < step:
+                raise ScheduleError("hours must fit at least one slot")
+            rows['hours'].append((doctor_id, _check_weekday(item.get('weekday')), start, end, step))
+    if breaks is not None:
+        rows['breaks'] = [(doctor_id, _check_weekday(item.get('weekday'), optional=True), *_interval(item, 'break'))
+                          for item in breaks]
+    if leave is not None:
+        rows['leave'] = []
+        for item in leave:
+            first = _check_date(item.get('start_date'), 'start_date')
+            last = _check_date(item.get('end_date', item.get('start_date')), 'end_date')
+            if first > last:
+                raise ScheduleError("start_date must not be after end_date")
+            rows['leave'].append((doctor_id, first, last, item.get('reason')))
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if 'hours' in rows:
+            conn.execute("DELETE FROM schedule_templates WHERE doctor_id=?", (doctor_id,))
+            conn.executemany("INSERT INTO schedule_templates (doctor_id, weekday, start_time, end_time, slot_minutes) "
+                             "VALUES (?,?,?,?,?)", rows['hours'])
+        if 'breaks' in rows:
+            conn.execute("DELETE FROM schedule_breaks WHERE doctor_id=?", (doctor_id,))
+            conn.executemany("INSERT INTO schedule_breaks (doctor_id, weekday, start_time, end_time) "
+                             "VALUES (?,?,?,?)", rows['breaks'])
+        if 'leave' in rows:
+            conn.execute("DELETE FROM schedule_leave WHERE doctor_id=?", (doctor_id,))
+            conn.executemany("INSERT INTO schedule_leave (doctor_id, start_date, end_date, reason) "
+                             "VALUES (?,?,?,?)", rows['leave'])
+        rebuild(conn, doctor_id, days)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return get_schedule(conn, doctor_id)
+
+
+# -------------------------
+# Flask integration
+# -------------------------
+def init_app(app):
+    app.config.setdefault('SLOT_HORIZON_DAYS', SLOT_HORIZON_DAYS)
+    app.config.setdefault('SLOT_REFRESH_SECONDS', REFRESH_SECONDS)
+    app.extensions['slot_keeper'] = None
+    _lock = threading.Lock()
+
+    @app.before_request
+    def _start_keeper():
+        # Started by the first request, so each server worker process runs
+        # one (refresh is idempotent) and importing the app starts nothing.
+        if app.extensions['slot_keeper'] is None and app.config['SLOT_REFRESH_SECONDS']:
+            with _lock:
+                if app.extensions['slot_keeper'] is None:
+                    thread = threading.Thread(target=_keep, args=(app,), name='slot-keeper', daemon=True)
+                    app.extensions['slot_keeper'] = thread
+                    thread.start()
+
+
+def _keep(app):
+    while True:
+        pool = db.get_pool(app)
+        try:
+            conn = pool.acquire()
+            try:
+                written = refresh(conn, app.config['SLOT_HORIZON_DAYS'])
+            finally:
+                pool.release(conn)
+            log.info("slot refresh wrote %d slots", written)
+        except Exception:
+            log.exception("slot refresh failed")
+        time.sleep(app.config['SLOT_REFRESH_SECONDS'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Materialize doctor slots for the booking horizon.')
+    parser.add_argument('--db', default='clinic.db')
+    parser.add_argument('--days', type=int, default=SLOT_HORIZON_DAYS)
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    migrations.migrate(conn)
+    started = time.perf_counter()
+    written = refresh(conn, args.days)
+    conn.close()
+    print(f"Wrote {written:,} slots ({args.days} day horizon) in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
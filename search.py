@@ -0,0 +1,51 @@
+import re
+
+# -------------------------
+# Full-text search
+# -------------------------
+# people_fts and appointments_fts (migration 9) are FTS5 indexes over
+# users and appointments, kept current by triggers. Every query term is
+# matched as a prefix, so "rav te" finds "Dr. Ravi Teja" while typing.
+MAX_PAGE_SIZE = 50
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_query(text):
+    tokens = TOKEN.findall(text or '')
+    return ' AND '.join(f'"{t}"*' for t in tokens)
+
+
+def search_people(conn, text, roles, limit=10, offset=0):
+    match = fts_query(text)
+    if not match or not roles:
+        return []
+    rows = conn.execute(
+        f"""
+        SELECT u.id, u.full_name, u.role, u.specialization
+          FROM people_fts
+          JOIN users u ON u.id = people_fts.rowid
+         WHERE people_fts MATCH ? AND u.role IN ({','.join('?' * len(roles))})
+         ORDER BY people_fts.rank
+         LIMIT ? OFFSET ?
+        """,
+        (match, *roles, limit, offset)
+    ).fetchall()
+    return [dict(zip(('id', 'full_name', 'role', 'specialization'), r)) for r in rows]
+
+
+def search_appointments(conn, text, limit=10, offset=0):
+    match = fts_query(text)
+    if not match:
+        return []
+    rows = conn.execute(
+        """
+        SELECT a.id, a.patient_name, a.doctor_name, a.date, a.time, a.status
+          FROM appointments_fts
+          JOIN appointments a ON a.id = appointments_fts.rowid
+         WHERE appointments_fts MATCH ?
+         ORDER BY appointments_fts.rank, a.date DESC
+         LIMIT ? OFFSET ?
+        """,
+        (match, limit, offset)
+    ).fetchall()
+    return [dict(zip(('id', 'patient_name', 'doctor_name', 'date', 'time', 'status'), r)) for r in rows]
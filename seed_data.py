@@ -0,0 +1,221 @@
+"""Synthetic clinic data generator.
+
+Fills a database with the init_db.py schema (all migrations) with doctors,
+patients and several years of appointments, in bulk executemany() batches.
+Meant for load tests and benchmarks, never for the real clinic.db.
+
+    python seed_data.py --db clinic_load.db --doctors 40 --patients 50000 --years 3
+    python seed_data.py --db /tmp/big.db --rows 2000000 --names bench
+
+Every generated account (doctor_000, patient_000001, ...) and the admin /
+reception accounts share the password given by --password.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from werkzeug.security import generate_password_hash
+import migrations
+import passwords
+import schedules
+import stats
+
+SLOTS = ['09:00', '09:30', '10:00', '10:30', '11:00', '11:30',
+         '14:00', '14:30', '15:00', '15:30', '16:00', '16:30']
+STATUSES = ['checked_in'] * 7 + ['cancelled'] * 2 + ['pending']
+SPECIALIZATIONS = ['General', 'Cardiologist', 'Dermatologist', 'Pediatrician', 'Orthopedic',
+                   'Neurologist', 'Gynecologist', 'ENT Specialist', 'Psychiatrist', 'Ophthalmologist']
+FIRST_NAMES = ['Aarav', 'Ananya', 'Arjun', 'Diya', 'Ishaan', 'Kavya', 'Meera', 'Neha', 'Priya', 'Rahul',
+               'Ravi', 'Rohan', 'Saanvi', 'Sneha', 'Vikram', 'Zikra', 'John', 'Maria', 'Omar', 'Lena']
+LAST_NAMES = ['Sharma', 'Teja', 'Reddy', 'Begum', 'Katroth', 'Wesly', 'Vangala', 'Iyer', 'Khan', 'Patel',
+              'Gupta', 'Nair', 'Rao', 'Singh', 'Das', 'Joshi', 'Mehta', 'Kumar', 'Verma', 'Pillai']
+
+# Maintenance triggers that are replaced by one set-based rebuild after a
+# bulk load; per-row upkeep would dominate the load time.
+BULK_TRIGGERS = (
+    'trg_appointments_stats_insert', 'trg_appointments_stats_delete', 'trg_appointments_stats_update',
+    'trg_appointments_fts_insert', 'trg_appointments_fts_delete', 'trg_appointments_fts_update',
+    'trg_appointments_slots_insert', 'trg_appointments_slots_delete', 'trg_appointments_slots_update',
+)
+
+
+def person_name(rnd, i, role, style):
+    if style == 'bench':
+        return f'Dr. Bench {i:03d}' if role == 'doctor' else f'Patient {i:06d}'
+    name = f'{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}'
+    return f'Dr. {name}' if role == 'doctor' else name
+
+
+def create_users(conn, doctors, patients, password_hash, rnd, style='realistic'):
+    # Appointments reference doctors by name, so doctor names must be unique.
+    doctor_names = []
+    for i in range(doctors):
+        name = person_name(rnd, i, 'doctor', style)
+        if name in doctor_names:
+            name = f'{name} {i}'
+        doctor_names.append(name)
+    doctor_rows = [
+        (f'doctor_{i:03d}', name, f'doctor_{i:03d}@clinic.test',
+         password_hash, 'doctor', SPECIALIZATIONS[i % len(SPECIALIZATIONS)])
+        for i, name in enumerate(doctor_names)
+    ]
+    patient_rows = [
+        (f'patient_{i:06d}', person_name(rnd, i, 'patient', style), f'patient_{i:06d}@clinic.test',
+         password_hash, 'patient', None)
+        for i in range(patients)
+    ]
+    staff_rows = [
+        ('admin', 'Admin User', 'admin@clinic.test', password_hash, 'admin', None),
+        ('reception', 'Reception Staff', 'reception@clinic.test', password_hash, 'reception', None),
+    ]
+    with conn:
+        conn.executemany(
+            "INSERT INTO users (username, full_name, email, password, role, specialization) VALUES (?,?,?,?,?,?)",
+            doctor_rows + patient_rows + staff_rows
+        )
+    doctor_list = conn.execute("SELECT id, full_name FROM users WHERE role='doctor' ORDER BY id").fetchall()
+    patient_list = conn.execute("SELECT id, full_name FROM users WHERE role='patient' ORDER BY id").fetchall()
+    return doctor_list, patient_list
+
+
+def iter_appointments(doctors, patients, rnd, days, ahead_days=14, rows=None):
+    # Walks back day by day from `ahead_days` in the future; each doctor-day
+    # gets a random subset of distinct slots, so active bookings never
+    # collide. Past check-ins get queue numbers in slot order.
+    start = date.today() + timedelta(days=ahead_days)
+    today = date.today().isoformat()
+    produced = 0
+    for offset in range(days):
+        day = (start - timedelta(days=offset)).isoformat()
+        for doctor_id, doctor in doctors:
+            queue = 0
+            for slot in sorted(rnd.sample(SLOTS, rnd.randint(4, len(SLOTS)))):
+                if rows is not None and produced >= rows:
+                    return
+                status = 'pending' if day >= today else rnd.choice(STATUSES)
+                queue_number = None
+                if status == 'checked_in':
+                    queue += 1
+                    queue_number = queue
+                patient_id, patient = patients[rnd.randrange(len(patients))]
+                yield (patient, doctor, day, slot, status, queue_number, patient_id, doctor_id)
+                produced += 1
+
+
+def insert_appointments(conn, rows, batch=50_000):
+    # Schemas older than migration 6 (see benchmarks/migration_bench.py)
+    # have no id columns; those rows are stored by name only.
+    columns = ['patient_name', 'doctor_name', 'date', 'time', 'status', 'queue_number', 'patient_id', 'doctor_id']
+    existing = {r[1] for r in conn.execute("PRAGMA table_info(appointments)")}
+    width = len([c for c in columns if c in existing])
+    columns = columns[:width]
+    sql = f"INSERT INTO appointments ({', '.join(columns)}) VALUES ({','.join('?' * width)})"
+    pending, total = [], 0
+    for row in rows:
+        pending.append(row[:width])
+        if len(pending) >= batch:
+            with conn:
+                conn.executemany(sql, pending)
+            total += len(pending)
+            pending = []
+    if pending:
+        with conn:
+            conn.executemany(sql, pending)
+        total += len(pending)
+    return total
+
+
+def _exists(conn, kind, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type=? AND name=?", (kind, name)).fetchone() is not None
+
+
+@contextmanager
+def bulk_load(conn):
+    # Fresh databases only: drops the per-row maintenance triggers, lets the
+    # caller insert, then rebuilds what they maintain and restores them.
+    saved = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type='trigger' AND name IN ({','.join('?' * len(BULK_TRIGGERS))})",
+        BULK_TRIGGERS
+    ).fetchall()
+    with conn:
+        for name, _ in saved:
+            conn.execute(f"DROP TRIGGER {name}")
+    yield conn
+    if _exists(conn, 'table', 'daily_stats'):
+        stats.rebuild(conn, 'appointments')
+    with conn:
+        if _exists(conn, 'table', 'slots'):
+            # Refilled from the new appointments by schedules.refresh().
+            conn.execute("DELETE FROM slots")
+            conn.execute("DELETE FROM slot_horizon")
+        if _exists(conn, 'table', 'appointments_fts'):
+            conn.execute("INSERT INTO appointments_fts(appointments_fts) VALUES ('rebuild')")
+            conn.execute("DELETE FROM appointments_fts_backfill")
+        if _exists(conn, 'table', 'queue_counters'):
+            conn.execute("DELETE FROM queue_counters")
+            conn.execute(
+                "INSERT INTO queue_counters (doctor_name, date, last_number) "
+                "SELECT doctor_name, date, MAX(queue_number) FROM appointments "
+                "WHERE queue_number IS NOT NULL GROUP BY doctor_name, date"
+            )
+        for _, sql in saved:
+            conn.execute(sql)
+
+
+def generate(path, doctors=40, patients=50_000, years=2, rows=None, ahead_days=14, seed=1817,
+             batch=50_000, password='password', style='realistic', target=None):
+    # Returns an open connection to a freshly generated database at `path`.
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=OFF')
+    migrations.migrate(conn, target)
+    rnd = random.Random(seed)
+
+    # One hash for every generated account keeps seeding fast; None leaves
+    # the accounts without a usable password.
+    password_hash = generate_password_hash(password, passwords.DEFAULT_METHOD) if password else '!'
+    doctor_list, patient_list = create_users(conn, doctors, patients, password_hash, rnd, style)
+    days = years * 365 + ahead_days if rows is None else 10 ** 6
+    with bulk_load(conn):
+        insert_appointments(conn, iter_appointments(doctor_list, patient_list, rnd, days, ahead_days, rows), batch)
+    if _exists(conn, 'table', 'slots'):
+        schedules.refresh(conn)
+    conn.execute('ANALYZE')
+    conn.commit()
+    return conn
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True, help='database file to (re)create')
+    parser.add_argument('--doctors', type=int, default=40)
+    parser.add_argument('--patients', type=int, default=50_000)
+    parser.add_argument('--years', type=int, default=2, help='years of appointment history')
+    parser.add_argument('--rows', type=int, help='stop after this many appointments instead')
+    parser.add_argument('--ahead-days', type=int, default=14, help='days of future bookings')
+    parser.add_argument('--names', choices=('realistic', 'bench'), default='realistic')
+    parser.add_argument('--password', default='password')
+    parser.add_argument('--seed', type=int, default=1817)
+    args = parser.parse_args(argv)
+
+    if os.path.abspath(args.db) == os.path.abspath('clinic.db'):
+        sys.exit("Refusing to overwrite clinic.db; pick another --db.")
+    started = time.perf_counter()
+    conn = generate(args.db, args.doctors, args.patients, args.years, args.rows, args.ahead_days,
+                    args.seed, password=args.password, style=args.names)
+    count = conn.execute("SELECT COUNT(*) FROM appointments").fetchone()[0]
+    conn.close()
+    print(f"Generated {args.doctors} doctors, {args.patients:,} patients and {count:,} appointments "
+          f"in {time.perf_counter() - started:.1f}s -> {args.db}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
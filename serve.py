@@ -0,0 +1,58 @@
+"""Production server for SmartClinic (ASGI, via uvicorn).
+
+    python serve.py                              # 127.0.0.1:8000, 1 worker, 16 threads
+    python serve.py --host 0.0.0.0 --workers 4 --threads 16 --database /srv/clinic.db
+
+Each worker process runs its own event loop, request thread pool and
+SQLite connection pool (see asgi.py). SIGTERM/SIGINT stop accepting new
+connections, let in-flight requests finish for up to --graceful-timeout
+seconds, then close the pools. `python app.py` remains the dev server.
+"""
+import argparse
+import os
+import sys
+
+from asgi import DEFAULT_STREAM_THREADS, DEFAULT_THREADS
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default=os.environ.get('CLINIC_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('CLINIC_PORT', 8000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('CLINIC_WORKERS', 1)))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('CLINIC_THREADS', DEFAULT_THREADS)),
+                        help='request threads per worker (database and hashing work runs here)')
+    parser.add_argument('--stream-threads', type=int,
+                        default=int(os.environ.get('CLINIC_STREAM_THREADS', DEFAULT_STREAM_THREADS)),
+                        help='threads per worker for streamed bodies (SSE, exports)')
+    parser.add_argument('--database', default=os.environ.get('CLINIC_DATABASE'))
+    parser.add_argument('--graceful-timeout', type=float, default=30.0)
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args(argv)
+
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("serve.py needs uvicorn: pip install uvicorn")
+
+    # Each worker process builds its adapter from this environment.
+    os.environ['CLINIC_THREADS'] = str(args.threads)
+    os.environ['CLINIC_STREAM_THREADS'] = str(args.stream_threads)
+    if args.database:
+        os.environ['CLINIC_DATABASE'] = os.path.abspath(args.database)
+
+    uvicorn.run(
+        'asgi:create_app',
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        lifespan='on',
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
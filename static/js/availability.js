@@ -26,20 +26,9 @@ function loadAvailableTimes() {
         return;
     }
 
-    // Use URLSearchParams for clean API call construction
-    const params = new URLSearchParams({ doctor: doctorName, date: dateValue });
-    const url = `/api/doctor_availability?${params.toString()}`;
-
-    fetch(url)
-        .then(response => {
-            if (!response.ok) {
-                throw new Error('Network response was not ok');
-            }
-            return response.json();
-        })
-        .then(data => {
+    getAvailableTimes(doctorName, dateValue)
+        .then(availableTimes => {
             timeDropdown.innerHTML = '';
-            const availableTimes = data.available_times;
 
             if (availableTimes && availableTimes.length > 0) {
                 availableTimes.forEach(time => {
@@ -67,6 +56,89 @@ function loadAvailableTimes() {
         });
 }
 
+// -------------------------
+// Availability matrix prefetch
+// -------------------------
+// One /api/availability_range call covers every doctor for the next two
+// weeks; dropdown changes inside that window are answered locally. The
+// matrix is refreshed after a minute (the server replies 304 if nothing
+// changed) and the server still rejects a slot that was taken meanwhile.
+const PREFETCH_DAYS = 14;
+const MATRIX_MAX_AGE_MS = 60 * 1000;
+let availabilityMatrix = null;
+let matrixFetchedAt = 0;
+
+function addDays(isoDate, days) {
+    const d = new Date(isoDate + 'T00:00:00Z');
+    d.setUTCDate(d.getUTCDate() + days);
+    return d.toISOString().split('T')[0];
+}
+
+/**
+ * Fetches the availability matrix for [start, start + PREFETCH_DAYS).
+ */
+function prefetchAvailability(start) {
+    start = start || new Date().toISOString().split('T')[0];
+    const params = new URLSearchParams({ start: start, end: addDays(start, PREFETCH_DAYS - 1) });
+
+    return fetch(`/api/availability_range?${params.toString()}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Network response was not ok');
+            }
+            return response.json();
+        })
+        .then(matrix => {
+            availabilityMatrix = matrix;
+            matrixFetchedAt = Date.now();
+            return matrix;
+        });
+}
+
+function timesFromMatrix(matrix, doctorName, dateValue) {
+    const dayIndex = matrix.dates.indexOf(dateValue);
+    const row = matrix.open[doctorName];
+    if (dayIndex === -1 || !row) {
+        return null;
+    }
+    // Open slots are indexes into matrix.times (each doctor has own hours).
+    return row[dayIndex].map(i => matrix.times[i]);
+}
+
+/**
+ * Resolves the available times for one doctor and date, from the local
+ * matrix when possible and otherwise by prefetching a window starting there.
+ */
+function getAvailableTimes(doctorName, dateValue) {
+    const fresh = availabilityMatrix && (Date.now() - matrixFetchedAt) < MATRIX_MAX_AGE_MS;
+    if (fresh) {
+        const times = timesFromMatrix(availabilityMatrix, doctorName, dateValue);
+        if (times !== null) {
+            return Promise.resolve(times);
+        }
+    }
+
+    // Refresh the current window if the date is in it, otherwise start a new one there.
+    const inWindow = availabilityMatrix && availabilityMatrix.dates.indexOf(dateValue) !== -1;
+    const start = inWindow ? availabilityMatrix.dates[0] : dateValue;
+    return prefetchAvailability(start).then(matrix => {
+        const times = timesFromMatrix(matrix, doctorName, dateValue);
+        if (times !== null) {
+            return times;
+        }
+        // Doctor not in the matrix (e.g. added since): fall back to the single-day API.
+        const params = new URLSearchParams({ doctor: doctorName, date: dateValue });
+        return fetch(`/api/doctor_availability?${params.toString()}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Network response was not ok');
+                }
+                return response.json();
+            })
+            .then(data => data.available_times);
+    });
+}
+
 // Ensure loadAvailableTimes is globally accessible if referenced in HTML
 // (Note: The function is explicitly called from HTML in booking.html/edit_appointment.html)
 // window.loadAvailableTimes = loadAvailableTimes; 
@@ -0,0 +1,107 @@
+// Live Queue Board
+// Keeps a reception table current from /events/queue instead of reloading
+// the page. Rows are expected as <tr data-appointment-id="..."> with cells
+// marked data-field="id" / "patient_name" / "status" / "queue_number" /
+// "doctor_name" / "date" / "time"; elements marked data-pending-only are
+// hidden once the row leaves 'pending'. New rows are cloned from a
+// <template data-queue-row> and placed in (date, time, id) order inside the
+// <tbody data-queue-rows data-has-prev data-has-next> of the current page.
+
+/**
+ * Subscribes a table to the queue feed. `filters` may hold date and doctor.
+ * Returns the EventSource so callers can close() it.
+ */
+function startQueueBoard(table, filters) {
+    filters = filters || {};
+    const params = new URLSearchParams(filters);
+    const source = new EventSource(`/events/queue?${params.toString()}`);
+    const rows = table.querySelector('tbody[data-queue-rows]');
+    const blank = table.querySelector('template[data-queue-row]');
+
+    function rowFor(id) {
+        return table.querySelector(`tr[data-appointment-id="${id}"]`);
+    }
+
+    // Same rules as the reception list: exact date, doctor name substring
+    // in any case.
+    function matches(appointment) {
+        return (!filters.date || appointment.date === filters.date) &&
+            (!filters.doctor || appointment.doctor_name.toLowerCase().includes(filters.doctor.toLowerCase()));
+    }
+
+    function sortKey(date, time, id) {
+        return `${date} ${time} ${String(id).padStart(12, '0')}`;
+    }
+
+    function rowKey(row) {
+        const field = name => row.querySelector(`[data-field="${name}"]`).textContent;
+        return sortKey(field('date'), field('time'), row.dataset.appointmentId);
+    }
+
+    function fill(row, appointment) {
+        row.querySelectorAll('[data-field]').forEach(cell => {
+            const value = appointment[cell.dataset.field];
+            if (cell.dataset.field === 'status') {
+                cell.className = `status-tag status-${value}`;
+                cell.textContent = value.charAt(0).toUpperCase() + value.slice(1);
+                return;
+            }
+            cell.textContent = value === null || value === undefined ? '' : value;
+        });
+        row.querySelectorAll('[data-pending-only]').forEach(el => {
+            el.hidden = appointment.status !== 'pending';
+        });
+        row.dataset.status = appointment.status;
+    }
+
+    function showEmpty() {
+        const empty = !rows.querySelector('tr[data-appointment-id]');
+        table.querySelectorAll('[data-queue-table]').forEach(el => { el.hidden = empty; });
+        table.querySelectorAll('[data-queue-empty]').forEach(el => { el.hidden = !empty; });
+    }
+
+    function insert(appointment) {
+        // Rows sorting before the first or after the last one shown belong
+        // to the neighbouring page when there is one.
+        const key = sortKey(appointment.date, appointment.time, appointment.id);
+        const shown = Array.from(rows.querySelectorAll('tr[data-appointment-id]'));
+        const next = shown.find(row => rowKey(row) > key);
+        if ((next === shown[0] && shown.length && rows.dataset.hasPrev === 'true') ||
+            (!next && rows.dataset.hasNext === 'true')) {
+            return;
+        }
+        const row = blank.content.firstElementChild.cloneNode(true);
+        row.dataset.appointmentId = appointment.id;
+        row.querySelectorAll('a[href]').forEach(link => {
+            link.setAttribute('href', link.getAttribute('href').replace(/\/0$/, `/${appointment.id}`));
+        });
+        fill(row, appointment);
+        rows.insertBefore(row, next || null);
+    }
+
+    function apply(appointment) {
+        const row = rowFor(appointment.id);
+        if (row && matches(appointment) &&
+                rowKey(row) === sortKey(appointment.date, appointment.time, appointment.id)) {
+            fill(row, appointment);
+            return;
+        }
+        // New, moved to another time, or moved off this screen's date/doctor.
+        if (row) {
+            row.remove();
+        }
+        if (matches(appointment)) {
+            insert(appointment);
+        }
+        showEmpty();
+    }
+
+    ['booked', 'moved', 'checked_in', 'cancelled'].forEach(kind => {
+        source.addEventListener(kind, event => apply(JSON.parse(event.data)));
+    });
+
+    // Events were lost (slow screen or a server restart): one reload.
+    source.addEventListener('resync', () => window.location.reload());
+
+    return source;
+}
@@ -0,0 +1,66 @@
+# -------------------------
+# Appointment statistics
+# -------------------------
+# daily_stats holds a count per (date, doctor, status) and status_totals a
+# count per status; triggers from migration 5 keep both current on every
+# insert, update and delete. Dashboard numbers therefore cost a handful of
+# primary-key lookups no matter how many years of appointments exist.
+
+
+def dashboard(conn, today):
+    row = conn.execute(
+        """
+        SELECT
+            (SELECT IFNULL(SUM(count), 0) FROM status_totals),
+            (SELECT IFNULL(SUM(count), 0) FROM daily_stats WHERE date = ?),
+            (SELECT IFNULL(SUM(count), 0) FROM status_totals WHERE status = 'checked_in'),
+            (SELECT IFNULL(SUM(count), 0) FROM status_totals WHERE status = 'cancelled')
+        """,
+        (today,)
+    ).fetchone()
+    return {'total': row[0], 'today': row[1], 'checked_in': row[2], 'cancelled': row[3]}
+
+
+def dashboard_live(conn, today):
+    # Same numbers straight from the full history in one pass; used to
+    # verify the summaries and as a reference in benchmarks.
+    row = conn.execute(
+        """
+        SELECT COUNT(*),
+               IFNULL(SUM(date = ?), 0),
+               IFNULL(SUM(status = 'checked_in'), 0),
+               IFNULL(SUM(status = 'cancelled'), 0)
+          FROM appointments_history
+        """,
+        (today,)
+    ).fetchone()
+    return {'total': row[0], 'today': row[1], 'checked_in': row[2], 'cancelled': row[3]}
+
+
+def breakdown(conn, start, end=None, by='doctor'):
+    if by not in ('doctor', 'status'):
+        raise ValueError("by must be 'doctor' or 'status'")
+    column = 'doctor_name' if by == 'doctor' else 'status'
+    rows = conn.execute(
+        f"SELECT {column}, SUM(count) FROM daily_stats WHERE date BETWEEN ? AND ? "
+        f"GROUP BY {column} HAVING SUM(count) > 0 ORDER BY {column}",
+        (start, end or start)
+    ).fetchall()
+    return {key: count for key, count in rows}
+
+
+def rebuild(conn, source='appointments_history'):
+    # Recompute both summary tables from scratch (e.g. after a bulk repair).
+    # The summaries count archived appointments too (see archive.py).
+    with conn:
+        conn.execute("DELETE FROM daily_stats")
+        conn.execute("DELETE FROM status_totals")
+        conn.execute(
+            "INSERT INTO daily_stats (date, doctor_name, status, count) "
+            f"SELECT date, doctor_name, IFNULL(status, ''), COUNT(*) FROM {source} "
+            "GROUP BY date, doctor_name, IFNULL(status, '')"
+        )
+        conn.execute(
+            "INSERT INTO status_totals (status, count) "
+            "SELECT status, SUM(count) FROM daily_stats GROUP BY status"
+        )
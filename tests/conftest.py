@@ -0,0 +1,69 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as clinic  # noqa: E402
+import migrations  # noqa: E402
+
+PASSWORD = 'secret'
+HASH_METHOD = 'pbkdf2:sha256:1000'  # fast, and matching config means no rehash on login
+USERS = [
+    ('admin', 'Admin User', 'admin'),
+    ('reception', 'Reception Staff', 'reception'),
+    ('pat', 'Pat Patient', 'patient'),
+    ('dr_ravi', 'Dr. Ravi Teja', 'doctor'),
+]
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'clinic.db')
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn)
+    password = generate_password_hash(PASSWORD, HASH_METHOD)
+    conn.executemany(
+        "INSERT INTO users (username, full_name, password, role) VALUES (?, ?, ?, ?)",
+        [(username, full_name, password, role) for username, full_name, role in USERS]
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = sqlite3.connect(db_path)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def client(db_path):
+    # One app object per process: point it at the test database and drop
+    # everything it cached from the previous one.
+    app = clinic.app
+    app.config.update(DATABASE=db_path, TESTING=True, PASSWORD_HASH_METHOD=HASH_METHOD,
+                      PASSWORD_HASH_WORKERS=0, SLOT_REFRESH_SECONDS=0)
+    app.extensions['db_pool'] = None
+    app.extensions['password_hasher'] = None
+    app.extensions['page_cache'].backend.clear()
+    app.extensions['user_cache'].invalidate()
+    app.extensions['availability_cache'].invalidate()
+    yield app.test_client()
+    if app.extensions['db_pool'] is not None:
+        app.extensions['db_pool'].close_all()
+        app.extensions['db_pool'] = None
+
+
+@pytest.fixture
+def login(client):
+    def login(username):
+        response = client.post('/login', data={'action': 'login', 'username': username, 'password': PASSWORD})
+        assert response.status_code == 302
+        return response
+    return login
@@ -0,0 +1,43 @@
+def book(conn, *times):
+    cur = conn.executemany(
+        "INSERT INTO appointments (patient_name, doctor_name, date, time, status) "
+        "VALUES ('Pat Patient', 'Dr. Ravi Teja', '2030-01-01', ?, 'pending')",
+        [(t,) for t in times]
+    )
+    conn.commit()
+    return [r[0] for r in conn.execute("SELECT id FROM appointments ORDER BY id")][-cur.rowcount:]
+
+
+def statuses(conn):
+    return dict(conn.execute("SELECT id, status FROM appointments"))
+
+
+def test_bulk_checkin_rejects_a_string_of_ids(client, login, conn):
+    first, second = book(conn, '09:00', '09:30')
+    assert (first, second) == (1, 2)
+    login('reception')
+
+    response = client.post('/checkin/bulk', json={'appointment_ids': '12'})
+
+    assert response.status_code == 400
+    assert statuses(conn) == {1: 'pending', 2: 'pending'}
+
+
+def test_bulk_checkin_rejects_non_integer_items(client, login, conn):
+    book(conn, '09:00')
+    login('reception')
+
+    for ids in (['1'], [1.0], [True], {'1': 1}):
+        assert client.post('/checkin/bulk', json={'appointment_ids': ids}).status_code == 400
+    assert statuses(conn) == {1: 'pending'}
+
+
+def test_bulk_checkin_admits_a_list_of_ids(client, login, conn):
+    first, second = book(conn, '09:00', '09:30')
+    login('reception')
+
+    response = client.post('/checkin/bulk', json={'appointment_ids': [first, second]})
+
+    assert response.status_code == 200
+    assert [a['queue_number'] for a in response.get_json()['checked_in']] == [1, 2]
+    assert statuses(conn) == {first: 'checked_in', second: 'checked_in'}
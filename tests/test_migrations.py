@@ -0,0 +1,29 @@
+import sqlite3
+
+import migrations
+
+
+def test_duplicate_bookings_are_recorded_when_cancelled(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'old.db'))
+    migrations.migrate(conn, target=2)
+    conn.executemany(
+        "INSERT INTO appointments (patient_name, doctor_name, date, time, status) VALUES (?,?,?,?,?)",
+        [
+            ('Ann', 'Dr. Ravi Teja', '2030-01-01', '09:00', 'cancelled'),
+            ('Ben', 'Dr. Ravi Teja', '2030-01-01', '09:00', 'pending'),
+            ('Cal', 'Dr. Ravi Teja', '2030-01-01', '09:00', 'checked_in'),
+            ('Dee', 'Dr. Ravi Teja', '2030-01-01', '09:00', 'pending'),
+            ('Eve', 'Dr. Ravi Teja', '2030-01-01', '09:30', 'pending'),
+        ]
+    )
+    conn.commit()
+
+    migrations.migrate(conn)
+
+    assert conn.execute(
+        "SELECT appointment_id, kept_id, previous_status FROM cancelled_duplicates ORDER BY appointment_id"
+    ).fetchall() == [(3, 2, 'checked_in'), (4, 2, 'pending')]
+    assert conn.execute("SELECT id, status FROM appointments ORDER BY id").fetchall() == [
+        (1, 'cancelled'), (2, 'pending'), (3, 'cancelled'), (4, 'cancelled'), (5, 'pending'),
+    ]
+    conn.close()
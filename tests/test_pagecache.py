@@ -0,0 +1,23 @@
+def test_logged_in_patient_gets_cached_home_and_contact(client, login):
+    # The login flash is never rendered by these pages, so it must not keep
+    # them out of the cache.
+    login('pat')
+
+    for path in ('/', '/contact'):
+        first = client.get(path)
+        second = client.get(path)
+        assert (first.status_code, second.status_code) == (200, 200)
+        assert first.headers['X-Cache'] == 'MISS'
+        assert second.headers['X-Cache'] == 'HIT'
+        assert second.data == first.data
+
+
+def test_pending_flash_bypasses_a_page_that_renders_it(client, login):
+    login('reception')
+
+    response = client.get('/reception')
+
+    assert 'X-Cache' not in response.headers
+    assert b'Logged in successfully' in response.data
+    assert client.get('/reception').headers['X-Cache'] == 'MISS'
+    assert client.get('/reception').headers['X-Cache'] == 'HIT'
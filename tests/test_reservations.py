@@ -0,0 +1,44 @@
+from datetime import date
+
+import pytest
+
+import reservations
+import schedules
+
+DOCTOR = 'Dr. Ravi Teja'
+
+
+@pytest.fixture
+def doctor_id(conn):
+    schedules.refresh(conn, today=date(2030, 1, 1))  # window 2030-01-01 .. 2030-03-01
+    return conn.execute("SELECT id FROM users WHERE username='dr_ravi'").fetchone()[0]
+
+
+def stored(conn, doctor_id, day):
+    return conn.execute(
+        "SELECT time, state FROM slots WHERE doctor_id=? AND date=? AND state != 'open'", (doctor_id, day)
+    ).fetchall()
+
+
+def test_booking_claims_a_stored_slot(conn, doctor_id):
+    reservations.reserve_slot(conn, 'Pat Patient', DOCTOR, '2030-01-08', '09:00', doctor_id=doctor_id)
+
+    assert stored(conn, doctor_id, '2030-01-08') == [('09:00', 'booked')]
+    with pytest.raises(reservations.SlotTaken):
+        reservations.reserve_slot(conn, 'Pat Patient', DOCTOR, '2030-01-08', '09:00', doctor_id=doctor_id)
+    with pytest.raises(reservations.SlotUnavailable):
+        reservations.reserve_slot(conn, 'Pat Patient', DOCTOR, '2030-01-08', '09:10', doctor_id=doctor_id)
+
+
+def test_booking_outside_the_window_stores_no_slots(conn, doctor_id):
+    reservations.reserve_slot(conn, 'Pat Patient', DOCTOR, '2031-01-07', '09:00', doctor_id=doctor_id)
+
+    assert conn.execute("SELECT COUNT(*) FROM slots WHERE date='2031-01-07'").fetchone()[0] == 0
+    with pytest.raises(reservations.SlotTaken):
+        reservations.reserve_slot(conn, 'Pat Patient', DOCTOR, '2031-01-07', '09:00', doctor_id=doctor_id)
+    with pytest.raises(reservations.SlotUnavailable):
+        reservations.reserve_slot(conn, 'Pat Patient', DOCTOR, '2031-01-07', '13:00', doctor_id=doctor_id)
+
+    # The window reaching the day picks the booking up.
+    schedules.refresh(conn, today=date(2031, 1, 1))
+    assert stored(conn, doctor_id, '2031-01-07') == [('09:00', 'booked')]
@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g, session
+import db
+
+# -------------------------
+# Current-user cache
+# -------------------------
+# g.user resolves the logged-in user at most once per request; behind it a
+# process-wide LRU keyed by user id answers most requests without touching
+# the users table. Entries expire after a TTL and are dropped explicitly
+# whenever a user row is written.
+USER_COLUMNS = ('id', 'username', 'full_name', 'role')
+
+
+class UserCache:
+    def __init__(self, max_entries=10000, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or (self.ttl and time.monotonic() - entry[1] > self.ttl):
+                self._misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, user):
+        with self._lock:
+            self._entries[user['id']] = (user, time.monotonic())
+            self._entries.move_to_end(user['id'])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def init_app(app):
+    app.config.setdefault('USER_CACHE_SIZE', 10000)
+    app.config.setdefault('USER_CACHE_TTL', 300.0)
+    app.extensions['user_cache'] = UserCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+
+
+def get_cache():
+    return current_app.extensions['user_cache']
+
+
+def as_user(row):
+    return {key: row[key] for key in USER_COLUMNS}
+
+
+def remember(row):
+    # Prime the cache from a users row the caller already fetched (login).
+    user = as_user(row)
+    get_cache().put(user)
+    g.user = user
+    return user
+
+
+def forget(user_id):
+    get_cache().invalidate(user_id)
+    if g.get('user') and g.user['id'] == user_id:
+        g.pop('user')
+
+
+def current_user():
+    if 'user' in g:
+        return g.user
+    user = None
+    uid = session.get('user_id')
+    if uid:
+        cache = get_cache()
+        user = cache.get(uid)
+        if user is None:
+            row = db.get_db().execute(
+                'SELECT id, username, full_name, role FROM users WHERE id=?', (uid,)
+            ).fetchone()
+            if row is not None:
+                user = as_user(row)
+                cache.put(user)
+    g.user = user
+    return user
+
+
+# -------------------------
+# Doctor lookups
+# -------------------------
+def doctor_id(conn, full_name):
+    row = conn.execute(
+        "SELECT MIN(id) FROM users WHERE role='doctor' AND full_name=?", (full_name,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def doctor_ids_matching(conn, term):
+    # Substring match over the (small) doctor list only; the appointment
+    # query then uses the integer doctor_id index.
+    return [r[0] for r in conn.execute(
+        "SELECT id FROM users WHERE role='doctor' AND full_name LIKE ?", (f'%{term}%',)
+    )]